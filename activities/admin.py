@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import ActivityType, Activity
+from django.db import transaction
+from . import jobs
+from .models import ActivityType, Activity, BestEffort, PersonalRecord, Segment, SegmentEffort, TrackJob, \
+    TrainingTotals
 from user_medias.models import ActivityMedia
 
 
@@ -17,3 +20,52 @@ class ActivityAdmin(admin.ModelAdmin):
     inlines = [
         ActivityMediaInline,
     ]
+
+
+@admin.register(TrackJob)
+class TrackJobAdmin(admin.ModelAdmin):
+    list_display = ('activity', 'segment', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('error',)
+
+
+@admin.register(TrainingTotals)
+class TrainingTotalsAdmin(admin.ModelAdmin):
+    list_display = ('profile', 'period', 'period_start', 'activity_type', 'count', 'distance', 'moving_time')
+    list_filter = ('period',)
+
+
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'distance', 'created_at')
+    actions = ['rematch']
+
+    def save_model(self, request, obj, form, change):
+        super(SegmentAdmin, self).save_model(request, obj, form, change)
+        if not change or 'points' in form.changed_data:
+            # Поиск по всем трекам долгий, его делает воркер process_tracks
+            transaction.on_commit(lambda: jobs.enqueue_segment(obj))
+
+    @admin.action(description='Найти попытки во всех треках заново')
+    def rematch(self, request, queryset):
+        for segment in queryset:
+            jobs.enqueue_segment(segment)
+        self.message_user(request, f'Сегментов в очереди на поиск попыток: {len(queryset)}')
+
+
+@admin.register(SegmentEffort)
+class SegmentEffortAdmin(admin.ModelAdmin):
+    list_display = ('segment', 'profile', 'activity', 'elapsed_time', 'started_at')
+    list_filter = ('segment',)
+
+
+@admin.register(BestEffort)
+class BestEffortAdmin(admin.ModelAdmin):
+    list_display = ('activity', 'profile', 'kind', 'elapsed_time', 'distance', 'started_at')
+    list_filter = ('kind',)
+
+
+@admin.register(PersonalRecord)
+class PersonalRecordAdmin(admin.ModelAdmin):
+    list_display = ('profile', 'kind', 'effort')
+    list_filter = ('kind',)
@@ -5,3 +5,6 @@ class ActivitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'activities'
     verbose_name = 'Тренировки'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,101 @@
+"""Bulk import of GPX and FIT archives (``manage.py import_tracks``).
+
+Files are read from a directory or a zip one by one, parsed in worker
+processes (``parse``) and inserted in batches with ``bulk_create``. Files
+whose hash the profile already has are skipped, so an interrupted import can
+simply be restarted. The parsed track and the thumbnail are stored under the
+activity's id, like ``process_activity`` does, once ``bulk_create`` has
+assigned it.
+"""
+import io
+import os
+import zipfile
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import efforts, heatmap, segments, spatial, totals
+from .gpx import to_datetime
+from .models import Activity
+from .stats import compute_stats
+from .thumbnails import render_thumbnail
+from .tracks import TIME, decode_track
+
+TRACK_EXTENSIONS = ('.gpx', '.fit')
+
+
+def iter_files(path):
+    """Yield ``(name, bytes)`` of every ``.gpx`` and ``.fit`` in a directory tree or a zip archive."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(TRACK_EXTENSIONS):
+                    yield info.filename, archive.read(info)
+        return
+    for directory, _, names in sorted(os.walk(path)):
+        for name in sorted(names):
+            if name.lower().endswith(TRACK_EXTENSIONS):
+                with open(os.path.join(directory, name), 'rb') as track_file:
+                    yield os.path.relpath(os.path.join(directory, name), path), track_file.read()
+
+
+def parse(name, data):
+    """Runs in a worker process: everything that does not need the database."""
+    track = decode_track(io.BytesIO(data))
+    times = track[TIME][~np.isnan(track[TIME])]
+    if not times.size:
+        raise ValueError('в треке нет времени')
+    buffer = io.BytesIO()
+    np.save(buffer, track, allow_pickle=False)
+    thumbnail = io.BytesIO()
+    render_thumbnail(track).save(thumbnail, format=settings.ROUTE_THUMBNAIL_FORMAT, quality=85)
+    return {
+        'name': name,
+        'track': buffer.getvalue(),
+        'thumbnail': thumbnail.getvalue(),
+        'stats': compute_stats(track),
+        'started_at': float(times[0]),
+        'points': track.shape[1],
+    }
+
+
+def build_activity(profile, activity_type, track_hash, track_print, data, parsed):
+    activity = Activity(profile=profile, activity_type=activity_type, track_hash=track_hash,
+                        fingerprint=track_print, started_at=to_datetime(parsed['started_at']),
+                        status=Activity.Status.READY)
+    activity.title = activity.default_title()
+    activity.apply_stats(parsed['stats'])
+    extension = os.path.splitext(parsed['name'])[1].lower()
+    activity.track_file.name = activity.track_file.storage.save(f'activities/track{extension}', ContentFile(data))
+    return activity
+
+
+def save_batch(batch):
+    """Insert ``[(activity, parsed)]`` and do what ``Activity.save()`` signals would have done.
+
+    Imported history is not fanned out to followers' feeds.
+    """
+    tracks = []
+    with transaction.atomic():
+        created = Activity.objects.bulk_create([activity for activity, _ in batch])
+        thumbnail_extension = settings.ROUTE_THUMBNAIL_FORMAT.lower()
+        for activity, parsed in batch:
+            # Свои файлы у каждой тренировки: переобработка одной не удаляет файлы другой
+            activity.track_data.save(f'{activity.pk}.npy', ContentFile(parsed['track']), save=False)
+            activity.thumbnail.save(f'{activity.pk}.{thumbnail_extension}', ContentFile(parsed['thumbnail']),
+                                    save=False)
+            track = np.load(io.BytesIO(parsed['track']), allow_pickle=False)
+            spatial.index_track(activity.pk, track)
+            segments.match_activity(activity, track)
+            efforts.save(activity, track)
+            tracks.append(track)
+        Activity.objects.bulk_update(created, ['track_data', 'thumbnail'])
+        totals.add(activity.totals_state() for activity in created)
+    # Тепловая карта не откатывается вместе с транзакцией, поэтому обновляется после нее
+    for activity, track in zip(created, tracks):
+        heatmap.add(activity.profile_id, track)
+        activity.in_heatmap = True
+    Activity.objects.filter(pk__in=[activity.pk for activity in created]).update(in_heatmap=True)
+    return created
@@ -0,0 +1,194 @@
+"""Kilometer splits, best efforts and personal records.
+
+``compute`` builds cumulative distance, elapsed and moving time of a track
+once, with NumPy. Splits are the moments the cumulative distance crosses
+each kilometer. A best effort is a sliding window over the same arrays: for
+every point the start of the window ending there is found by a binary search
+on the cumulative column, so all windows of one kind are one vectorized
+pass. Results are stored in ``Split`` and ``BestEffort``.
+
+``PersonalRecord`` holds the best effort of each kind per profile. New
+efforts are only compared with the current records; the profile's history is
+read only when a record holder is reprocessed or deleted, and then it is one
+index lookup per lost record.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .gpx import STOPPED_SPEED_THRESHOLD, to_datetime
+from .models import BestEffort, PersonalRecord, Split
+from .stats import step_distances
+from .tracks import ELEVATION, SEGMENT, TIME
+
+SPLIT_DISTANCE = 1000
+
+KIND = BestEffort.Kind
+# Минимальное время на дистанцию, м
+DISTANCE_EFFORTS = {KIND.KM_1: 1000, KIND.KM_5: 5000, KIND.KM_10: 10000}
+# Максимальная дистанция за время, с
+TIME_EFFORTS = {KIND.MIN_20: 20 * 60}
+
+SplitData = namedtuple('SplitData', 'number distance elapsed moving elevation_change')
+EffortData = namedtuple('EffortData', 'kind distance elapsed started_at start end')
+
+
+def cumulative(track):
+    """``(indices, distance, elapsed, moving)``: timed points and running totals at them (m, s, s)."""
+    indices = np.flatnonzero(~np.isnan(track[TIME]))
+    if indices.size < 2:
+        empty = np.zeros(indices.size)
+        return indices, empty, empty, empty
+    timed = track[:, indices]
+    # Время иногда идет назад; окна считаем по неубывающему времени
+    elapsed = np.maximum.accumulate(timed[TIME]) - timed[TIME][0]
+    distances = step_distances(timed)
+    # Между сегментами (пауза записи) расстояние не считается
+    distances[timed[SEGMENT][1:] != timed[SEGMENT][:-1]] = 0
+    seconds = np.diff(elapsed)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moving = (seconds > 0) & (distances / seconds * 3.6 > STOPPED_SPEED_THRESHOLD)
+    return (indices, np.r_[0, np.cumsum(distances)], elapsed,
+            np.r_[0, np.cumsum(np.where(moving, seconds, 0))])
+
+
+def _at(marks, x, y):
+    """``(left, values)``: ``y`` interpolated at ``marks`` along non-decreasing ``x``.
+
+    ``left`` is the index of the point at or before each mark. On a flat part
+    of ``x`` (a stop) the last point of it is taken, so windows do not start
+    with standing still.
+    """
+    right = np.clip(np.searchsorted(x, marks, side='right'), 1, x.size - 1)
+    left = right - 1
+    width = x[right] - x[left]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(width > 0, (marks - x[left]) / width, 0)
+    return left, y[left] + fraction * (y[right] - y[left])
+
+
+def compute_splits(distance, elapsed, moving, elevation):
+    total = float(distance[-1]) if distance.size else 0.
+    if total <= 0:
+        return []
+    # Хвост короче метра не выделяется в отдельный отрезок
+    marks = np.r_[np.arange(0, total - 1, SPLIT_DISTANCE), total]
+    _, times = _at(marks, distance, elapsed)
+    _, moving_times = _at(marks, distance, moving)
+    _, elevations = _at(marks, distance, elevation)
+    times[0] = moving_times[0] = 0
+    changes = np.diff(elevations)
+    return [SplitData(number, length, seconds, moving_seconds, None if np.isnan(change) else round(change, 1))
+            for number, (length, seconds, moving_seconds, change) in enumerate(
+                zip(np.diff(marks).tolist(), np.diff(times).tolist(), np.diff(moving_times).tolist(),
+                    changes.tolist()), start=1)]
+
+
+def compute_efforts(indices, distance, elapsed, started):
+    """Best effort of every kind the track is long enough for."""
+    efforts = []
+    for kind, length in DISTANCE_EFFORTS.items():
+        ends = np.flatnonzero(distance >= length)
+        if not ends.size:
+            continue
+        starts, start_times = _at(distance[ends] - length, distance, elapsed)
+        durations = elapsed[ends] - start_times
+        durations[durations <= 0] = np.inf
+        best = int(np.argmin(durations))
+        if np.isfinite(durations[best]):
+            efforts.append(EffortData(kind, float(length), float(durations[best]),
+                                      started + float(start_times[best]),
+                                      int(indices[starts[best]]), int(indices[ends[best]])))
+    for kind, duration in TIME_EFFORTS.items():
+        ends = np.flatnonzero(elapsed >= duration)
+        if not ends.size:
+            continue
+        starts, start_distances = _at(elapsed[ends] - duration, elapsed, distance)
+        best = int(np.argmax(distance[ends] - start_distances))
+        efforts.append(EffortData(kind, float(distance[ends[best]] - start_distances[best]), float(duration),
+                                  started + float(elapsed[ends[best]] - duration),
+                                  int(indices[starts[best]]), int(indices[ends[best]])))
+    return efforts
+
+
+def compute(track):
+    """``(splits, efforts)`` of a track array."""
+    indices, distance, elapsed, moving = cumulative(track)
+    if indices.size < 2:
+        return [], []
+    elevation = track[ELEVATION][indices]
+    return (compute_splits(distance, elapsed, moving, elevation),
+            compute_efforts(indices, distance, elapsed, float(track[TIME][indices[0]])))
+
+
+def _better(effort, than):
+    if effort.kind in DISTANCE_EFFORTS:
+        return effort.elapsed_time < than.elapsed_time
+    return effort.distance > than.distance
+
+
+def best_effort(profile_id, kind):
+    """Best stored effort of the kind, read by index (``best_effort_*_idx``)."""
+    order = 'elapsed_time' if kind in DISTANCE_EFFORTS else '-distance'
+    return BestEffort.objects.filter(profile_id=profile_id, kind=kind).order_by(order, 'started_at').first()
+
+
+def update_records(profile_id, efforts, lost=()):
+    """Make new ``efforts`` records where they beat the current ones.
+
+    ``lost`` - kinds whose record was just removed; the next best effort takes its place.
+    """
+    with transaction.atomic():
+        records = {record.kind: record for record in PersonalRecord.objects.select_for_update()
+                   .filter(profile_id=profile_id).select_related('effort')}
+        for kind in lost:
+            if kind not in records:
+                effort = best_effort(profile_id, kind)
+                if effort is not None:
+                    records[kind] = PersonalRecord.objects.create(profile_id=profile_id, kind=kind, effort=effort)
+        for effort in efforts:
+            record = records.get(effort.kind)
+            if record is None:
+                record, _ = PersonalRecord.objects.get_or_create(profile_id=profile_id, kind=effort.kind,
+                                                                 defaults={'effort': effort})
+                records[effort.kind] = record
+            if record.effort_id != effort.pk and _better(effort, record.effort):
+                record.effort = effort
+                record.save(update_fields=['effort'])
+
+
+def held_records(activity):
+    """Kinds of the profile's records set by this activity."""
+    return list(PersonalRecord.objects.filter(effort__activity=activity).values_list('kind', flat=True))
+
+
+def save(activity, track):
+    """Replace the splits and best efforts of the activity and update the profile's records."""
+    splits, efforts = compute(track)
+    with transaction.atomic():
+        Split.objects.filter(activity=activity).delete()
+        Split.objects.bulk_create([
+            Split(activity_id=activity.pk, number=split.number, distance=split.distance,
+                  elapsed_time=timedelta(seconds=split.elapsed), moving_time=timedelta(seconds=split.moving),
+                  elevation_change=split.elevation_change)
+            for split in splits
+        ])
+        lost = held_records(activity)
+        # Записи рекордов удаляются вместе со старыми результатами (CASCADE)
+        BestEffort.objects.filter(activity=activity).delete()
+        created = [BestEffort.objects.create(
+            activity_id=activity.pk, profile_id=activity.profile_id, kind=effort.kind, distance=effort.distance,
+            elapsed_time=timedelta(seconds=effort.elapsed), started_at=to_datetime(effort.started_at),
+            start_index=effort.start, end_index=effort.end) for effort in efforts]
+        update_records(activity.profile_id, created, lost)
+    return splits, efforts
+
+
+def rebuild_records(profiles):
+    """Records of ``profiles`` computed again from their stored best efforts."""
+    with transaction.atomic():
+        PersonalRecord.objects.filter(profile__in=profiles).delete()
+        for profile in profiles:
+            update_records(profile.pk, [], KIND.values)
@@ -0,0 +1,90 @@
+"""Materialized feed: fan-out on write with read-time pull for celebrities.
+
+Every new activity is copied into ``FeedEntry`` rows of its author's
+followers, so reading a feed page is a range scan over the
+``(owner, created_at)`` index. Authors with more than ``FEED_FANOUT_LIMIT``
+followers are not fanned out; their activities are merged in when the feed
+is read. When an author crosses the limit, ``add_follow`` and
+``remove_follow`` drop or backfill the author's entries, so an activity is
+never both materialized and pulled. ``manage.py rebuild_feed`` restores
+entries from scratch, e.g. after ``FEED_FANOUT_LIMIT`` changes.
+"""
+from django.conf import settings
+
+from profiles.models import Follow, Profile
+from .models import Activity, FeedEntry
+
+
+def is_celebrity(profile):
+    return profile.followers_count > settings.FEED_FANOUT_LIMIT
+
+
+def fan_out(activity):
+    author = Profile.objects.only('followers_count').get(pk=activity.profile_id)
+    if is_celebrity(author):
+        return
+    followers = Follow.objects.filter(following_id=activity.profile_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(owner_id=owner_id, activity=activity, author_id=activity.profile_id,
+                   created_at=activity.created_at) for owner_id in followers.iterator()],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+def _backfill(owner_ids, following_id):
+    activities = list(Activity.objects.filter(profile_id=following_id)
+                      .order_by('-created_at').values_list('pk', 'created_at')[:settings.FEED_BACKFILL_LIMIT])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(owner_id=owner_id, activity_id=pk, author_id=following_id, created_at=created_at)
+         for owner_id in owner_ids for pk, created_at in activities],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+def add_follow(user_id, following_id):
+    """Backfill the new follower's feed with recent activities of the followed profile.
+
+    Called after ``followers_count`` is incremented; if this follower made the
+    profile a celebrity, its entries are dropped from all feeds.
+    """
+    followers_count = Profile.objects.values_list('followers_count', flat=True).get(pk=following_id)
+    if followers_count == settings.FEED_FANOUT_LIMIT + 1:
+        FeedEntry.objects.filter(author_id=following_id).delete()
+    if followers_count > settings.FEED_FANOUT_LIMIT:
+        return
+    _backfill([user_id], following_id)
+
+
+def remove_follow(user_id, following_id):
+    """Prune the feed of the former follower; backfill the others if the profile is no longer a celebrity."""
+    FeedEntry.objects.filter(owner_id=user_id, author_id=following_id).delete()
+    followers_count = Profile.objects.values_list('followers_count', flat=True).get(pk=following_id)
+    if followers_count == settings.FEED_FANOUT_LIMIT:
+        _backfill(Follow.objects.filter(following_id=following_id).values_list('user_id', flat=True), following_id)
+
+
+def timeline(user):
+    """Sources of the user's feed for ``CursorPaginator``: ``(queryset, (created_at, id) lookups)``.
+
+    The materialized entries are read by the ``(owner, created_at, activity)``
+    index; celebrities followed by the user, if any, are pulled directly.
+    """
+    sources = [(Activity.objects.filter(feed_entries__owner=user),
+                ('feed_entries__created_at', 'feed_entries__activity_id'))]
+    celebrities = list(user.follows.filter(followers_count__gt=settings.FEED_FANOUT_LIMIT)
+                       .values_list('pk', flat=True))
+    if celebrities:
+        sources.append((Activity.objects.filter(profile__in=celebrities), ('created_at', 'pk')))
+    return sources
+
+
+def rebuild(profiles=None):
+    """Recreate feed entries of ``profiles`` (all when ``None``) from follows."""
+    follows = Follow.objects.all()
+    entries = FeedEntry.objects.all()
+    if profiles is not None:
+        follows = follows.filter(user__in=profiles)
+        entries = entries.filter(owner__in=profiles)
+    entries.delete()
+    for user_id, following_id in follows.values_list('user_id', 'following_id').iterator():
+        add_follow(user_id, following_id)
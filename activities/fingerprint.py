@@ -0,0 +1,128 @@
+"""Cheap fingerprints of an uploaded track file, computed before any parsing.
+
+``raw`` is the SHA-256 of the bytes (the same value as ``Activity.track_hash``
+and the blob name). ``normalized`` survives re-exports of the same activity
+by another device or service: it is built from the start time, the number of
+track points and the first and last points rounded to about 10 meters, all
+found with byte searches instead of an XML parser. FIT files only get ``raw``:
+``normalized`` is empty for them. ``of_chunks`` computes both while the
+file is read piece by piece.
+"""
+import hashlib
+import re
+
+from .gpx import GPXError, parse_time
+
+RE_TRKPT = re.compile(rb'<(?:\w+:)?trkpt\b([^>]*)>')
+RE_LATITUDE = re.compile(rb'\blat\s*=\s*["\']([-+0-9.eE]+)')
+RE_LONGITUDE = re.compile(rb'\blon\s*=\s*["\']([-+0-9.eE]+)')
+RE_TIME = re.compile(rb'<(?:\w+:)?time>([^<]*)<')
+RE_POINT_END = re.compile(rb'</(?:\w+:)?trkpt>|<(?:\w+:)?trkpt\b')
+
+# 4 знака после запятой ~ 11 м: разные устройства по-разному округляют координаты
+COORDINATE_DIGITS = 4
+
+
+def raw(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _point(attributes):
+    latitude, longitude = RE_LATITUDE.search(attributes), RE_LONGITUDE.search(attributes)
+    if not latitude or not longitude:
+        return ''
+    return f'{float(latitude.group(1)):.{COORDINATE_DIGITS}f},{float(longitude.group(1)):.{COORDINATE_DIGITS}f}'
+
+
+def _last_point(data, first):
+    # Ищем с конца файла, расширяя окно, пока не найдется точка
+    window = 1 << 16
+    while True:
+        start = max(first.start(), len(data) - window)
+        last = None
+        for last in RE_TRKPT.finditer(data, start):
+            pass
+        if last or start == first.start():
+            return last or first
+        window *= 4
+
+
+class _Normalizer:
+    """Builds ``normalized`` from consecutive pieces of a file.
+
+    Each piece is scanned up to its last ``<``, the rest is carried over to
+    the next one, so no tag is split between pieces.
+    """
+
+    def __init__(self):
+        self.carry = b''
+        self.head = None
+        self.head_done = False
+        self.last = None
+        self.count = self.prefixed_count = 0
+        self.prefixed = False
+
+    def feed(self, chunk, final=False):
+        data = self.carry + chunk
+        cut = len(data) if final else data.rfind(b'<')
+        if cut <= 0:
+            self.carry = data
+            return
+        data, self.carry = data[:cut], data[cut:]
+        first = RE_TRKPT.search(data)
+        if not first:
+            self._extend_head(data)
+            return
+        if self.head is None:
+            self.head = b''
+            self._extend_head(data[first.start():])
+        else:
+            self._extend_head(data)
+        self.last = _last_point(data, first).group(1)
+        count = data.count(b'<trkpt')
+        self.count += count
+        if b':trkpt' in data:
+            self.prefixed = True
+            count = len(RE_TRKPT.findall(data))
+        self.prefixed_count += count
+
+    def _extend_head(self, data):
+        # Начало файла от первой точки до конца ее элемента, там ищется время
+        if self.head is not None and not self.head_done:
+            self.head += data
+            self.head_done = RE_POINT_END.search(self.head, RE_TRKPT.match(self.head).end()) is not None
+
+    def digest(self):
+        self.feed(b'', final=True)
+        if self.head is None:
+            return ''
+        first = RE_TRKPT.match(self.head)
+        # Время первой точки: <time> до конца ее элемента
+        start = ''
+        end = RE_POINT_END.search(self.head, first.end())
+        time_match = RE_TIME.search(self.head, first.end(), end.start() if end else len(self.head))
+        if time_match:
+            try:
+                start = str(int(parse_time(time_match.group(1).decode('ascii', 'replace'))))
+            except GPXError:
+                pass
+        count = self.prefixed_count if self.prefixed else self.count
+        key = f'{start}|{count}|{_point(first.group(1))}|{_point(self.last)}'
+        return hashlib.sha256(key.encode()).hexdigest()
+
+
+def normalized(data):
+    """Fingerprint of the recorded activity, ``''`` if the file has no track points."""
+    normalizer = _Normalizer()
+    normalizer.feed(data, final=True)
+    return normalizer.digest()
+
+
+def of_chunks(chunks):
+    """``(raw, normalized)`` of a file read in ``chunks``, without holding all of it in memory."""
+    digest = hashlib.sha256()
+    normalizer = _Normalizer()
+    for chunk in chunks:
+        digest.update(chunk)
+        normalizer.feed(chunk)
+    return digest.hexdigest(), normalizer.digest()
@@ -0,0 +1,196 @@
+"""Streaming decoder for Garmin FIT activity files.
+
+Only ``record`` messages are decoded, into the same
+``(latitude, longitude, elevation, time, segment)`` tuples as
+``activities.gpx.iter_points``. The file is read in blocks; every definition
+message is compiled once into a ``struct.Struct`` that unpacks the needed
+fields and skips the rest, so a data message costs one ``unpack_from``. A
+new segment starts when the timer is restarted after a stop. CRCs are not
+verified.
+"""
+import struct
+
+from .gpx import GPXError
+
+HEADER_MIN_SIZE = 12
+FIT_EPOCH = 631065600  # 1989-12-31T00:00:00Z в секундах Unix
+SEMICIRCLES = 180 / 2 ** 31
+BLOCK_SIZE = 1 << 16
+
+RECORD = 20
+EVENT = 21
+
+TIMESTAMP = 253
+# Номера нужных полей: у record координаты и высота, у event тип события, у всех - время,
+# от которого считаются сжатые заголовки
+FIELDS = {
+    RECORD: {TIMESTAMP: 'time', 0: 'latitude', 1: 'longitude', 2: 'altitude', 78: 'enhanced_altitude'},
+    EVENT: {TIMESTAMP: 'time', 0: 'event', 1: 'event_type'},
+}
+OTHER_FIELDS = {TIMESTAMP: 'time'}
+
+TIMER_EVENT = 0
+START_EVENT_TYPES = {0}
+STOP_EVENT_TYPES = {1, 4}
+
+# Базовый тип FIT -> (формат struct, значение "нет данных")
+BASE_TYPES = {
+    0x00: ('B', 0xFF), 0x01: ('b', 0x7F), 0x02: ('B', 0xFF),
+    0x83: ('h', 0x7FFF), 0x84: ('H', 0xFFFF), 0x85: ('i', 0x7FFFFFFF), 0x86: ('I', 0xFFFFFFFF),
+    0x0A: ('B', 0x00), 0x8B: ('H', 0x0000), 0x8C: ('I', 0x00000000),
+}
+
+
+class FITError(GPXError):
+    pass
+
+
+def is_fit(header):
+    return len(header) >= HEADER_MIN_SIZE and header[8:12] == b'.FIT'
+
+
+class Definition:
+    """Layout of a local message type: where the wanted fields are in the unpacked tuple."""
+    __slots__ = ('message', 'size', 'unpack_from', 'index', 'invalid')
+
+    def __init__(self, message, big_endian, fields, developer_size):
+        wanted = FIELDS.get(message, OTHER_FIELDS)
+        formats, self.index, self.invalid = [], {}, []
+        for number, size, base_type in fields:
+            base = BASE_TYPES.get(base_type)
+            if number in wanted and base and struct.calcsize(base[0]) == size:
+                self.index[wanted[number]] = len(self.invalid)
+                formats.append(base[0])
+                self.invalid.append(base[1])
+            else:
+                formats.append(f'{size}x')
+        if developer_size:
+            formats.append(f'{developer_size}x')
+        compiled = struct.Struct(('>' if big_endian else '<') + ''.join(formats))
+        self.message = message
+        self.size = compiled.size
+        self.unpack_from = compiled.unpack_from
+
+    def get(self, values, name):
+        position = self.index.get(name)
+        if position is None or values[position] == self.invalid[position]:
+            return None
+        return values[position]
+
+
+class _Reader:
+    """Block-buffered reader: ``take(size)`` returns the offset of the next ``size`` bytes in ``data``."""
+
+    def __init__(self, file):
+        self.file = file
+        self.data = b''
+        self.position = 0
+
+    def take(self, size):
+        start = self.position
+        if start + size > len(self.data):
+            self.data = self.data[start:] + self.file.read(max(BLOCK_SIZE, size))
+            start = 0
+            if size > len(self.data):
+                raise FITError('Unexpected end of FIT file')
+        self.position = start + size
+        return start
+
+    def at_end(self):
+        if self.position < len(self.data):
+            return False
+        self.data, self.position = self.file.read(BLOCK_SIZE), 0
+        return not self.data
+
+
+def iter_messages(file):
+    """Yield ``(definition, values, time)`` for every data message of all chained FIT files in ``file``.
+
+    ``values`` is the unpacked tuple, read fields with ``definition.get(values, name)``;
+    ``time`` is the FIT timestamp of the message, resolved for compressed headers too.
+    """
+    reader = _Reader(file)
+    unpack_from = struct.unpack_from
+
+    def byte():
+        offset = reader.take(1)
+        return reader.data[offset]
+
+    while not reader.at_end():
+        header_size = byte()
+        offset = reader.take(header_size - 1)
+        header = bytes([header_size]) + reader.data[offset:offset + header_size - 1]
+        if not is_fit(header):
+            raise FITError('Not a FIT file')
+        end_of_data = unpack_from('<I', header, 4)[0]
+        definitions = {}
+        last_time = None
+        consumed = 0
+        while consumed < end_of_data:
+            record_header = byte()
+            if record_header & 0x80:
+                # Сжатый заголовок: 5 бит смещения времени относительно последней метки
+                definition = definitions.get((record_header >> 5) & 0x03)
+                if definition is None or last_time is None:
+                    raise FITError('Compressed timestamp without definition')
+                last_time += ((record_header & 0x1F) - (last_time & 0x1F)) & 0x1F
+                offset = reader.take(definition.size)
+                consumed += 1 + definition.size
+                if definition.index:
+                    yield definition, definition.unpack_from(reader.data, offset), last_time
+            elif record_header & 0x40:
+                offset = reader.take(5)
+                architecture = reader.data[offset + 1]
+                message = unpack_from('>H' if architecture else '<H', reader.data, offset + 2)[0]
+                count = reader.data[offset + 4]
+                offset = reader.take(count * 3)
+                fields = [tuple(reader.data[offset + i:offset + i + 3]) for i in range(0, count * 3, 3)]
+                consumed += 6 + count * 3
+                developer_size = 0
+                if record_header & 0x20:
+                    developer_count = byte()
+                    offset = reader.take(developer_count * 3)
+                    developer_size = sum(reader.data[offset + i * 3 + 1] for i in range(developer_count))
+                    consumed += 1 + developer_count * 3
+                definitions[record_header & 0x0F] = Definition(message, architecture, fields, developer_size)
+            else:
+                definition = definitions.get(record_header & 0x0F)
+                if definition is None:
+                    raise FITError('Data message without definition')
+                offset = reader.take(definition.size)
+                consumed += 1 + definition.size
+                if not definition.index:
+                    continue
+                values = definition.unpack_from(reader.data, offset)
+                message_time = definition.get(values, 'time')
+                if message_time is not None:
+                    last_time = message_time
+                yield definition, values, message_time
+        reader.take(2)  # CRC
+
+
+def iter_points(file):
+    """Yield ``(latitude, longitude, elevation, time, segment)`` for every record with a position."""
+    segment = 0
+    stopped = False
+    for definition, values, point_time in iter_messages(file):
+        if definition.message == EVENT:
+            if definition.get(values, 'event') == TIMER_EVENT:
+                event_type = definition.get(values, 'event_type')
+                if event_type in STOP_EVENT_TYPES:
+                    stopped = True
+                elif event_type in START_EVENT_TYPES and stopped:
+                    stopped = False
+                    segment += 1
+            continue
+        if definition.message != RECORD:
+            continue
+        latitude, longitude = definition.get(values, 'latitude'), definition.get(values, 'longitude')
+        if latitude is None or longitude is None:
+            continue
+        altitude = definition.get(values, 'enhanced_altitude')
+        if altitude is None:
+            altitude = definition.get(values, 'altitude')
+        yield (latitude * SEMICIRCLES, longitude * SEMICIRCLES,
+               None if altitude is None else altitude / 5 - 500,
+               None if point_time is None else point_time + FIT_EPOCH, segment)
@@ -0,0 +1,29 @@
+"""Web Mercator helpers shared by map rendering code."""
+import math
+
+import numpy as np
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+MAX_LATITUDE = 85.0511287798
+
+
+def mercator(latitude, longitude):
+    """Project degrees to Web Mercator pixels at zoom 0 (``0..TILE_SIZE``)."""
+    latitude = np.radians(np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(longitude) + 180.) / 360. * TILE_SIZE
+    y = (1. - np.log(np.tan(latitude) + 1. / np.cos(latitude)) / math.pi) / 2. * TILE_SIZE
+    return x, y
+
+
+def fit_zoom(latitude, longitude, width, height, max_zoom=MAX_ZOOM):
+    """Largest zoom at which the bounds of the points fit into ``width`` x ``height`` pixels."""
+    if not len(latitude):
+        return 0
+    x, y = mercator(latitude, longitude)
+    span_x = float(x.max() - x.min())
+    span_y = float(y.max() - y.min())
+    zoom = max_zoom
+    while zoom > 0 and (span_x * 2 ** zoom > width or span_y * 2 ** zoom > height):
+        zoom -= 1
+    return zoom
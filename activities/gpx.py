@@ -0,0 +1,104 @@
+"""Streaming GPX reader.
+
+Track points are read with ``iterparse`` and yielded as plain tuples
+``(latitude, longitude, elevation, time, segment)`` without building the whole
+document tree, so memory usage does not grow with the file size.
+"""
+import math
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from xml.etree.ElementTree import iterparse
+
+# Те же константы, что и в gpxpy, чтобы результаты совпадали
+EARTH_RADIUS = 6378.137 * 1000
+ONE_DEGREE = (2 * math.pi * EARTH_RADIUS) / 360
+STOPPED_SPEED_THRESHOLD = 1  # км/ч
+IGNORE_TOP_SPEED_PERCENTILES = 0.05
+
+RE_TIMESTAMP = re.compile(
+    r'^([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})[T ]([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})'
+    r'(\.[0-9]{1,15})?(Z|[+\-−][0-9]{2}:?(?:[0-9]{2})?)?$')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class GPXError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=64)
+def _day_seconds(day):
+    return (datetime.strptime(day, '%Y-%m-%d') - EPOCH) // timedelta(seconds=1)
+
+
+def parse_time(value):
+    """Convert a GPX timestamp to seconds since the epoch."""
+    if not value:
+        return None
+    value = value.strip()
+    # Быстрый путь для самого частого формата: 2022-03-13T10:15:30Z
+    if len(value) == 20 and value[10] == 'T' and value[19] == 'Z':
+        try:
+            return (_day_seconds(value[:10]) + int(value[11:13]) * 3600
+                    + int(value[14:16]) * 60 + int(value[17:19]))
+        except ValueError:
+            pass
+    match = RE_TIMESTAMP.match(value)
+    if not match:
+        raise GPXError(f'Invalid time: {value}')
+    fraction = match.group(7)
+    microsecond = int(fraction[1:7].ljust(6, '0')) if fraction else 0
+    moment = datetime(*(int(match.group(i)) for i in range(1, 7)), microsecond)
+    seconds = (moment - EPOCH) / timedelta(seconds=1)
+    offset = match.group(8)
+    if offset and offset != 'Z':
+        sign = -1 if offset[0] in '-−' else 1
+        offset = offset[1:].replace(':', '')
+        minutes = int(offset[:2]) * 60 + (int(offset[2:4]) if len(offset) >= 4 else 0)
+        seconds -= sign * minutes * 60
+    return seconds
+
+
+def to_datetime(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+@lru_cache(maxsize=None)
+def _local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+def iter_points(file):
+    """Yield ``(latitude, longitude, elevation, time, segment)`` for every trackpoint.
+
+    ``file`` is a path or a binary file object. Segments are numbered
+    consecutively across all tracks of the document.
+    """
+    segment = -1
+    parent = None
+    elevation = point_time = None
+    try:
+        for event, element in iterparse(file, events=('start', 'end')):
+            tag = _local_name(element.tag)
+            if event == 'start':
+                if tag == 'trkseg':
+                    segment += 1
+                    parent = element
+                elif tag == 'trkpt':
+                    elevation = point_time = None
+                continue
+            if tag == 'ele' and parent is not None:
+                elevation = float(element.text) if element.text and element.text.strip() else None
+            elif tag == 'time' and parent is not None:
+                point_time = parse_time(element.text)
+            elif tag == 'trkpt':
+                yield (float(element.get('lat')), float(element.get('lon')),
+                       elevation, point_time, segment)
+                # Освобождаем уже обработанные точки, чтобы дерево не росло
+                parent.clear()
+            elif tag == 'trkseg':
+                element.clear()
+                parent = None
+    except SyntaxError as exc:
+        raise GPXError(str(exc)) from exc
@@ -0,0 +1,186 @@
+"""Personal heatmaps: per-profile tile pyramids of track counts.
+
+For every zoom up to ``HEATMAP_MAX_ZOOM`` a profile has 256x256 count
+rasters, one per Web Mercator tile the profile's tracks touch, stored as
+compressed ``.npz`` files in ``HEATMAP_DIR/v<VERSION>/<profile>/<zoom>/``. A pixel holds
+the number of activities that pass through it. ``add()`` and ``remove()``
+rasterize one track and change only the tiles it touches, so uploads and
+deletions never replay the profile's history. A PNG of a tile is rendered on
+first request and kept next to its counts until they change, so serving a
+tile reads one file whatever the number of activities.
+
+Counts are updated under a per-profile file lock (``fcntl``). ``rebuild()``
+(``build_heatmaps``) recomputes a profile from its tracks, e.g. after
+``VERSION`` changes and the heatmaps start over in a new directory.
+"""
+import fcntl
+import io
+import math
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .geo import TILE_SIZE, mercator
+from .tracks import LATITUDE, LONGITUDE, SEGMENT
+
+# Увеличить при изменении растеризации; затем manage.py build_heatmaps
+VERSION = 1
+
+# Сколько проездов дают максимальную яркость
+SATURATION = 20
+
+# Переход цветов от редких проездов к частым: красный - желтый - белый
+COLORS = np.array([(180, 0, 40), (255, 60, 0), (255, 200, 0), (255, 255, 220)], dtype=float)
+
+
+def _profile_dir(profile_id):
+    return Path(settings.HEATMAP_DIR) / f'v{VERSION}' / str(profile_id)
+
+
+def _path(profile_id, zoom, x, y, suffix):
+    return _profile_dir(profile_id) / str(zoom) / f'{x}_{y}{suffix}'
+
+
+@contextmanager
+def _locked(profile_id):
+    directory = _profile_dir(profile_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def track_pixels(track, zoom):
+    """Global pixel indices (``y * width + x``) the track's lines cross at ``zoom``, each once."""
+    latitude, longitude, segment = track[LATITUDE], track[LONGITUDE], track[SEGMENT]
+    if not latitude.shape[0]:
+        return np.empty(0, dtype=np.int64)
+    scale = 2 ** zoom
+    x, y = mercator(latitude, longitude)
+    x, y = x * scale, y * scale
+    # Точки между соседними точками трека через каждый пиксель, чтобы линия была без разрывов
+    dx, dy = np.diff(x), np.diff(y)
+    steps = np.where(segment[1:] == segment[:-1], np.ceil(np.maximum(np.abs(dx), np.abs(dy))), 0).astype(np.int64)
+    starts = np.repeat(np.arange(steps.shape[0]), steps)
+    fraction = (np.arange(starts.shape[0]) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+    x = np.r_[x, x[starts] + fraction * dx[starts]]
+    y = np.r_[y, y[starts] + fraction * dy[starts]]
+    width = TILE_SIZE * scale
+    columns = np.clip(np.floor(x), 0, width - 1).astype(np.int64)
+    rows = np.clip(np.floor(y), 0, width - 1).astype(np.int64)
+    return np.unique(rows * width + columns)
+
+
+def _load_counts(path):
+    try:
+        with np.load(path) as data:
+            return data['counts']
+    except FileNotFoundError:
+        return np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint32)
+
+
+def _write(path, write):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp_file:
+        write(tmp_file)
+    os.replace(tmp, path)
+
+
+def _update(profile_id, track, delta):
+    with _locked(profile_id):
+        for zoom in range(settings.HEATMAP_MAX_ZOOM + 1):
+            pixels = track_pixels(track, zoom)
+            if not pixels.shape[0]:
+                continue
+            width = TILE_SIZE * 2 ** zoom
+            rows, columns = pixels // width, pixels % width
+            tiles = (rows // TILE_SIZE) * (2 ** zoom) + columns // TILE_SIZE
+            local = (rows % TILE_SIZE) * TILE_SIZE + columns % TILE_SIZE
+            order = np.argsort(tiles, kind='stable')
+            tiles, local = tiles[order], local[order]
+            bounds = np.flatnonzero(np.diff(tiles)) + 1
+            (_profile_dir(profile_id) / str(zoom)).mkdir(exist_ok=True)
+            for first, last in zip(np.r_[0, bounds], np.r_[bounds, tiles.shape[0]]):
+                tile_y, tile_x = divmod(int(tiles[first]), 2 ** zoom)
+                path = _path(profile_id, zoom, tile_x, tile_y, '.npz')
+                counts = _load_counts(path).ravel()
+                # Пиксели уникальны, поэтому хватает обычного присваивания по индексам
+                selected = local[first:last]
+                if delta > 0:
+                    counts[selected] += 1
+                else:
+                    counts[selected] = np.maximum(counts[selected], 1) - 1
+                if counts.any():
+                    _write(path, lambda file: np.savez_compressed(file, counts=counts.reshape(TILE_SIZE, TILE_SIZE)))
+                else:
+                    path.unlink(missing_ok=True)
+                _path(profile_id, zoom, tile_x, tile_y, '.png').unlink(missing_ok=True)
+
+
+def add(profile_id, track):
+    _update(profile_id, track, 1)
+
+
+def remove(profile_id, track):
+    _update(profile_id, track, -1)
+
+
+def render_tile(counts):
+    """RGBA image of a count raster: transparent where empty, log-scaled colors elsewhere."""
+    intensity = np.clip(np.log1p(counts) / math.log1p(SATURATION), 0, 1)
+    position = intensity * (len(COLORS) - 1)
+    lower = np.minimum(position.astype(int), len(COLORS) - 2)
+    fraction = (position - lower)[..., None]
+    rgb = COLORS[lower] * (1 - fraction) + COLORS[lower + 1] * fraction
+    alpha = np.where(counts > 0, 120 + 135 * intensity, 0)
+    return Image.fromarray(np.dstack((rgb, alpha)).round().astype(np.uint8), 'RGBA')
+
+
+_empty_tile = None
+
+
+def empty_tile():
+    global _empty_tile
+    if _empty_tile is None:
+        buffer = io.BytesIO()
+        Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0)).save(buffer, format='PNG')
+        _empty_tile = buffer.getvalue()
+    return _empty_tile
+
+
+def tile(profile_id, zoom, x, y):
+    """PNG bytes of the tile, rendered now if not cached; ``None`` when the profile has no tracks there."""
+    png = _path(profile_id, zoom, x, y, '.png')
+    try:
+        return png.read_bytes()
+    except FileNotFoundError:
+        pass
+    counts_path = _path(profile_id, zoom, x, y, '.npz')
+    if not counts_path.exists():
+        return None
+    with _locked(profile_id):
+        if not counts_path.exists():
+            return None
+        buffer = io.BytesIO()
+        render_tile(_load_counts(counts_path)).save(buffer, format='PNG', optimize=True)
+        _write(png, lambda file: file.write(buffer.getvalue()))
+    return buffer.getvalue()
+
+
+def rebuild(profile_id, tracks):
+    """Replace the profile's heatmap with one built from ``tracks``."""
+    with _locked(profile_id):
+        for entry in _profile_dir(profile_id).iterdir():
+            if entry.is_dir():
+                shutil.rmtree(entry)
+    for track in tracks:
+        add(profile_id, track)
@@ -0,0 +1,100 @@
+"""Database-backed queue for track processing.
+
+Jobs live in ``TrackJob``: processing of an uploaded track or matching of a
+new or changed segment against all tracks. Workers (``manage.py process_tracks``) claim them
+with a conditional UPDATE, so several worker processes can share one queue
+without an external broker.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import segments
+from .models import Activity, Segment, TrackJob
+from .processing import process_activity
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(activity):
+    if settings.TRACK_PROCESSING_EAGER:
+        process_activity(activity)
+        return None
+    return TrackJob.objects.create(activity=activity)
+
+
+def enqueue_segment(segment):
+    if settings.TRACK_PROCESSING_EAGER:
+        segments.rematch(segment)
+        return None
+    return TrackJob.objects.create(segment=segment)
+
+
+def claim():
+    """Take the next due job, or return ``None`` when the queue is empty.
+
+    Jobs stuck in ``running`` longer than ``TRACK_JOB_TIMEOUT`` seconds (the
+    worker died) are taken again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TRACK_JOB_TIMEOUT)
+    due = Q(status=TrackJob.Status.PENDING, run_after__lte=now) | Q(status=TrackJob.Status.RUNNING,
+                                                                    locked_at__lt=stale)
+    while True:
+        job = TrackJob.objects.filter(due).order_by('run_after', 'pk').first()
+        if job is None:
+            return None
+        claimed = TrackJob.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at).update(
+            status=TrackJob.Status.RUNNING, locked_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    try:
+        if job.segment_id is not None:
+            segments.rematch(Segment.objects.get(pk=job.segment_id))
+        else:
+            process_activity(Activity.objects.get(pk=job.activity_id))
+    except Exception as exc:
+        if job.segment_id is not None:
+            logger.exception('Segment matching failed for segment %s', job.segment_id)
+        else:
+            logger.exception('Track processing failed for activity %s', job.activity_id)
+        job.error = traceback.format_exc()
+        if job.attempts < settings.TRACK_JOB_MAX_ATTEMPTS:
+            job.status = TrackJob.Status.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.TRACK_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = TrackJob.Status.FAILED
+            Activity.objects.filter(pk=job.activity_id).update(status=Activity.Status.FAILED,
+                                                               processing_error=str(exc))
+        job.save(update_fields=['status', 'run_after', 'error'])
+        return False
+    job.status = TrackJob.Status.DONE
+    job.error = ''
+    job.save(update_fields=['status', 'error'])
+    return True
+
+
+def work(once=False, sleep=1.0):
+    """Process jobs until the queue is empty (``once``) or forever."""
+    processed = 0
+    while True:
+        close_old_connections()
+        job = claim()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(sleep)
+            continue
+        run_job(job)
+        processed += 1
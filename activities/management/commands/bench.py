@@ -0,0 +1,194 @@
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from activities import efforts, map_cache, synthetic
+from activities.models import Activity
+from activities.stats import compute_stats
+from activities.tracks import decode_track
+from activities.utils import get_map
+
+SCENARIOS = ('ingest', 'stats', 'efforts', 'map', 'feed', 'detail', 'detail_cached')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat):
+    """Time ``repeat`` calls; queries and peak memory are taken from two extra calls."""
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        func()
+    # Память меряем отдельным прогоном: tracemalloc сильно замедляет код
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {
+        'ms_min': round(min(timings) * 1000, 3),
+        'ms_median': round(statistics.median(timings) * 1000, 3),
+        'queries': queries.count,
+        'peak_mib': round(peak / 2 ** 20, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Замеряет загрузку трека, статистику, отрисовку карты, ленту и страницу тренировки ' \
+           'на синтетических данных. Результат - JSON (время, число запросов, пиковая память); ' \
+           'данные создаются во временной транзакции и откатываются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=200)
+        parser.add_argument('--follows', type=int, default=30, help='подписок у каждого спортсмена')
+        parser.add_argument('--activities', type=int, default=20000)
+        parser.add_argument('--duration', type=int, default=3600, help='длительность трека, с')
+        parser.add_argument('--interval', type=float, default=1, help='интервал записи точек, с')
+        parser.add_argument('--stops', type=int, default=3)
+        parser.add_argument('--noise', type=float, default=3.0, help='шум GPS, м')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='запустить только эти замеры')
+        parser.add_argument('--output', help='записать JSON в файл вместо вывода')
+        parser.add_argument('--compare', help='JSON предыдущего запуска для сравнения')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать {options["compare"]}: {exc}')
+
+        media_root = tempfile.mkdtemp()
+        try:
+            # Как в production: без DEBUG запросы не журналируются
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost'], MEDIA_ROOT=media_root,
+                                   MAP_CACHE_DIR=f'{media_root}/maps', HEATMAP_DIR=f'{media_root}/heatmaps',
+                                   TRACK_PROCESSING_EAGER=True):
+                with transaction.atomic():
+                    results = self.run(options)
+                    transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {name: options[name] for name in ('profiles', 'follows', 'activities', 'duration',
+                                                         'interval', 'stops', 'noise', 'repeat', 'seed')},
+            'track': self.track_info,
+            'results': results,
+        }
+        data = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(data + '\n')
+        else:
+            self.stdout.write(data)
+        if baseline:
+            self.compare(baseline, report)
+
+    def track(self, options, seed):
+        return synthetic.generate_track(duration=options['duration'], interval=options['interval'],
+                                        stops=options['stops'], noise=options['noise'], seed=seed)
+
+    def run(self, options):
+        only = set(options['only'] or SCENARIOS)
+        repeat = options['repeat']
+        started = time.perf_counter()
+        profiles = synthetic.seed(options['profiles'], options['follows'], options['activities'],
+                                  random_seed=options['seed'])
+        self.stderr.write(f'Данные созданы за {time.perf_counter() - started:.1f} с')
+        reader = profiles[0]
+        gpx = synthetic.to_gpx(self.track(options, options['seed']))
+        self.track_info = {'points': int(decode_track(io.BytesIO(gpx)).shape[1]), 'gpx_bytes': len(gpx)}
+        activity = Activity.objects.create(profile=reader, started_at=synthetic.STARTED_AT,
+                                           track_file=ContentFile(gpx, name='bench.gpx'))
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader)
+        results = {}
+
+        if 'ingest' in only:
+            # Каждая загрузка - новый трек, иначе сработает проверка дубликатов
+            uploads = iter([synthetic.to_gpx(self.track(options, options['seed'] + 1 + i))
+                            for i in range(repeat + 2)])
+            results['ingest'] = measure(lambda: Activity.objects.create(
+                profile=reader, started_at=synthetic.STARTED_AT,
+                track_file=ContentFile(next(uploads), name='bench.gpx')), repeat)
+        if 'stats' in only:
+            results['stats'] = measure(lambda: compute_stats(decode_track(io.BytesIO(gpx))), repeat)
+        if 'efforts' in only:
+            track = decode_track(io.BytesIO(gpx))
+            results['efforts'] = measure(lambda: efforts.compute(track), repeat)
+        if 'map' in only:
+            results['map'] = measure(lambda: get_map(activity), repeat)
+        if 'feed' in only:
+            url = reverse('webinterface:feed')
+            results['feed'] = measure(lambda: self.get(client, url), repeat)
+        if 'detail' in only or 'detail_cached' in only:
+            url = reverse('webinterface:activity_detail', args=[activity.pk])
+
+            def detail():
+                map_cache.invalidate(activity.pk, activity.track_hash)
+                return self.get(client, url)
+
+            if 'detail' in only:
+                results['detail'] = measure(detail, repeat)
+            if 'detail_cached' in only:
+                self.get(client, url)
+                results['detail_cached'] = measure(lambda: self.get(client, url), repeat)
+        return results
+
+    def get(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        return response
+
+    def compare(self, baseline, report):
+        self.stderr.write(f'Сравнение с {baseline.get("commit")} ({baseline.get("created_at")}):')
+        for name, result in report['results'].items():
+            old = baseline.get('results', {}).get(name)
+            if not old:
+                continue
+            ratio = result['ms_median'] / old['ms_median'] if old['ms_median'] else float('inf')
+            self.stderr.write(f'  {name:<14} {old["ms_median"]:>10.1f} -> {result["ms_median"]:>10.1f} мс '
+                              f'(x{ratio:.2f}), запросов {old["queries"]} -> {result["queries"]}, '
+                              f'память {old["peak_mib"]:.1f} -> {result["peak_mib"]:.1f} МиБ')
@@ -0,0 +1,47 @@
+import io
+import time
+import tracemalloc
+
+import gpxpy
+from django.core.management.base import BaseCommand
+
+from activities.stats import compute_stats
+from activities.tracks import decode_track
+
+
+def measure(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    # Память меряем отдельным прогоном: tracemalloc сильно замедляет код
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def parse_gpxpy(data):
+    return gpxpy.parse(io.StringIO(data.decode())).get_moving_data()
+
+
+def parse_numpy(data):
+    return compute_stats(decode_track(io.BytesIO(data)))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время и пиковую память разбора GPX: gpxpy и NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            with open(path, 'rb') as gpx_file:
+                data = gpx_file.read()
+            self.stdout.write(f'{path}: {len(data) / 2 ** 20:.1f} MiB')
+            for name, func in (('gpxpy', parse_gpxpy), ('numpy', parse_numpy)):
+                result, elapsed, peak = measure(func, data)
+                self.stdout.write(f'  {name:<10} {elapsed * 1000:8.0f} ms {peak / 2 ** 20:8.1f} MiB peak  '
+                                  f'distance={result.moving_distance / 1000:.2f} km '
+                                  f'max_speed={result.max_speed:.2f} m/s')
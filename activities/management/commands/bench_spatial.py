@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from activities import spatial
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы к пространственному индексу на синтетических треках. ' \
+           'Данные создаются во временной транзакции и откатываются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tracks', type=int, default=1000000)
+        parser.add_argument('--boxes', type=int, default=4, help='прямоугольников на трек')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        tracks, boxes = options['tracks'], options['boxes']
+        rng = np.random.default_rng(options['seed'])
+        # Треки разбросаны по территории примерно 40x60 градусов, каждый кусок ~1-2 км
+        starts = np.column_stack((rng.uniform(40, 70, tracks), rng.uniform(10, 70, tracks)))
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            for box in range(boxes):
+                corner = starts + rng.normal(0, .01, starts.shape) * box
+                size = rng.uniform(.005, .02, starts.shape)
+                cursor.executemany(
+                    f'INSERT INTO {spatial.TABLE} (id, min_lat, max_lat, min_lon, max_lon, activity_id) '
+                    f'VALUES (%s, %s, %s, %s, %s, %s)',
+                    zip((spatial.rowid(activity_id, box) for activity_id in range(1, tracks + 1)),
+                        corner[:, 0].tolist(), (corner[:, 0] + size[:, 0]).tolist(),
+                        corner[:, 1].tolist(), (corner[:, 1] + size[:, 1]).tolist(), range(1, tracks + 1)),
+                )
+        self.stdout.write(f'Вставлено {tracks * boxes} прямоугольников за {time.perf_counter() - started:.1f} с')
+
+        self.stdout.write(f'{"запрос":>24} {"найдено":>10} {"мс":>10}')
+        for label, bbox in (('квартал 1x1 км', (55.75, 37.6, 55.759, 37.616)),
+                            ('город 20x20 км', (55.6, 37.4, 55.78, 37.72)),
+                            ('область 100x100 км', (55.3, 37.0, 56.2, 38.6))):
+            sql, params = spatial.bbox_sql(*bbox)
+
+            def query():
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+
+            elapsed, rows = timed(query)
+            self.stdout.write(f'{label:>24} {len(rows):>10} {elapsed * 1000:>10.2f}')
+        elapsed, ids = timed(lambda: spatial.near_ids(55.75, 37.62, 1000))
+        self.stdout.write(f'{"радиус 1 км":>24} {len(ids):>10} {elapsed * 1000:>10.2f}')
+        elapsed, _ = timed(lambda: spatial.remove(tracks // 2), repeat=1)
+        self.stdout.write(f'{"удаление треков":>24} {boxes:>10} {elapsed * 1000:>10.2f}')
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from activities import efforts
+from activities.models import Activity
+from activities.tracks import load_track
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Считает отрезки по километрам и лучшие результаты обработанных тренировок, ' \
+           'затем заново собирает личные рекорды'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='пересчитать тренировки, где отрезки уже есть')
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.filter(status=Activity.Status.READY).exclude(track_file='') \
+            .exclude(track_file__isnull=True)
+        if not options['force']:
+            activities = activities.filter(splits__isnull=True)
+        computed = 0
+        profiles = set()
+        started = time.perf_counter()
+        for activity in activities.only('pk', 'profile_id', 'track_file', 'track_data').iterator():
+            efforts.save(activity, load_track(activity))
+            profiles.add(activity.profile_id)
+            computed += 1
+        efforts.rebuild_records(Profile.objects.filter(pk__in=profiles))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Готово: {computed} тренировок за {elapsed:.1f} с'))
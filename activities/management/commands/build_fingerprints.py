@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from activities import fingerprint
+from activities.models import Activity
+from activities.tracks import open_track_file
+
+
+class Command(BaseCommand):
+    help = 'Считает отпечатки треков для тренировок, загруженных до появления проверки дубликатов'
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.filter(fingerprint='').exclude(track_file='').exclude(track_file__isnull=True)
+        updated = failed = 0
+        for activity in activities.only('pk', 'track_file').iterator():
+            try:
+                with open_track_file(activity) as track_file:
+                    data = track_file.read()
+            except OSError as exc:
+                failed += 1
+                self.stderr.write(f'{activity.pk}: {exc}')
+                continue
+            Activity.objects.filter(pk=activity.pk).update(track_hash=fingerprint.raw(data),
+                                                           fingerprint=fingerprint.normalized(data))
+            updated += 1
+        self.stdout.write(self.style.SUCCESS(f'Готово: {updated}, ошибок: {failed}'))
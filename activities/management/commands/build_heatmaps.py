@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from activities import heatmap
+from activities.models import Activity
+from activities.tracks import load_track
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Заново строит личные тепловые карты из обработанных треков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', type=int, nargs='*', help='id спортсменов, по умолчанию все')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options['profiles']:
+            profiles = profiles.filter(pk__in=options['profiles'])
+        for profile in profiles.iterator():
+            started = time.perf_counter()
+            activities = list(Activity.objects.filter(profile=profile, status=Activity.Status.READY)
+                              .exclude(track_file='').exclude(track_file__isnull=True)
+                              .only('pk', 'track_file', 'track_data'))
+            heatmap.rebuild(profile.pk, (load_track(activity) for activity in activities))
+            Activity.objects.filter(profile=profile).exclude(pk__in=[activity.pk for activity in activities]) \
+                .update(in_heatmap=False)
+            Activity.objects.filter(pk__in=[activity.pk for activity in activities]).update(in_heatmap=True)
+            if activities:
+                self.stdout.write(f'{profile}: {len(activities)} тренировок за '
+                                  f'{time.perf_counter() - started:.1f} с')
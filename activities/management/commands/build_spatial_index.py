@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activities import spatial
+from activities.models import Activity
+from activities.tracks import load_track
+
+
+class Command(BaseCommand):
+    help = 'Заполняет пространственный индекс треков для уже загруженных тренировок'
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.filter(status=Activity.Status.READY).exclude(track_file='') \
+            .exclude(track_file__isnull=True)
+        indexed = 0
+        started = time.perf_counter()
+        for activity in activities.iterator():
+            with transaction.atomic():
+                spatial.index_track(activity.pk, load_track(activity))
+            indexed += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Готово: {indexed} треков за {elapsed:.1f} с'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from activities.models import Activity
+from activities.thumbnails import save_thumbnail
+from activities.tracks import load_track
+
+
+class Command(BaseCommand):
+    help = 'Рисует превью маршрутов для тренировок, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='перерисовать существующие превью')
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.filter(status=Activity.Status.READY).exclude(track_file='') \
+            .exclude(track_file__isnull=True)
+        if not options['force']:
+            activities = activities.filter(Q(thumbnail__isnull=True) | Q(thumbnail=''))
+        rendered = 0
+        started = time.perf_counter()
+        for activity in activities.iterator():
+            save_thumbnail(activity, load_track(activity))
+            Activity.objects.filter(pk=activity.pk).update(thumbnail=activity.thumbnail.name)
+            rendered += 1
+        elapsed = time.perf_counter() - started
+        average = elapsed / rendered * 1000 if rendered else 0
+        self.stdout.write(self.style.SUCCESS(f'Готово: {rendered} превью за {elapsed:.1f} с ({average:.0f} мс на превью)'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from activities.models import Activity
+from activities.stats import compute_stats
+from activities.tracks import decode_track, open_track_file, save_track
+from activities.utils import hash_file
+from user_medias.storage import content_hash
+
+
+class Command(BaseCommand):
+    help = 'Разбирает GPX уже загруженных тренировок в колоночный формат (.npy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='пересобрать уже существующие файлы')
+        parser.add_argument('--stats', action='store_true', help='пересчитать статистику тренировок')
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.exclude(track_file='').exclude(track_file__isnull=True)
+        if not options['force']:
+            activities = activities.filter(Q(track_data__isnull=True) | Q(track_data=''))
+        converted = failed = 0
+        for activity in activities.iterator():
+            try:
+                with open_track_file(activity) as track_file:
+                    track = decode_track(track_file)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f'{activity.pk}: {exc}')
+                continue
+            save_track(activity, track)
+            activity.track_hash = content_hash(activity.track_file.name) or hash_file(activity.track_file.path)
+            update_fields = ['track_data', 'track_hash']
+            if options['stats']:
+                activity.apply_stats(compute_stats(track))
+                update_fields += ['max_speed', 'avg_speed', 'distance', 'duration', 'duration_active',
+                                  'elevation_gain']
+            Activity.objects.filter(pk=activity.pk).update(
+                **{field: getattr(activity, field) for field in update_fields})
+            converted += 1
+        self.stdout.write(self.style.SUCCESS(f'Готово: {converted}, ошибок: {failed}'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from activities import totals
+
+
+class Command(BaseCommand):
+    help = 'Сверяет итоги тренировок (TrainingTotals) с полным пересчетом по тренировкам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='пересобрать итоги, если есть расхождения')
+
+    def handle(self, *args, **options):
+        mismatches = totals.check()
+        for (profile_id, activity_type_id, period, start), stored, expected in mismatches:
+            self.stdout.write(f'профиль {profile_id}, тип {activity_type_id}, {period} {start}: '
+                              f'сохранено {tuple(stored)}, ожидается {tuple(expected)}')
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Итоги совпадают с тренировками'))
+            return
+        if options['fix']:
+            totals.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Исправлено расхождений: {len(mismatches)}'))
+            return
+        raise CommandError(f'Расхождений: {len(mismatches)}')
@@ -0,0 +1,41 @@
+import posixpath
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from activities.models import Activity
+from activities.tracks import open_track_file
+
+
+class Command(BaseCommand):
+    help = 'Сжимает файлы треков, загруженные до включения сжатия; тренировки переводятся на сжатые копии'
+
+    def handle(self, *args, **options):
+        field = Activity._meta.get_field('track_file')
+        storage = field.storage
+        activities = Activity.objects.exclude(track_file='').exclude(track_file__isnull=True) \
+            .exclude(track_file__endswith=storage.suffix)
+        compressed = failed = 0
+        # Размеры по именам: один файл может принадлежать нескольким тренировкам
+        before, after = {}, {}
+        for activity in activities.only('pk', 'track_file').iterator():
+            old_name = activity.track_file.name
+            try:
+                size = storage.size(old_name)
+                with open_track_file(activity) as track_file:
+                    name = storage.save(field.generate_filename(activity, posixpath.basename(old_name)),
+                                        File(track_file, name=old_name))
+            except OSError as exc:
+                failed += 1
+                self.stderr.write(f'{activity.pk}: {exc}')
+                continue
+            # update() не вызывает сигналы, ссылку на старый файл освобождаем сами
+            Activity.objects.filter(pk=activity.pk).update(track_file=name)
+            storage.delete(old_name)
+            compressed += 1
+            before[old_name] = size
+            after[name] = storage.size(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Сжато: {compressed}, ошибок: {failed}, '
+            f'{sum(before.values()) / 1024 / 1024:.1f} МБ -> {sum(after.values()) / 1024 / 1024:.1f} МБ'
+        ))
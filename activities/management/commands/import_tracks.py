@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from activities import bulk_import, fingerprint
+from activities.models import Activity, ActivityType
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Импортирует GPX- и FIT-файлы из папки или zip-архива: разбор в пуле процессов, вставка пачками. ' \
+           'Уже импортированные файлы пропускаются, поэтому прерванный импорт можно запустить снова'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='папка или zip-архив с .gpx и .fit')
+        parser.add_argument('--email', required=True, help='спортсмен, которому принадлежат тренировки')
+        parser.add_argument('--type', help='название типа тренировки')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'Нет такого файла или папки: {options["path"]}')
+        try:
+            profile = Profile.objects.get(email=options['email'])
+        except Profile.DoesNotExist:
+            raise CommandError(f'Нет спортсмена {options["email"]}')
+        activity_type = None
+        if options['type']:
+            activity_type, _ = ActivityType.objects.get_or_create(name=options['type'])
+        known = set()
+        for track_hash, track_print in Activity.objects.filter(profile=profile) \
+                .values_list('track_hash', 'fingerprint').iterator():
+            known.update(value for value in (track_hash, track_print) if value)
+
+        self.imported = self.skipped = self.failed = self.points = self.size = 0
+        started = time.perf_counter()
+        batch = []
+        pending = {}
+        # Файлы читаются по мере освобождения воркеров, а не все сразу
+        limit = options['workers'] * 4
+        with ProcessPoolExecutor(options['workers'], initializer=django.setup) as executor:
+            for name, data in bulk_import.iter_files(options['path']):
+                track_hash, track_print = fingerprint.raw(data), fingerprint.normalized(data)
+                if track_hash in known or track_print in known:
+                    self.skipped += 1
+                    continue
+                known.update(value for value in (track_hash, track_print) if value)
+                pending[executor.submit(bulk_import.parse, name, data)] = name, track_hash, track_print, data
+                while len(pending) >= limit:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    self.collect(done, pending, batch, profile, activity_type, options['batch_size'])
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                self.collect(done, pending, batch, profile, activity_type, options['batch_size'])
+        self.flush(batch)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {self.imported}, пропущено (уже есть): {self.skipped}, с ошибками: {self.failed}'
+        ))
+        if elapsed:
+            self.stdout.write(f'{elapsed:.1f} с: {self.imported / elapsed:.1f} файлов/с, '
+                              f'{self.size / elapsed / 1024 / 1024:.1f} МБ/с, {self.points / elapsed:.0f} точек/с')
+
+    def collect(self, done, pending, batch, profile, activity_type, batch_size):
+        for future in done:
+            name, track_hash, track_print, data = pending.pop(future)
+            try:
+                parsed = future.result()
+            except Exception as exc:
+                self.failed += 1
+                self.stderr.write(f'{name}: {exc}')
+                continue
+            activity = bulk_import.build_activity(profile, activity_type, track_hash, track_print, data, parsed)
+            batch.append((activity, parsed))
+            self.points += parsed['points']
+            self.size += len(data)
+            if len(batch) >= batch_size:
+                self.flush(batch)
+
+    def flush(self, batch):
+        if batch:
+            self.imported += len(bulk_import.save_batch(batch))
+            batch.clear()
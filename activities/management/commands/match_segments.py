@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from activities import segments
+from activities.models import Segment
+
+
+class Command(BaseCommand):
+    help = 'Заново ищет попытки на сегментах во всех обработанных треках'
+
+    def add_arguments(self, parser):
+        parser.add_argument('segments', type=int, nargs='*', help='id сегментов, по умолчанию все')
+
+    def handle(self, *args, **options):
+        queryset = Segment.objects.all()
+        if options['segments']:
+            queryset = queryset.filter(pk__in=options['segments'])
+        for segment in queryset:
+            started = time.perf_counter()
+            found = segments.rematch(segment)
+            self.stdout.write(f'{segment}: {found} попыток за {time.perf_counter() - started:.1f} с')
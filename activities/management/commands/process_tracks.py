@@ -0,0 +1,29 @@
+from multiprocessing import Process
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from activities.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди обработки треков (разбор GPX, статистика, превью, поиск попыток на новых сегментах)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='обработать очередь и выйти')
+        parser.add_argument('--workers', type=int, default=1, help='число процессов-воркеров')
+        parser.add_argument('--sleep', type=float, default=1.0, help='пауза при пустой очереди, сек')
+
+    def handle(self, *args, **options):
+        if options['workers'] == 1:
+            processed = work(once=options['once'], sleep=options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
+            return
+        # Соединения с БД не должны переходить в дочерние процессы
+        connections.close_all()
+        processes = [Process(target=work, kwargs={'once': options['once'], 'sleep': options['sleep']})
+                     for _ in range(options['workers'])]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
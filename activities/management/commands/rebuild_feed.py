@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from activities import feed
+from activities.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты (FeedEntry) по текущим подпискам'
+
+    def handle(self, *args, **options):
+        feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {FeedEntry.objects.count()}'))
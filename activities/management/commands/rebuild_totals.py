@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from activities import totals
+from activities.models import TrainingTotals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги тренировок (TrainingTotals) по всем тренировкам'
+
+    def handle(self, *args, **options):
+        totals.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Строк итогов: {TrainingTotals.objects.count()}'))
@@ -0,0 +1,130 @@
+"""Cache of rendered activity maps.
+
+Two tiers: Django's cache framework (``MAP_CACHE_ALIAS``) in front of a
+directory of HTML fragments limited to ``MAP_CACHE_MAX_SIZE`` bytes with LRU
+eviction by file mtime. Keys include the track content hash, so a replaced
+track file never hits a stale map.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .utils import get_map
+
+# Увеличить при изменении отрисовки карты, чтобы сбросить старые фрагменты
+VERSION = 1
+
+COUNTERS = ('memory_hits', 'file_hits', 'misses')
+
+
+class FileCache:
+    def __init__(self, directory, max_size):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def _path(self, key):
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + '.html')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            value = path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        # mtime служит временем последнего обращения для LRU
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+            tmp_file.write(value)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def delete(self, key):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.html'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _cache():
+    return caches[settings.MAP_CACHE_ALIAS]
+
+
+def _file_cache():
+    return FileCache(settings.MAP_CACHE_DIR, settings.MAP_CACHE_MAX_SIZE)
+
+
+def _key(activity_id, track_hash):
+    return f'map:{VERSION}:{activity_id}:{track_hash}'
+
+
+def _count(name):
+    cache = _cache()
+    key = f'map:counter:{name}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def stats():
+    values = _cache().get_many([f'map:counter:{name}' for name in COUNTERS])
+    return {name: values.get(f'map:counter:{name}', 0) for name in COUNTERS}
+
+
+def peek(activity):
+    """Map HTML from the memory tier only, ``None`` on a miss; never reads the disk or renders."""
+    html = _cache().get(_key(activity.pk, activity.track_hash))
+    if html is not None:
+        _count('memory_hits')
+    return html
+
+
+def cached_map(activity):
+    """Rendered map HTML of the activity, built with ``get_map`` only on a miss."""
+    html = peek(activity)
+    if html is not None:
+        return html
+    key = _key(activity.pk, activity.track_hash)
+    html = _file_cache().get(key)
+    if html is not None:
+        _count('file_hits')
+    else:
+        _count('misses')
+        html = get_map(activity)
+        _file_cache().set(key, html)
+    _cache().set(key, html, timeout=None)
+    return html
+
+
+def invalidate(activity_id, track_hash):
+    key = _key(activity_id, track_hash)
+    _cache().delete(key)
+    _file_cache().delete(key)
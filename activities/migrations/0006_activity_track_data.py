@@ -0,0 +1,22 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0005_activity_avg_speed_activity_duration_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='activity',
+            options={'ordering': ['-created_at'], 'verbose_name': 'тренировка', 'verbose_name_plural': 'тренировки'},
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='track_data',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='tracks', verbose_name='разобранный трек'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0006_activity_track_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='elevation_gain',
+            field=models.DecimalField(blank=True, decimal_places=2, default=0.0, max_digits=10, null=True, verbose_name='набор высоты'),
+        ),
+    ]
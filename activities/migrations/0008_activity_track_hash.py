@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0007_activity_elevation_gain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='track_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='хеш файла тренировки'),
+        ),
+    ]
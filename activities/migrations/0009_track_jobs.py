@@ -0,0 +1,46 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0008_activity_track_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='processing_error',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='ошибка обработки'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='status',
+            field=models.CharField(choices=[('processing', 'обрабатывается'), ('ready', 'готова'), ('failed', 'ошибка обработки')], default='ready', editable=False, max_length=16, verbose_name='статус обработки'),
+        ),
+        migrations.CreateModel(
+            name='TrackJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'в очереди'), ('running', 'выполняется'), ('done', 'выполнена'), ('failed', 'ошибка')], default='pending', max_length=16, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='выполнить после')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='взята в работу')),
+                ('error', models.TextField(blank=True, default='', verbose_name='ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='создана')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='activities.activity', verbose_name='тренировка')),
+            ],
+            options={
+                'verbose_name': 'задача обработки трека',
+                'verbose_name_plural': 'задачи обработки треков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trackjob',
+            index=models.Index(fields=['status', 'run_after'], name='activities__status_14d779_idx'),
+        ),
+    ]
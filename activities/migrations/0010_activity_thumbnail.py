@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0009_track_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='thumbnails', verbose_name='превью маршрута'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('profiles', 'Follow')
+    Activity = apps.get_model('activities', 'Activity')
+    FeedEntry = apps.get_model('activities', 'FeedEntry')
+    for follow in Follow.objects.all():
+        activities = Activity.objects.filter(profile_id=follow.following_id).order_by('-created_at')[:200]
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(owner_id=follow.user_id, activity_id=activity.pk, author_id=follow.following_id,
+                       created_at=activity.created_at) for activity in activities],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0010_activity_thumbnail'),
+        ('profiles', '0005_profile_followers_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='дата загрузки')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='activities.activity', verbose_name='тренировка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='автор')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='чья лента')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', '-created_at', '-activity'], name='feed_entry_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', 'author'], name='feed_entry_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'activity'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['profile', '-created_at', '-id'], name='activity_profile_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Min
+
+
+def fill_covers(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    for activity in Activity.objects.annotate(first_media=Min('medias')).filter(first_media__isnull=False):
+        Activity.objects.filter(pk=activity.pk).update(cover_id=activity.first_media)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_medias', '0002_alter_activitymedia_options'),
+        ('activities', '0012_activity_profile_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='card_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='версия карточки'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='cover',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='user_medias.activitymedia', verbose_name='обложка'),
+        ),
+        migrations.RunPython(fill_covers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:34
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def fill_totals(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    TrainingTotals = apps.get_model('activities', 'TrainingTotals')
+    rows = {}
+    for activity in Activity.objects.iterator():
+        day = timezone.localtime(activity.started_at).date()
+        starts = {
+            'week': day - datetime.timedelta(days=day.weekday()),
+            'month': day.replace(day=1),
+            'year': day.replace(month=1, day=1),
+        }
+        for period, start in starts.items():
+            key = activity.profile_id, activity.activity_type_id, period, start
+            row = rows.setdefault(key, TrainingTotals(profile_id=key[0], activity_type_id=key[1],
+                                                      period=period, period_start=start))
+            row.distance += activity.distance or 0
+            row.moving_time += activity.duration_active or datetime.timedelta(0)
+            row.count += 1
+    TrainingTotals.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0013_activity_cover_card_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'неделя'), ('month', 'месяц'), ('year', 'год')], max_length=8, verbose_name='период')),
+                ('period_start', models.DateField(verbose_name='начало периода')),
+                ('distance', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='дистанция')),
+                ('moving_time', models.DurationField(default=datetime.timedelta(0), verbose_name='время в движении')),
+                ('count', models.IntegerField(default=0, verbose_name='тренировок')),
+                ('activity_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='activities.activitytype', verbose_name='тип тренировки')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_totals', to=settings.AUTH_USER_MODEL, verbose_name='спортсмен')),
+            ],
+            options={
+                'verbose_name': 'итоги тренировок',
+                'verbose_name_plural': 'итоги тренировок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trainingtotals',
+            constraint=models.UniqueConstraint(fields=('profile', 'period', 'period_start', 'activity_type'), name='unique_training_totals'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
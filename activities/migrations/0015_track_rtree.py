@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE activities_track_rtree USING rtree('
+            'id, min_lat, max_lat, min_lon, max_lon, +activity_id INTEGER)'
+        )
+    else:
+        # Без R-tree: обычная таблица с теми же колонками. Типы берем у бэкенда,
+        # id не автоинкрементный - spatial.index_track всегда задает его сам
+        types = schema_editor.connection.data_types
+        integer, real = types['BigIntegerField'], types['FloatField']
+        schema_editor.execute(
+            f'CREATE TABLE activities_track_rtree (id {integer} PRIMARY KEY, min_lat {real}, max_lat {real}, '
+            f'min_lon {real}, max_lon {real}, activity_id {integer} NOT NULL)'
+        )
+        schema_editor.execute('CREATE INDEX activities_track_rtree_activity ON activities_track_rtree (activity_id)')
+        schema_editor.execute('CREATE INDEX activities_track_rtree_lat ON activities_track_rtree (min_lat, max_lat)')
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE activities_track_rtree')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0014_training_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0015_track_rtree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='название')),
+                ('points', models.JSONField(help_text='список пар [широта, долгота]', verbose_name='точки')),
+                ('distance', models.FloatField(default=0, editable=False, verbose_name='длина, м')),
+                ('min_lat', models.FloatField(default=0, editable=False)),
+                ('max_lat', models.FloatField(default=0, editable=False)),
+                ('min_lon', models.FloatField(default=0, editable=False)),
+                ('max_lon', models.FloatField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата создания')),
+            ],
+            options={
+                'verbose_name': 'сегмент',
+                'verbose_name_plural': 'сегменты',
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentEffort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='время начала')),
+                ('elapsed_time', models.DurationField(verbose_name='время')),
+                ('start_index', models.PositiveIntegerField(verbose_name='первая точка трека')),
+                ('end_index', models.PositiveIntegerField(verbose_name='последняя точка трека')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_efforts', to='activities.activity', verbose_name='тренировка')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='спортсмен')),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='efforts', to='activities.segment', verbose_name='сегмент')),
+            ],
+            options={
+                'verbose_name': 'попытка на сегменте',
+                'verbose_name_plural': 'попытки на сегментах',
+                'ordering': ['elapsed_time'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='segment',
+            index=models.Index(fields=['min_lat', 'max_lat', 'min_lon', 'max_lon'], name='segment_bbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='segmenteffort',
+            index=models.Index(fields=['segment', 'elapsed_time'], name='segment_effort_time_idx'),
+        ),
+    ]
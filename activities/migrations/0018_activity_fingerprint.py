@@ -0,0 +1,26 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0017_alter_activity_track_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='отпечаток трека'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['profile', 'track_hash'], name='activity_profile_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['profile', 'fingerprint'], name='activity_profile_print_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:56
+
+from django.db import migrations, models
+import user_medias.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0018_activity_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activity',
+            name='track_file',
+            field=models.FileField(blank=True, null=True, storage=user_medias.storage.CompressedContentStorage(), upload_to='activities', verbose_name='файл тренировки'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.0.3 on 2026-10-17 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0019_track_file_compressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestEffort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('1km', '1 км'), ('5km', '5 км'), ('10km', '10 км'), ('20min', '20 минут')], max_length=8, verbose_name='дистанция или время')),
+                ('distance', models.FloatField(verbose_name='дистанция, м')),
+                ('elapsed_time', models.DurationField(verbose_name='время')),
+                ('started_at', models.DateTimeField(verbose_name='время начала')),
+                ('start_index', models.PositiveIntegerField(verbose_name='первая точка трека')),
+                ('end_index', models.PositiveIntegerField(verbose_name='последняя точка трека')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_efforts', to='activities.activity', verbose_name='тренировка')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='спортсмен')),
+            ],
+            options={
+                'verbose_name': 'лучший результат',
+                'verbose_name_plural': 'лучшие результаты',
+            },
+        ),
+        migrations.CreateModel(
+            name='Split',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField(verbose_name='номер')),
+                ('distance', models.FloatField(verbose_name='дистанция, м')),
+                ('elapsed_time', models.DurationField(verbose_name='время')),
+                ('moving_time', models.DurationField(verbose_name='время в движении')),
+                ('elevation_change', models.FloatField(blank=True, null=True, verbose_name='изменение высоты, м')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='splits', to='activities.activity', verbose_name='тренировка')),
+            ],
+            options={
+                'verbose_name': 'отрезок',
+                'verbose_name_plural': 'отрезки',
+                'ordering': ['number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('1km', '1 км'), ('5km', '5 км'), ('10km', '10 км'), ('20min', '20 минут')], max_length=8, verbose_name='дистанция или время')),
+                ('effort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='activities.besteffort', verbose_name='результат')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL, verbose_name='спортсмен')),
+            ],
+            options={
+                'verbose_name': 'личный рекорд',
+                'verbose_name_plural': 'личные рекорды',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='split',
+            constraint=models.UniqueConstraint(fields=('activity', 'number'), name='unique_split'),
+        ),
+        migrations.AddConstraint(
+            model_name='personalrecord',
+            constraint=models.UniqueConstraint(fields=('profile', 'kind'), name='unique_personal_record'),
+        ),
+        migrations.AddIndex(
+            model_name='besteffort',
+            index=models.Index(fields=['profile', 'kind', 'elapsed_time'], name='best_effort_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='besteffort',
+            index=models.Index(fields=['profile', 'kind', '-distance'], name='best_effort_distance_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='besteffort',
+            constraint=models.UniqueConstraint(fields=('activity', 'kind'), name='unique_best_effort'),
+        ),
+    ]
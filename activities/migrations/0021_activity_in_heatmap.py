@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-17 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0020_splits_best_efforts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='in_heatmap',
+            field=models.BooleanField(default=False, editable=False, verbose_name='учтена в тепловой карте'),
+        ),
+    ]
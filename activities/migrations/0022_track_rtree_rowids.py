@@ -0,0 +1,40 @@
+from django.db import migrations
+
+TABLE = 'activities_track_rtree'
+ROWIDS = 'activities_track_rtree_rowids'
+ROWID_BITS = 20
+BATCH_SIZE = 2000
+
+
+def renumber(apps, schema_editor):
+    # Прямоугольники тренировки получают rowid подряд с (activity_id << ROWID_BITS).
+    # Таблица не читается в память целиком: новые rowid пишутся пачками во вспомогательную
+    # таблицу, а сами прямоугольники переписываются внутри базы
+    connection = schema_editor.connection
+    integer = connection.data_types['BigIntegerField']
+    schema_editor.execute(f'CREATE TABLE {ROWIDS} (old_id {integer} PRIMARY KEY, new_id {integer} NOT NULL)')
+    indexes = {}
+    with connection.chunked_cursor() as rows, connection.cursor() as cursor:
+        rows.execute(f'SELECT id, activity_id FROM {TABLE} ORDER BY id')
+        while batch := rows.fetchmany(BATCH_SIZE):
+            boxes = []
+            for old_id, activity_id in batch:
+                index = indexes.get(activity_id, 0)
+                indexes[activity_id] = index + 1
+                boxes.append((old_id, (activity_id << ROWID_BITS) + index))
+            cursor.executemany(f'INSERT INTO {ROWIDS} (old_id, new_id) VALUES (%s, %s)', boxes)
+    # Сначала уводим старые rowid в отрицательные, чтобы они не пересеклись с новыми
+    schema_editor.execute(f'UPDATE {TABLE} SET id = -id')
+    schema_editor.execute(f'UPDATE {TABLE} SET id = (SELECT new_id FROM {ROWIDS} WHERE old_id = -{TABLE}.id)')
+    schema_editor.execute(f'DROP TABLE {ROWIDS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0021_activity_in_heatmap'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0.3 on 2026-10-17 01:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0022_track_rtree_rowids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackjob',
+            name='segment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='activities.segment', verbose_name='сегмент'),
+        ),
+        migrations.AlterField(
+            model_name='trackjob',
+            name='activity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='activities.activity', verbose_name='тренировка'),
+        ),
+    ]
@@ -1,16 +1,26 @@
-import folium
-import gpxpy
-import io
-
-from PIL import Image
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from django.contrib.auth import get_user_model
 from datetime import timedelta, time
 
+from user_medias.storage import compressed_storage
+from . import map_cache
+
 Profile = get_user_model()
 
 
+class DuplicateActivity(ValidationError):
+    """The uploaded track is already stored for this profile (``activity`` is the original)."""
+
+    def __init__(self, activity):
+        super(DuplicateActivity, self).__init__(
+            {'track_file': f'Эта тренировка уже загружена: {activity.title}'}, code='duplicate')
+        self.activity = activity
+
+
 class ActivityType(models.Model):
     class Meta:
         verbose_name = 'тип тренировки'
@@ -27,6 +37,16 @@ class Activity(models.Model):
         verbose_name = 'тренировка'
         verbose_name_plural = 'тренировки'
         ordering = ['-created_at', ]
+        indexes = [
+            models.Index(fields=['profile', '-created_at', '-id'], name='activity_profile_created_idx'),
+            models.Index(fields=['profile', 'track_hash'], name='activity_profile_hash_idx'),
+            models.Index(fields=['profile', 'fingerprint'], name='activity_profile_print_idx'),
+        ]
+
+    class Status(models.TextChoices):
+        PROCESSING = 'processing', 'обрабатывается'
+        READY = 'ready', 'готова'
+        FAILED = 'failed', 'ошибка обработки'
 
     title = models.CharField(max_length=255, default='',
                              blank=True, null=True,
@@ -46,53 +66,359 @@ class Activity(models.Model):
                                     verbose_name='средняя скорость')
     max_speed = models.DecimalField(default=0.00, blank=True, null=True, decimal_places=2, max_digits=10,
                                     verbose_name='максимальная скорость')
+    elevation_gain = models.DecimalField(default=0.00, blank=True, null=True, decimal_places=2, max_digits=10,
+                                         verbose_name='набор высоты')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата загрузки')
     started_at = models.DateTimeField(verbose_name='время начала тренировки')
-    track_file = models.FileField(blank=True, null=True, upload_to='activities', verbose_name='файл тренировки')
+    track_file = models.FileField(blank=True, null=True, upload_to='activities', storage=compressed_storage,
+                                  verbose_name='файл тренировки')
+    track_data = models.FileField(blank=True, null=True, upload_to='tracks', editable=False,
+                                  verbose_name='разобранный трек')
+    thumbnail = models.ImageField(blank=True, null=True, upload_to='thumbnails', editable=False,
+                                  verbose_name='превью маршрута')
+    track_hash = models.CharField(max_length=64, blank=True, default='', editable=False,
+                                  verbose_name='хеш файла тренировки')
+    fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False,
+                                   verbose_name='отпечаток трека')
+    cover = models.ForeignKey('user_medias.ActivityMedia', related_name='+', blank=True, null=True,
+                              on_delete=models.SET_NULL, editable=False, verbose_name='обложка')
+    card_version = models.PositiveIntegerField(default=0, editable=False, verbose_name='версия карточки')
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.READY, editable=False,
+                              verbose_name='статус обработки')
+    processing_error = models.TextField(blank=True, default='', editable=False,
+                                        verbose_name='ошибка обработки')
+    in_heatmap = models.BooleanField(default=False, editable=False, verbose_name='учтена в тепловой карте')
+
+    _loaded_track = (None, '')
+    # Состояние, уже учтенное в TrainingTotals (см. activities.totals)
+    _totals_state = None
 
     def __str__(self):
         return f'{self.profile.email}: {self.title} {self.created_at}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Activity, cls).from_db(db, field_names, values)
+        # Запоминаем исходный трек, чтобы заметить его замену при сохранении
+        instance._loaded_track = instance.__dict__.get('track_file'), instance.__dict__.get('track_hash')
+        if {'profile_id', 'activity_type_id', 'started_at', 'distance', 'duration_active'} <= set(field_names):
+            instance._totals_state = instance.totals_state()
+        return instance
+
+    def totals_state(self):
+        return self.profile_id, self.activity_type_id, self.started_at, self.distance, self.duration_active
+
+    def track_changed(self):
+        return bool(self.track_file) and self.track_file.name != self._loaded_track[0]
+
+    def _track_file_chunks(self):
+        if self.track_file._committed:
+            with self.track_file.storage.open(self.track_file.name, 'rb') as track_file:
+                yield from track_file.chunks()
+            return
+        # Загруженный, но еще не сохраненный файл: читаем, не закрывая
+        upload = self.track_file.file
+        yield from upload.chunks()
+        upload.seek(0)
+
+    def fingerprint_track(self):
+        """Fill ``track_hash`` and ``fingerprint`` from the raw bytes of the new track file.
+
+        Done once per file: ``clean()`` and ``save()`` of a form upload share the result.
+        """
+        from . import fingerprint
+        if getattr(self, '_fingerprinted', None) == self.track_file.name:
+            return
+        self.track_hash, self.fingerprint = fingerprint.of_chunks(self._track_file_chunks())
+        self._fingerprinted = self.track_file.name
+
+    def find_duplicate(self):
+        """Activity of the same profile with the same file or the same recorded track."""
+        same = Q(track_hash=self.track_hash)
+        if self.fingerprint:
+            same |= Q(fingerprint=self.fingerprint)
+        return Activity.objects.filter(same, profile_id=self.profile_id).exclude(pk=self.pk).first()
+
+    def check_duplicate(self):
+        if self.track_changed():
+            self.fingerprint_track()
+            duplicate = self.find_duplicate()
+            if duplicate is not None:
+                raise DuplicateActivity(duplicate)
+
+    def clean(self):
+        super(Activity, self).clean()
+        self.check_duplicate()
+
+    def default_title(self):
+        if time(hour=5) <= self.started_at.time() <= time(hour=12):
+            return 'Утренняя тренировка'
+        elif time(hour=12, minute=1) <= self.started_at.time() <= time(hour=18):
+            return 'Вечерняя тренировка'
+        elif time(hour=18, minute=1) <= self.started_at.time() <= time(hour=23):
+            return 'Вечерняя тренировка'
+        elif time(hour=23, minute=1) <= self.started_at.time() or \
+                self.started_at.time() <= time(hour=5):
+            return 'Ночная тренировка'
+
+    def apply_stats(self, stats):
+        self.max_speed = stats.max_speed
+        if stats.moving_time:
+            self.avg_speed = (stats.moving_distance / 1000) / (stats.moving_time / 3600)
+        self.distance = stats.moving_distance / 1000
+        self.duration = timedelta(seconds=(stats.moving_time + stats.stopped_time))
+        self.duration_active = timedelta(seconds=stats.moving_time)
+        self.elevation_gain = stats.elevation_gain
+
     def save(
             self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
-        create = not self.pk
         if self.title == '' or self.title is None:
-            if time(hour=5) <= self.started_at.time() <= time(hour=12):
-                self.title = 'Утренняя тренировка'
-            elif time(hour=12, minute=1) <= self.started_at.time() <= time(hour=18):
-                self.title = 'Вечерняя тренировка'
-            elif time(hour=18, minute=1) <= self.started_at.time() <= time(hour=23):
-                self.title = 'Вечерняя тренировка'
-            elif time(hour=23, minute=1) <= self.started_at.time() or \
-                    self.started_at.time() <= time(hour=5):
-                self.title = 'Ночная тренировка'
+            self.title = self.default_title()
+        loaded_name, loaded_hash = self._loaded_track
+        track_changed = self.track_changed()
+        if track_changed:
+            # Повторная загрузка отклоняется до записи файла и разбора трека
+            self.check_duplicate()
+            self.status = self.Status.PROCESSING
+            self.processing_error = ''
         super(Activity, self).save(force_insert=force_insert, force_update=force_update, using=using,
                                    update_fields=update_fields)
 
-        if create and self.track_file:
-            print(self.track_file.path)
-            gpx_file = open(self.track_file.path, 'r')
-            gpx = gpxpy.parse(gpx_file)
-
-            # TODO: Этот кусок рисует точки на карте, а потом рендерит в картинку. Его потом сделаем как микросервис
-            # points = []
-            # for track in gpx.tracks:
-            #     for segment in track.segments:
-            #         for point in segment.points:
-            #             points.append(tuple([point.latitude, point.longitude]))
-            # latitude = sum(p[0] for p in points) / len(points)
-            # longitude = sum(p[1] for p in points) / len(points)
-            # folium_map = folium.Map(location=[latitude, longitude], zoom_start=10)
-            # folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(folium_map)
-            # img = folium_map._to_png(5)
-            # output = Image.open(io.BytesIO(img))
-            moving_data = gpx.get_moving_data()
-            self.max_speed = moving_data.max_speed
-            self.avg_speed = (moving_data.moving_distance / 1000) / (moving_data.moving_time / 3600)
-            self.distance = moving_data.moving_distance / 1000
-            self.duration = timedelta(seconds=(moving_data.moving_time + moving_data.stopped_time))
-            self.duration_active = timedelta(seconds=moving_data.moving_time)
-            super(Activity, self).save(force_insert=force_insert, force_update=force_update, using=using,
-                                       update_fields=update_fields)
-            # output.save('media/pictures/test.png')
+        if track_changed:
+            # Разбор трека, статистика и прочее делаются воркером process_tracks
+            if loaded_hash:
+                map_cache.invalidate(self.pk, loaded_hash)
+            self._loaded_track = self.track_file.name, loaded_hash
+            from .jobs import enqueue
+            enqueue(self)
+
+
+class TrackJob(models.Model):
+    class Meta:
+        verbose_name = 'задача обработки трека'
+        verbose_name_plural = 'задачи обработки треков'
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'в очереди'
+        RUNNING = 'running', 'выполняется'
+        DONE = 'done', 'выполнена'
+        FAILED = 'failed', 'ошибка'
+
+    # Задача либо обрабатывает трек тренировки, либо ищет попытки на сегменте во всех треках
+    activity = models.ForeignKey(Activity, related_name='jobs', on_delete=models.CASCADE, blank=True, null=True,
+                                 verbose_name='тренировка')
+    segment = models.ForeignKey('Segment', related_name='jobs', on_delete=models.CASCADE, blank=True, null=True,
+                                verbose_name='сегмент')
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING,
+                              verbose_name='статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='выполнить после')
+    locked_at = models.DateTimeField(blank=True, null=True, verbose_name='взята в работу')
+    error = models.TextField(blank=True, default='', verbose_name='ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='создана')
+
+    def __str__(self):
+        target = self.activity_id if self.segment_id is None else f'сегмент {self.segment_id}'
+        return f'{target}: {self.get_status_display()}'
+
+
+class FeedEntry(models.Model):
+    """Activity materialized into a follower's feed (fan-out on write)."""
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'activity'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-activity'], name='feed_entry_timeline_idx'),
+            models.Index(fields=['owner', 'author'], name='feed_entry_author_idx'),
+        ]
+
+    owner = models.ForeignKey(Profile, related_name='feed_entries', on_delete=models.CASCADE,
+                              verbose_name='чья лента')
+    activity = models.ForeignKey(Activity, related_name='feed_entries', on_delete=models.CASCADE,
+                                 verbose_name='тренировка')
+    author = models.ForeignKey(Profile, related_name='+', on_delete=models.CASCADE,
+                               verbose_name='автор')
+    created_at = models.DateTimeField(verbose_name='дата загрузки')
+
+    def __str__(self):
+        return f'{self.owner_id}: {self.activity_id}'
+
+
+class TrainingTotals(models.Model):
+    """Per-profile totals for a week, month or year, maintained incrementally."""
+
+    class Meta:
+        verbose_name = 'итоги тренировок'
+        verbose_name_plural = 'итоги тренировок'
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'period', 'period_start', 'activity_type'],
+                                    name='unique_training_totals'),
+        ]
+
+    class Period(models.TextChoices):
+        WEEK = 'week', 'неделя'
+        MONTH = 'month', 'месяц'
+        YEAR = 'year', 'год'
+
+    profile = models.ForeignKey(Profile, related_name='training_totals', on_delete=models.CASCADE,
+                                verbose_name='спортсмен')
+    activity_type = models.ForeignKey(ActivityType, blank=True, null=True, on_delete=models.CASCADE,
+                                      verbose_name='тип тренировки')
+    period = models.CharField(max_length=8, choices=Period.choices, verbose_name='период')
+    period_start = models.DateField(verbose_name='начало периода')
+    distance = models.DecimalField(default=0, max_digits=12, decimal_places=2, verbose_name='дистанция')
+    moving_time = models.DurationField(default=timedelta(0), verbose_name='время в движении')
+    count = models.IntegerField(default=0, verbose_name='тренировок')
+
+    def __str__(self):
+        return f'{self.profile_id}: {self.get_period_display()} {self.period_start}'
+
+
+class Segment(models.Model):
+    """Named polyline; efforts on it are found in every processed track."""
+
+    class Meta:
+        verbose_name = 'сегмент'
+        verbose_name_plural = 'сегменты'
+        indexes = [
+            models.Index(fields=['min_lat', 'max_lat', 'min_lon', 'max_lon'], name='segment_bbox_idx'),
+        ]
+
+    name = models.CharField(max_length=255, verbose_name='название')
+    points = models.JSONField(verbose_name='точки', help_text='список пар [широта, долгота]')
+    distance = models.FloatField(default=0, editable=False, verbose_name='длина, м')
+    min_lat = models.FloatField(default=0, editable=False)
+    max_lat = models.FloatField(default=0, editable=False)
+    min_lon = models.FloatField(default=0, editable=False)
+    max_lon = models.FloatField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        super(Segment, self).clean()
+        points = self.points
+        valid = isinstance(points, list) and len(points) >= 2 and all(
+            isinstance(point, list) and len(point) == 2
+            and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in point)
+            and -90 <= point[0] <= 90 and -180 <= point[1] <= 180
+            for point in points
+        )
+        if not valid:
+            raise ValidationError({'points': 'Нужен список хотя бы из двух пар [широта, долгота] в градусах'})
+
+    def save(self, *args, **kwargs):
+        from .segments import polyline_length
+        latitudes = [point[0] for point in self.points]
+        longitudes = [point[1] for point in self.points]
+        self.min_lat, self.max_lat = min(latitudes), max(latitudes)
+        self.min_lon, self.max_lon = min(longitudes), max(longitudes)
+        self.distance = polyline_length(self.points)
+        super(Segment, self).save(*args, **kwargs)
+
+
+class SegmentEffort(models.Model):
+    class Meta:
+        verbose_name = 'попытка на сегменте'
+        verbose_name_plural = 'попытки на сегментах'
+        ordering = ['elapsed_time']
+        indexes = [
+            models.Index(fields=['segment', 'elapsed_time'], name='segment_effort_time_idx'),
+        ]
+
+    segment = models.ForeignKey(Segment, related_name='efforts', on_delete=models.CASCADE, verbose_name='сегмент')
+    activity = models.ForeignKey(Activity, related_name='segment_efforts', on_delete=models.CASCADE,
+                                 verbose_name='тренировка')
+    profile = models.ForeignKey(Profile, related_name='+', on_delete=models.CASCADE, verbose_name='спортсмен')
+    started_at = models.DateTimeField(verbose_name='время начала')
+    elapsed_time = models.DurationField(verbose_name='время')
+    start_index = models.PositiveIntegerField(verbose_name='первая точка трека')
+    end_index = models.PositiveIntegerField(verbose_name='последняя точка трека')
+
+    def __str__(self):
+        return f'{self.segment}: {self.elapsed_time}'
+
+
+class Split(models.Model):
+    """One kilometer of an activity; the last split may be shorter."""
+
+    class Meta:
+        verbose_name = 'отрезок'
+        verbose_name_plural = 'отрезки'
+        ordering = ['number']
+        constraints = [
+            models.UniqueConstraint(fields=['activity', 'number'], name='unique_split'),
+        ]
+
+    activity = models.ForeignKey(Activity, related_name='splits', on_delete=models.CASCADE,
+                                 verbose_name='тренировка')
+    number = models.PositiveSmallIntegerField(verbose_name='номер')
+    distance = models.FloatField(verbose_name='дистанция, м')
+    elapsed_time = models.DurationField(verbose_name='время')
+    moving_time = models.DurationField(verbose_name='время в движении')
+    elevation_change = models.FloatField(blank=True, null=True, verbose_name='изменение высоты, м')
+
+    def __str__(self):
+        return f'{self.activity_id}: {self.number} км'
+
+
+class BestEffort(models.Model):
+    """Fastest fixed distance or longest distance in a fixed time within one activity."""
+
+    class Meta:
+        verbose_name = 'лучший результат'
+        verbose_name_plural = 'лучшие результаты'
+        constraints = [
+            models.UniqueConstraint(fields=['activity', 'kind'], name='unique_best_effort'),
+        ]
+        indexes = [
+            models.Index(fields=['profile', 'kind', 'elapsed_time'], name='best_effort_time_idx'),
+            models.Index(fields=['profile', 'kind', '-distance'], name='best_effort_distance_idx'),
+        ]
+
+    class Kind(models.TextChoices):
+        KM_1 = '1km', '1 км'
+        KM_5 = '5km', '5 км'
+        KM_10 = '10km', '10 км'
+        MIN_20 = '20min', '20 минут'
+
+    activity = models.ForeignKey(Activity, related_name='best_efforts', on_delete=models.CASCADE,
+                                 verbose_name='тренировка')
+    profile = models.ForeignKey(Profile, related_name='+', on_delete=models.CASCADE, verbose_name='спортсмен')
+    kind = models.CharField(max_length=8, choices=Kind.choices, verbose_name='дистанция или время')
+    distance = models.FloatField(verbose_name='дистанция, м')
+    elapsed_time = models.DurationField(verbose_name='время')
+    started_at = models.DateTimeField(verbose_name='время начала')
+    start_index = models.PositiveIntegerField(verbose_name='первая точка трека')
+    end_index = models.PositiveIntegerField(verbose_name='последняя точка трека')
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.elapsed_time}, {self.distance:.0f} м'
+
+
+class PersonalRecord(models.Model):
+    """Best of a profile's ``BestEffort`` rows of one kind, maintained incrementally."""
+
+    class Meta:
+        verbose_name = 'личный рекорд'
+        verbose_name_plural = 'личные рекорды'
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'kind'], name='unique_personal_record'),
+        ]
+
+    profile = models.ForeignKey(Profile, related_name='personal_records', on_delete=models.CASCADE,
+                                verbose_name='спортсмен')
+    kind = models.CharField(max_length=8, choices=BestEffort.Kind.choices, verbose_name='дистанция или время')
+    effort = models.ForeignKey(BestEffort, related_name='+', on_delete=models.CASCADE, verbose_name='результат')
+
+    def __str__(self):
+        return f'{self.profile_id}: {self.get_kind_display()}'
@@ -0,0 +1,49 @@
+"""Bounded thread pool for CPU-heavy track work called from async views.
+
+At most ``TRACK_POOL_WORKERS`` tasks run at once and ``TRACK_POOL_QUEUE``
+more may wait; beyond that ``run()`` raises ``PoolBusy`` immediately instead
+of queueing, so a burst of slow map renders cannot pile up unbounded work
+and the caller can degrade (e.g. show the page without the map).
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class BoundedPool:
+    def __init__(self, workers, queue):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='tracks')
+        # Семафор, а не очередь executor'а: так задачи сверх лимита отклоняются сразу
+        self.slots = threading.BoundedSemaphore(workers + queue)
+
+    async def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise PoolBusy
+        try:
+            # Контекст копируется, чтобы замеры vsrala.timing попадали в текущий запрос
+            future = self.executor.submit(contextvars.copy_context().run, func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # Слот освобождается по завершении задачи, даже если запрос уже отменен
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def track_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BoundedPool(settings.TRACK_POOL_WORKERS, settings.TRACK_POOL_QUEUE)
+        return _pool
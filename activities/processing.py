@@ -0,0 +1,55 @@
+"""Track processing done by the ``process_tracks`` worker after upload.
+
+A failed job is retried from the start, so every step can be repeated:
+
+* files named by the activity (the track array, the thumbnail) are replaced;
+* database rows (spatial boxes, segment efforts, splits and best efforts,
+  stats) are written in one transaction;
+* heatmap counters are not transactional. The old track is subtracted before
+  its array is replaced and the new one is added after the commit, and
+  ``Activity.in_heatmap`` is written right after each change.
+"""
+from django.db import transaction
+
+from user_medias.storage import content_hash
+from . import efforts, heatmap, segments, spatial
+from .models import Activity
+from .stats import compute_stats
+from .thumbnails import save_thumbnail
+from .tracks import decode_track, load_track, open_track_file, save_track
+from .utils import hash_file
+
+
+def _add_to_heatmap(activity, track):
+    # Флаг пишется сразу после счетчиков: при повторе упавшей задачи трек не добавится дважды
+    heatmap.add(activity.profile_id, track)
+    activity.in_heatmap = True
+    Activity.objects.filter(pk=activity.pk).update(in_heatmap=True)
+
+
+def process_activity(activity):
+    # В дедуплицирующем хранилище хеш уже записан в имени файла
+    activity.track_hash = content_hash(activity.track_file.name) or hash_file(activity.track_file.path)
+    with open_track_file(activity) as track_file:
+        track = decode_track(track_file)
+    if activity.in_heatmap:
+        # Вклад прежнего трека вычитается, пока его разобранная копия еще на месте
+        heatmap.remove(activity.profile_id, load_track(activity))
+        activity.in_heatmap = False
+        Activity.objects.filter(pk=activity.pk).update(in_heatmap=False)
+    save_track(activity, track)
+    save_thumbnail(activity, track)
+
+    with transaction.atomic():
+        spatial.index_track(activity.pk, track)
+        segments.match_activity(activity, track)
+        efforts.save(activity, track)
+        activity.apply_stats(compute_stats(track))
+        activity.status = Activity.Status.READY
+        activity.processing_error = ''
+        activity.save(update_fields=[
+            'track_hash', 'track_data', 'thumbnail', 'status', 'processing_error',
+            'max_speed', 'avg_speed', 'distance', 'duration', 'duration_active', 'elevation_gain',
+        ])
+        transaction.on_commit(lambda: _add_to_heatmap(activity, track))
+    activity._loaded_track = activity.track_file.name, activity.track_hash
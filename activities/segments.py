@@ -0,0 +1,159 @@
+"""Segment matching.
+
+Candidate segments of a track are those whose bounding box intersects the
+track's one (``Segment`` bbox columns), and candidate activities of a new
+segment come from the spatial index (``activities.spatial``), so neither side
+is compared with everything. A candidate pair is then checked with NumPy on
+the columnar track: points are projected to local meters, an effort starts
+near the first point of the segment, ends near the last one, never leaves the
+segment by more than ``SEGMENT_MATCH_TOLERANCE`` and passes every vertex.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import spatial
+from .gpx import ONE_DEGREE, to_datetime
+from .models import Activity, Segment, SegmentEffort
+from .tracks import LATITUDE, LONGITUDE, TIME, load_track
+
+# Сколько элементов матрицы расстояний точка x отрезок считать за раз
+MAX_CELLS = 1 << 20
+
+
+def _project(latitude, longitude, origin):
+    """Planar coordinates in meters around the latitude ``origin``."""
+    return np.column_stack((np.asarray(latitude) * ONE_DEGREE,
+                            np.asarray(longitude) * ONE_DEGREE * math.cos(math.radians(origin))))
+
+
+def polyline_length(points):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return 0.
+    line = _project(points[:, 0], points[:, 1], points[:, 0].mean())
+    return float(np.hypot(*np.diff(line, axis=0).T).sum())
+
+
+def distances_to_line(points, line):
+    """Distance from each of ``points`` (k, 2) to the polyline ``line`` (m, 2)."""
+    if len(line) == 1:
+        return np.hypot(*(points - line[0]).T)
+    start, vector = line[:-1], np.diff(line, axis=0)
+    length2 = (vector ** 2).sum(axis=1)
+    length2[length2 == 0] = 1
+    result = np.empty(len(points))
+    rows = max(1, MAX_CELLS // len(vector))
+    for first in range(0, len(points), rows):
+        x = points[first:first + rows, 0, None] - start[:, 0]
+        y = points[first:first + rows, 1, None] - start[:, 1]
+        position = np.clip((x * vector[:, 0] + y * vector[:, 1]) / length2, 0, 1)
+        x -= position * vector[:, 0]
+        y -= position * vector[:, 1]
+        result[first:first + rows] = (x * x + y * y).min(axis=1)
+    return np.sqrt(result)
+
+
+def _runs(mask):
+    """``(first, last)`` bounds (last exclusive) of consecutive ``True`` values."""
+    edges = np.flatnonzero(np.diff(np.r_[0, mask.astype(np.int8), 0]))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def find_efforts(line, points, tolerance):
+    """``(start, end)`` point indices of every pass along ``line``; both arrays in meters."""
+    if len(points) < 2 or len(line) < 2:
+        return []
+    to_start = np.hypot(*(points - line[0]).T)
+    to_end = np.hypot(*(points - line[-1]).T)
+
+    # Расстояние до линии считаем только для точек рядом с ее рамкой
+    low, high = line.min(axis=0) - tolerance, line.max(axis=0) + tolerance
+    near = ((points >= low) & (points <= high)).all(axis=1)
+    away = ~near
+    away[near] = distances_to_line(points[near], line) > tolerance
+    away_indices = np.flatnonzero(away)
+    end_runs = _runs(to_end <= tolerance)
+
+    efforts = []
+    position = 0
+    for first, last in _runs(to_start <= tolerance):
+        if first < position:
+            continue
+        start = first + int(np.argmin(to_start[first:last]))
+        # Трек должен оставаться у сегмента до финиша
+        next_away = np.searchsorted(away_indices, start)
+        limit = away_indices[next_away] if next_away < len(away_indices) else len(points)
+        for end_first, end_last in end_runs:
+            if end_first < last:
+                continue
+            if end_first >= limit:
+                break
+            end = end_first + int(np.argmin(to_end[end_first:min(end_last, limit)]))
+            if (distances_to_line(line, points[start:end + 1]) <= tolerance).all():
+                efforts.append((int(start), int(end)))
+                position = end + 1
+                break
+    return efforts
+
+
+def _track_efforts(segment, activity, track, tolerance):
+    origin = segment.points[0][0]
+    line = _project([point[0] for point in segment.points], [point[1] for point in segment.points], origin)
+    points = _project(track[LATITUDE], track[LONGITUDE], origin)
+    times = track[TIME]
+    efforts = []
+    for start, end in find_efforts(line, points, tolerance):
+        elapsed = times[end] - times[start]
+        if not elapsed > 0:
+            continue
+        efforts.append(SegmentEffort(segment=segment, activity_id=activity.pk, profile_id=activity.profile_id,
+                                     started_at=to_datetime(float(times[start])),
+                                     elapsed_time=timedelta(seconds=float(elapsed)),
+                                     start_index=start, end_index=end))
+    return efforts
+
+
+def candidate_segments(track, tolerance):
+    latitude, longitude = track[LATITUDE], track[LONGITUDE]
+    d_lat = tolerance / ONE_DEGREE
+    d_lon = d_lat / max(math.cos(math.radians(float(np.abs(latitude).max()))), 1e-6)
+    return Segment.objects.filter(max_lat__gte=latitude.min() - d_lat, min_lat__lte=latitude.max() + d_lat,
+                                  max_lon__gte=longitude.min() - d_lon, min_lon__lte=longitude.max() + d_lon)
+
+
+def match_activity(activity, track):
+    """Replace the segment efforts of the activity with the ones found in ``track``."""
+    tolerance = settings.SEGMENT_MATCH_TOLERANCE
+    efforts = []
+    if track.shape[1] > 1:
+        for segment in candidate_segments(track, tolerance):
+            efforts.extend(_track_efforts(segment, activity, track, tolerance))
+    with transaction.atomic():
+        SegmentEffort.objects.filter(activity=activity).delete()
+        SegmentEffort.objects.bulk_create(efforts)
+    return efforts
+
+
+def rematch(segment, batch_size=500):
+    """Find efforts on ``segment`` in all processed tracks, e.g. after the segment is added."""
+    tolerance = settings.SEGMENT_MATCH_TOLERANCE
+    d_lat = tolerance / ONE_DEGREE
+    d_lon = d_lat / max(math.cos(math.radians(max(abs(segment.min_lat), abs(segment.max_lat)))), 1e-6)
+    activities = spatial.in_bbox(segment.min_lat - d_lat, segment.min_lon - d_lon,
+                                 segment.max_lat + d_lat, segment.max_lon + d_lon,
+                                 Activity.objects.filter(status=Activity.Status.READY))
+    found = 0
+    with transaction.atomic():
+        SegmentEffort.objects.filter(segment=segment).delete()
+        efforts = []
+        for activity in activities.only('pk', 'profile_id', 'track_file', 'track_data').iterator():
+            efforts.extend(_track_efforts(segment, activity, load_track(activity), tolerance))
+            if len(efforts) >= batch_size:
+                found += len(SegmentEffort.objects.bulk_create(efforts))
+                efforts = []
+        found += len(SegmentEffort.objects.bulk_create(efforts))
+    return found
@@ -0,0 +1,118 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from profiles.signals import follow_added, follow_removed
+from user_medias.models import ActivityMedia
+from . import efforts, feed, heatmap, map_cache, spatial, totals
+from .models import Activity
+from .tracks import load_track
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые выводятся в карточке ленты и на странице тренировки
+RENDERED_FIELDS = frozenset({
+    'title', 'description', 'status', 'track_file', 'thumbnail', 'cover', 'distance', 'duration',
+    'duration_active', 'avg_speed', 'max_speed', 'elevation_gain',
+})
+
+
+@receiver(post_delete, sender=Activity)
+def drop_cached_map(sender, instance, **kwargs):
+    if instance.track_hash:
+        map_cache.invalidate(instance.pk, instance.track_hash)
+
+
+@receiver(post_delete, sender=Activity)
+def drop_spatial_index(sender, instance, **kwargs):
+    spatial.remove(instance.pk)
+
+
+@receiver(post_save, sender=Activity)
+def fan_out_activity(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Activity)
+def bump_card_version(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and RENDERED_FIELDS.isdisjoint(update_fields):
+        return
+    # Новая версия делает недействительной закешированную карточку в ленте
+    Activity.objects.filter(pk=instance.pk).update(card_version=F('card_version') + 1)
+    instance.card_version += 1
+
+
+@receiver(post_save, sender=ActivityMedia)
+def media_saved(sender, instance, **kwargs):
+    Activity.objects.filter(pk=instance.activity_id, cover__isnull=True).update(cover=instance)
+    Activity.objects.filter(pk=instance.activity_id).update(card_version=F('card_version') + 1)
+
+
+@receiver(post_delete, sender=ActivityMedia)
+def media_deleted(sender, instance, **kwargs):
+    # Обложка обнуляется через SET_NULL, берем следующее фото тренировки
+    cover = ActivityMedia.objects.filter(activity_id=instance.activity_id).order_by('pk').first()
+    Activity.objects.filter(pk=instance.activity_id, cover__isnull=True).update(cover=cover)
+    Activity.objects.filter(pk=instance.activity_id).update(card_version=F('card_version') + 1)
+
+
+@receiver(follow_added)
+def backfill_feed(sender, user_id, following_id, **kwargs):
+    feed.add_follow(user_id, following_id)
+
+
+@receiver(follow_removed)
+def prune_feed(sender, user_id, following_id, **kwargs):
+    feed.remove_follow(user_id, following_id)
+
+
+@receiver(pre_save, sender=Activity)
+def remember_totals_state(sender, instance, **kwargs):
+    instance._totals_state = totals.stored_state(instance)
+
+
+@receiver(post_save, sender=Activity)
+def update_totals(sender, instance, **kwargs):
+    state = instance.totals_state()
+    totals.update(instance._totals_state, state)
+    instance._totals_state = state
+
+
+@receiver(post_delete, sender=Activity)
+def subtract_totals(sender, instance, **kwargs):
+    totals.update(instance._totals_state or instance.totals_state(), None)
+    instance._totals_state = None
+
+
+@receiver(pre_delete, sender=Activity)
+def remember_records(sender, instance, **kwargs):
+    instance._lost_records = efforts.held_records(instance)
+
+
+@receiver(post_delete, sender=Activity)
+def refill_records(sender, instance, **kwargs):
+    # Рекорды этой тренировки удалены каскадом, на их место - следующие лучшие результаты
+    lost = getattr(instance, '_lost_records', ())
+    if lost:
+        efforts.update_records(instance.profile_id, [], lost)
+
+
+@receiver(pre_delete, sender=Activity)
+def subtract_heatmap(sender, instance, **kwargs):
+    if not instance.in_heatmap:
+        return
+    try:
+        # Копия в памяти: файлы трека удаляются вместе с тренировкой
+        track = np.array(load_track(instance))
+    except (OSError, ValueError):
+        # Удаление не должно срываться из-за битого трека; тепловую карту исправит build_heatmaps
+        logger.warning('Cannot subtract activity %s from the heatmap', instance.pk, exc_info=True)
+        return
+    profile_id = instance.profile_id
+    # Файлы тепловой карты не откатываются вместе с транзакцией удаления
+    transaction.on_commit(lambda: heatmap.remove(profile_id, track))
@@ -0,0 +1,62 @@
+"""Ramer–Douglas–Peucker simplification with precomputed levels of detail.
+
+Instead of simplifying once per tolerance, RDP is run once and every point gets
+a *significance*: the largest tolerance (in zoom 0 Web Mercator pixels) at
+which RDP still keeps it. Selecting ``significance > tolerance / 2 ** zoom``
+gives exactly the RDP result for that zoom, so any level of detail is a single
+vectorized comparison.
+"""
+import numpy as np
+from django.conf import settings
+
+from .geo import MAX_ZOOM, mercator
+
+
+def significance(x, y, floor=0.):
+    """RDP significance of every point of the polyline ``(x, y)``.
+
+    Subproblems whose largest deviation is below ``floor`` are not split
+    further and their inner points get significance ``0``.
+    """
+    size = len(x)
+    result = np.zeros(size)
+    if size:
+        result[0] = result[-1] = np.inf
+    stack = [(0, size - 1, np.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = np.hypot(dx, dy)
+        if length:
+            deviation = np.abs(px * dy - py * dx) / length
+        else:
+            deviation = np.hypot(px, py)
+        index = int(deviation.argmax())
+        value = float(deviation[index])
+        if value <= floor:
+            continue
+        # Точка не может быть значимее отрезка, внутри которого её нашли
+        value = min(value, parent)
+        index += first + 1
+        result[index] = value
+        stack.append((first, index, value))
+        stack.append((index, last, value))
+    return result
+
+
+def track_significance(latitude, longitude, segment):
+    tolerance = settings.TRACK_SIMPLIFY_TOLERANCE
+    x, y = mercator(latitude, longitude)
+    result = np.empty(len(latitude))
+    bounds = np.flatnonzero(np.diff(segment)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(latitude)]):
+        result[start:stop] = significance(x[start:stop], y[start:stop], floor=tolerance / 2 ** MAX_ZOOM)
+    return result
+
+
+def detail_mask(detail, zoom):
+    """Points visible at ``zoom`` with the configured pixel tolerance."""
+    return detail > settings.TRACK_SIMPLIFY_TOLERANCE / 2 ** zoom
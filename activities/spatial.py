@@ -0,0 +1,118 @@
+"""Spatial index over tracks.
+
+Every track is cut into chunks of ``CHUNK_POINTS`` points and the bounding
+box of each chunk is stored in an SQLite R-tree (``TABLE``), so finding the
+activities that pass through an area is an index lookup instead of reading
+every track. The table is created by migration ``0015_track_rtree``; on
+other databases it is an ordinary table with the same columns.
+
+Auxiliary R-tree columns such as ``activity_id`` are not indexed, so boxes
+are found by rowid instead: the boxes of an activity get consecutive rowids
+starting at ``rowid(activity_id, 0)``.
+"""
+import math
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .gpx import ONE_DEGREE
+from .models import Activity
+from .tracks import LATITUDE, LONGITUDE, SEGMENT
+
+TABLE = 'activities_track_rtree'
+CHUNK_POINTS = 256
+
+# На активность отводится 2**ROWID_BITS rowid - больше, чем кусков в любом треке
+ROWID_BITS = 20
+
+
+def track_boxes(track, chunk=CHUNK_POINTS):
+    """``(min_lat, max_lat, min_lon, max_lon)`` of consecutive chunks of every segment.
+
+    Neighbouring chunks share a point, so the line between them is covered too.
+    """
+    latitude, longitude, segment = track[LATITUDE], track[LONGITUDE], track[SEGMENT]
+    size = latitude.shape[0]
+    if not size:
+        return []
+    bounds = [0, *(segment[1:] != segment[:-1]).nonzero()[0] + 1, size]
+    boxes = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        for first in range(start, max(end - 1, start + 1), chunk):
+            last = min(first + chunk + 1, end)
+            lat, lon = latitude[first:last], longitude[first:last]
+            boxes.append((float(lat.min()), float(lat.max()), float(lon.min()), float(lon.max())))
+    return boxes
+
+
+def rowid(activity_id, index):
+    return (activity_id << ROWID_BITS) + index
+
+
+def remove(activity_id):
+    """Delete the activity's boxes one rowid lookup at a time, up to the first missing rowid."""
+    with connection.cursor() as cursor:
+        for index in range(1 << ROWID_BITS):
+            cursor.execute(f'DELETE FROM {TABLE} WHERE id = %s', [rowid(activity_id, index)])
+            if cursor.rowcount < 1:
+                break
+
+
+def index_track(activity_id, track):
+    """Replace the boxes of the activity with the boxes of ``track``."""
+    remove(activity_id)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (id, min_lat, max_lat, min_lon, max_lon, activity_id) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)',
+            [(rowid(activity_id, index), *box, activity_id) for index, box in enumerate(track_boxes(track))],
+        )
+
+
+def _where(min_lat, min_lon, max_lat, max_lon):
+    condition = 'max_lat >= %s AND min_lat <= %s AND max_lon >= %s AND min_lon <= %s'
+    if min_lon <= max_lon:
+        return condition, [min_lat, max_lat, min_lon, max_lon]
+    # Прямоугольник через 180-й меридиан делим на два
+    return f'(({condition}) OR ({condition}))', [min_lat, max_lat, min_lon, 180, min_lat, max_lat, -180, max_lon]
+
+
+def bbox_sql(min_lat, min_lon, max_lat, max_lon):
+    where, params = _where(min_lat, min_lon, max_lat, max_lon)
+    return f'SELECT DISTINCT activity_id FROM {TABLE} WHERE {where}', params
+
+
+def in_bbox(min_lat, min_lon, max_lat, max_lon, queryset=None):
+    """Activities with a part of the track inside the bounding box."""
+    queryset = Activity.objects.all() if queryset is None else queryset
+    return queryset.filter(pk__in=RawSQL(*bbox_sql(min_lat, min_lon, max_lat, max_lon)))
+
+
+def _box_distance(latitude, longitude, box):
+    """Distance in meters from the point to the nearest point of the box (flat approximation)."""
+    min_lat, max_lat, min_lon, max_lon = box
+    d_lat = max(min_lat - latitude, 0, latitude - max_lat)
+    d_lon = max(min_lon - longitude, 0, longitude - max_lon)
+    return math.hypot(d_lat, d_lon * math.cos(math.radians(latitude))) * ONE_DEGREE
+
+
+def near_ids(latitude, longitude, radius):
+    """Ids of activities passing within ``radius`` meters of the point (precision of one chunk box)."""
+    d_lat = radius / ONE_DEGREE
+    d_lon = min(d_lat / max(math.cos(math.radians(latitude)), 1e-6), 180)
+    min_lon, max_lon = longitude - d_lon, longitude + d_lon
+    if d_lon >= 180:
+        min_lon, max_lon = -180, 180
+    else:
+        min_lon = min_lon + 360 if min_lon < -180 else min_lon
+        max_lon = max_lon - 360 if max_lon > 180 else max_lon
+    where, params = _where(max(latitude - d_lat, -90), min_lon, min(latitude + d_lat, 90), max_lon)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT activity_id, min_lat, max_lat, min_lon, max_lon FROM {TABLE} WHERE {where}', params)
+        return {row[0] for row in cursor.fetchall() if _box_distance(latitude, longitude, row[1:]) <= radius}
+
+
+def near(latitude, longitude, radius, queryset=None):
+    """Activities passing within ``radius`` meters of the point."""
+    queryset = Activity.objects.all() if queryset is None else queryset
+    return queryset.filter(pk__in=near_ids(latitude, longitude, radius))
@@ -0,0 +1,107 @@
+"""Vectorized track statistics.
+
+Works on the columnar arrays from ``activities.tracks`` and reproduces
+``gpxpy`` ``get_moving_data()`` / ``get_uphill_downhill()`` with NumPy batch
+operations instead of per-point Python code.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .gpx import EARTH_RADIUS, IGNORE_TOP_SPEED_PERCENTILES, ONE_DEGREE, STOPPED_SPEED_THRESHOLD
+from .tracks import ELEVATION, LATITUDE, LONGITUDE, SEGMENT, TIME
+
+TrackStats = namedtuple('TrackStats', 'moving_time stopped_time moving_distance stopped_distance '
+                                      'max_speed elevation_gain elevation_loss')
+
+
+def step_distances(track):
+    """Distances in meters between consecutive points (``n - 1`` values).
+
+    Same formula as ``gpxpy.geo.distance``: flat approximation for close points,
+    haversine for points more than 0.2 degrees apart, elevation included when
+    both points have a non-zero elevation.
+    """
+    latitude, longitude, elevation = track[LATITUDE], track[LONGITUDE], track[ELEVATION]
+    lat1, lat2 = latitude[1:], latitude[:-1]
+    d_lat = lat1 - lat2
+    d_lon = longitude[1:] - longitude[:-1]
+
+    flat = np.hypot(d_lat, d_lon * np.cos(np.radians(lat1))) * ONE_DEGREE
+    with np.errstate(invalid='ignore'):
+        has_elevation = (elevation[1:] != 0) & (elevation[:-1] != 0) \
+            & ~np.isnan(elevation[1:]) & ~np.isnan(elevation[:-1])
+    d_ele = np.where(has_elevation, elevation[1:] - elevation[:-1], 0)
+    flat = np.where(d_ele != 0, np.sqrt(flat ** 2 + d_ele ** 2), flat)
+
+    far = (np.abs(d_lat) > .2) | (np.abs(d_lon) > .2)
+    if far.any():
+        r_lat1, r_lat2 = np.radians(lat1[far]), np.radians(lat2[far])
+        a = np.sin((r_lat1 - r_lat2) / 2) ** 2 \
+            + np.sin(np.radians(d_lon[far]) / 2) ** 2 * np.cos(r_lat1) * np.cos(r_lat2)
+        flat[far] = EARTH_RADIUS * 2 * np.arcsin(np.sqrt(a))
+    return flat
+
+
+def _max_speed(speeds, distances, segments):
+    """Per-segment gpxpy max speed: drop nonstandard distances and the top 5% of speeds."""
+    max_speed = 0.
+    for segment in np.unique(segments):
+        mask = segments == segment
+        seg_distances = distances[mask]
+        if seg_distances.size < 2:
+            continue
+        deviation = np.abs(seg_distances - seg_distances.mean())
+        filtered = np.sort(speeds[mask][deviation <= seg_distances.std() * 1.5])
+        if not filtered.size:
+            continue
+        index = int(filtered.size * (1 - IGNORE_TOP_SPEED_PERCENTILES))
+        max_speed = max(max_speed, float(filtered[min(index, filtered.size - 1)]))
+    return max_speed
+
+
+def elevation_change(track):
+    """Uphill and downhill in meters after the 0.3/0.4/0.3 smoothing gpxpy uses."""
+    elevation = track[ELEVATION]
+    known = ~np.isnan(elevation)
+    elevation, segments = elevation[known], track[SEGMENT][known]
+    if elevation.size < 2:
+        return 0., 0.
+    smoothed = elevation.copy()
+    inner = (segments[:-2] == segments[1:-1]) & (segments[1:-1] == segments[2:])
+    smoothed[1:-1] = np.where(inner, elevation[:-2] * .3 + elevation[1:-1] * .4 + elevation[2:] * .3,
+                              elevation[1:-1])
+    delta = np.diff(smoothed)[segments[1:] == segments[:-1]]
+    return float(delta[delta > 0].sum()), float(-delta[delta < 0].sum())
+
+
+def compute_stats(track, stopped_speed_threshold=STOPPED_SPEED_THRESHOLD):
+    if track.shape[1] < 2:
+        return TrackStats(0., 0., 0., 0., 0., 0., 0.)
+
+    distances = step_distances(track)
+    seconds = np.diff(track[TIME])
+    segments = track[SEGMENT][1:]
+    with np.errstate(invalid='ignore'):
+        valid = (segments == track[SEGMENT][:-1]) & (seconds > 0) & (distances != 0)
+    distances, seconds, segments = distances[valid], seconds[valid], segments[valid]
+
+    speed_kmh = (distances / 1000) / (seconds / 3600)
+    moving = speed_kmh > stopped_speed_threshold
+
+    # Как и gpxpy, скорости учитываются только после первого движения в сегменте
+    moved = np.cumsum(moving)
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    before = np.repeat(np.r_[0, moved][starts], np.diff(np.r_[starts, segments.size]))
+    counted = moved > before
+
+    uphill, downhill = elevation_change(track)
+    return TrackStats(
+        moving_time=float(seconds[moving].sum()),
+        stopped_time=float(seconds[~moving].sum()),
+        moving_distance=float(distances[moving].sum()),
+        stopped_distance=float(distances[~moving].sum()),
+        max_speed=_max_speed(distances[counted] / seconds[counted], distances[counted], segments[counted]),
+        elevation_gain=uphill,
+        elevation_loss=downhill,
+    )
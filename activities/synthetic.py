@@ -0,0 +1,108 @@
+"""Synthetic tracks and data sets for benchmarks (``manage.py bench``).
+
+``generate_track`` simulates a recording: constant sampling, a wandering
+heading, stops where the position only jitters, GPS noise and rolling
+elevation. ``seed`` fills the database with profiles, a random follow graph
+and activities without track files, enough for realistic feed queries.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from profiles.models import Follow, Profile
+from . import feed
+from .gpx import ONE_DEGREE
+from .models import Activity
+
+STARTED_AT = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+
+GPX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<gpx version="1.1" creator="vsrala" xmlns="http://www.topografix.com/GPX/1/1">\n')
+
+
+def generate_track(duration=3600, interval=1, speed=7.0, stops=2, stop_duration=120, noise=3.0,
+                   start=(55.75, 37.61), started_at=STARTED_AT, seed=0):
+    """``(lat, lon, ele, datetime, segment)`` tuples of a ``duration`` seconds ride.
+
+    ``interval`` - seconds between points, ``speed`` - mean speed in m/s,
+    ``stops`` - number of stops of ``stop_duration`` seconds, ``noise`` -
+    standard deviation of the GPS error in meters.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(duration // interval) + 1
+    seconds = np.arange(count) * interval
+    moving = np.ones(count, dtype=bool)
+    for stop_start in rng.uniform(0, max(duration - stop_duration, 0), stops):
+        moving[(seconds >= stop_start) & (seconds < stop_start + stop_duration)] = False
+
+    heading = rng.uniform(0, 2 * math.pi) + np.cumsum(rng.normal(0, .05 * math.sqrt(interval), count))
+    steps = np.where(moving, speed * interval * rng.lognormal(0, .15, count), 0)
+    steps[0] = 0
+    north = np.cumsum(steps * np.cos(heading)) + rng.normal(0, noise, count)
+    east = np.cumsum(steps * np.sin(heading)) + rng.normal(0, noise, count)
+    latitudes = start[0] + north / ONE_DEGREE
+    longitudes = start[1] + east / (ONE_DEGREE * math.cos(math.radians(start[0])))
+    distance = np.cumsum(steps)
+    elevations = 150 + 20 * np.sin(distance / 1500) + 5 * np.sin(distance / 270 + rng.uniform(0, 6)) \
+        + rng.normal(0, .3, count)
+
+    return [(latitude, longitude, round(elevation, 1), started_at + timedelta(seconds=second), 0)
+            for latitude, longitude, elevation, second in zip(latitudes.tolist(), longitudes.tolist(),
+                                                              elevations.tolist(), seconds.tolist())]
+
+
+def to_gpx(track):
+    chunks = [GPX_HEADER, '<trk><name>synthetic</name>']
+    current = None
+    for latitude, longitude, elevation, moment, segment in track:
+        if segment != current:
+            if current is not None:
+                chunks.append('</trkseg>')
+            chunks.append('<trkseg>')
+            current = segment
+        chunks.append(f'<trkpt lat="{latitude:.7f}" lon="{longitude:.7f}"><ele>{elevation}</ele>'
+                      f'<time>{moment.strftime("%Y-%m-%dT%H:%M:%SZ")}</time></trkpt>\n')
+    chunks.append('</trkseg></trk></gpx>\n')
+    return ''.join(chunks).encode()
+
+
+def seed(profiles=100, follows=20, activities=10000, random_seed=0, batch_size=1000):
+    """Create profiles, each following ``follows`` others, ``activities`` activities and their feeds.
+
+    Activities have statistics but no track files. Returns the created profiles.
+    """
+    rng = np.random.default_rng(random_seed)
+    prefix = f'bench-{rng.integers(1 << 32):08x}'
+    created = Profile.objects.bulk_create(
+        [Profile(email=f'{prefix}-{i}@example.com', password='!') for i in range(profiles)],
+        batch_size=batch_size,
+    )
+    ids = [profile.pk for profile in created]
+
+    followers = dict.fromkeys(ids, 0)
+    pairs = []
+    for user_id in ids:
+        others = [pk for pk in rng.choice(ids, size=min(follows + 1, profiles), replace=False).tolist()
+                  if pk != user_id][:follows]
+        for following_id in others:
+            pairs.append(Follow(user_id=user_id, following_id=following_id))
+            followers[following_id] += 1
+    Follow.objects.bulk_create(pairs, batch_size=batch_size)
+    for profile in created:
+        profile.followers_count = followers[profile.pk]
+    Profile.objects.bulk_update(created, ['followers_count'], batch_size=batch_size)
+
+    authors = rng.choice(ids, size=activities).tolist()
+    offsets = np.sort(rng.uniform(0, 365 * 24 * 3600, activities)).tolist()
+    distances = rng.uniform(5, 120, activities).round(2).tolist()
+    Activity.objects.bulk_create(
+        [Activity(profile_id=author, title=f'Тренировка {i}', started_at=STARTED_AT + timedelta(seconds=offset),
+                  distance=distance, duration=timedelta(seconds=distance * 150),
+                  duration_active=timedelta(seconds=distance * 130), avg_speed=27.7,
+                  status=Activity.Status.READY)
+         for i, (author, offset, distance) in enumerate(zip(authors, offsets, distances))],
+        batch_size=batch_size,
+    )
+    feed.rebuild(created)
+    return created
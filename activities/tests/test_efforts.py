@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from activities import efforts
+from activities.gpx import ONE_DEGREE
+from activities.models import Activity, BestEffort, PersonalRecord, Split
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from activities.tracks import build_track
+from profiles.models import Profile
+
+STARTED_AT = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+KIND = BestEffort.Kind
+
+
+def steady_track(speed=5., duration=3060, stop=(500, 560)):
+    """Straight ride north at ``speed`` m/s, one point per second, standing still during ``stop``."""
+    points = []
+    latitude = 55.
+    for second in range(duration + 1):
+        if second and not stop[0] < second <= stop[1]:
+            latitude += speed / ONE_DEGREE
+        points.append((latitude, 37., 150., STARTED_AT.timestamp() + second, 0))
+    return build_track(points)
+
+
+class ComputeTest(SimpleTestCase):
+    def test_splits(self):
+        splits, _ = efforts.compute(steady_track())
+        assert len(splits) == 15
+        assert all(abs(split.distance - 1000) < 1e-6 for split in splits)
+        self.assertAlmostEqual(splits[0].elapsed, 200, delta=.01)
+        # Остановка на 2500 м попадает в третий километр
+        self.assertAlmostEqual(splits[2].elapsed, 260, delta=.01)
+        self.assertAlmostEqual(splits[2].moving, 200, delta=.01)
+        assert splits[0].elevation_change == 0
+
+    def test_best_efforts(self):
+        result = {effort.kind: effort for effort in efforts.compute(steady_track())[1]}
+        self.assertAlmostEqual(result[KIND.KM_1].elapsed, 200, delta=.01)
+        self.assertAlmostEqual(result[KIND.KM_5].elapsed, 1000, delta=.01)
+        # 10 км только после остановки: 2500 с пути
+        self.assertAlmostEqual(result[KIND.KM_10].elapsed, 2000, delta=.01)
+        assert result[KIND.KM_10].start >= 560
+        self.assertAlmostEqual(result[KIND.MIN_20].distance, 6000, delta=.1)
+        self.assertAlmostEqual(result[KIND.MIN_20].started_at - STARTED_AT.timestamp(),
+                               result[KIND.MIN_20].end - 1200, delta=1)
+
+    def test_short_track(self):
+        splits, found = efforts.compute(steady_track(duration=100, stop=(0, 0)))
+        assert len(splits) == 1 and abs(splits[0].distance - 500) < 1e-6
+        assert found == []
+        assert efforts.compute(build_track([])) == ([], [])
+
+
+class PersonalRecordTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='records@mail.ru')
+
+    def ride(self, speed):
+        activity = Activity.objects.create(profile=self.profile, started_at=STARTED_AT)
+        efforts.save(activity, steady_track(speed=speed))
+        return activity
+
+    def record(self, kind):
+        return PersonalRecord.objects.select_related('effort').get(profile=self.profile, kind=kind).effort
+
+    def test_records_follow_best_efforts(self):
+        slow = self.ride(4)
+        assert self.record(KIND.KM_1).activity_id == slow.pk
+        fast = self.ride(5)
+        assert self.record(KIND.KM_1).activity_id == fast.pk
+        assert self.record(KIND.MIN_20).activity_id == fast.pk
+
+        # Медленная тренировка не читает историю, только текущие рекорды
+        with CaptureQueriesContext(connection) as queries:
+            self.ride(3)
+        assert not [query for query in queries.captured_queries
+                    if '"activities_besteffort"."profile_id" =' in query['sql']]
+        assert self.record(KIND.KM_5).activity_id == fast.pk
+
+        fast.delete()
+        assert self.record(KIND.KM_1).activity_id == slow.pk
+        assert PersonalRecord.objects.filter(profile=self.profile).count() == 4
+
+    def test_reprocessing_record_holder(self):
+        slow = self.ride(4)
+        fast = self.ride(5)
+        efforts.save(fast, steady_track(speed=3))
+        assert self.record(KIND.KM_10).activity_id == slow.pk
+        assert Split.objects.filter(activity=fast).count() == 9
+
+    def test_pages(self):
+        activity = self.ride(5)
+        self.client.force_login(self.profile)
+        content = self.client.get(reverse('webinterface:training_stats')).content.decode()
+        assert 'Личные рекорды' in content and reverse('webinterface:activity_detail', args=[activity.pk]) in content
+        content = self.client.get(reverse('webinterface:activity_detail', args=[activity.pk])).content.decode()
+        assert 'Лучшие результаты' in content and 'Отрезки' in content
+
+
+class ProcessingTest(TemporaryMediaMixin, TestCase):
+    def test_computed_at_upload(self):
+        profile = Profile.objects.create(email='splits@mail.ru')
+        activity = Activity.objects.create(profile=profile, started_at=STARTED_AT,
+                                           track_file=ContentFile(make_gpx(make_track(points=900)), name='ride.gpx'))
+        splits = list(activity.splits.all())
+        assert splits and sum(split.distance for split in splits) > 1000
+        assert activity.best_efforts.filter(kind=KIND.KM_1).exists()
+        assert PersonalRecord.objects.filter(profile=profile, kind=KIND.KM_1).exists()
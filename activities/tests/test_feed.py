@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+from django.test import TestCase, override_settings
+
+from activities import feed
+from activities.models import Activity, FeedEntry
+from profiles.models import Follow, Profile
+from webinterface.pagination import CursorPaginator
+
+
+@override_settings(FEED_FANOUT_LIMIT=2)
+class FeedTest(TestCase):
+    def setUp(self):
+        self.reader = Profile.objects.create(email='reader@mail.ru')
+        self.author = Profile.objects.create(email='author@mail.ru')
+
+    def timeline(self):
+        return CursorPaginator(feed.timeline(self.reader), 50).page().object_list
+
+    def create_activity(self, profile):
+        return Activity.objects.create(profile=profile, started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc))
+
+    def test_fan_out_on_create(self):
+        Follow.objects.create(user=self.reader, following=self.author)
+        activity = self.create_activity(self.author)
+        assert list(self.timeline()) == [activity]
+        assert FeedEntry.objects.get().author == self.author
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        activities = [self.create_activity(self.author) for _ in range(3)]
+        self.reader.follows.add(self.author)
+        self.author.refresh_from_db()
+        assert self.author.followers_count == 1
+        assert list(self.timeline()) == activities[::-1]
+        self.reader.follows.remove(self.author)
+        self.author.refresh_from_db()
+        assert self.author.followers_count == 0
+        assert not FeedEntry.objects.exists()
+
+    def test_delete_activity_removes_entries(self):
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.create_activity(self.author).delete()
+        assert not FeedEntry.objects.exists()
+
+    def test_celebrity_pulled_at_read_time(self):
+        for i in range(3):
+            Follow.objects.create(user=Profile.objects.create(email=f'fan{i}@mail.ru'), following=self.author)
+        Follow.objects.create(user=self.reader, following=self.author)
+        other = Profile.objects.create(email='other@mail.ru')
+        Follow.objects.create(user=self.reader, following=other)
+        first = self.create_activity(self.author)
+        second = self.create_activity(other)
+        assert not FeedEntry.objects.filter(activity=first).exists()
+        assert list(self.timeline()) == [second, first]
+
+    def test_crossing_fanout_limit(self):
+        fans = [Profile.objects.create(email=f'fan{i}@mail.ru') for i in range(2)]
+        for fan in fans:
+            Follow.objects.create(user=fan, following=self.author)
+        activity = self.create_activity(self.author)
+        assert FeedEntry.objects.filter(activity=activity).count() == 2
+
+        follow = Follow.objects.create(user=self.reader, following=self.author)
+        assert not FeedEntry.objects.filter(author=self.author).exists()
+        assert list(self.timeline()) == [activity]
+
+        follow.delete()
+        assert set(FeedEntry.objects.filter(activity=activity).values_list('owner', flat=True)) == \
+            {fan.pk for fan in fans}
+
+    def test_rebuild(self):
+        Follow.objects.create(user=self.reader, following=self.author)
+        activity = self.create_activity(self.author)
+        FeedEntry.objects.all().delete()
+        feed.rebuild()
+        assert list(self.timeline()) == [activity]
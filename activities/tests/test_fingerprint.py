@@ -0,0 +1,89 @@
+import io
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from activities import fingerprint
+from activities.models import Activity, DuplicateActivity, TrackJob
+from activities.tests.utils import make_gpx, make_track
+from profiles.models import Profile
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class FingerprintTest(TestCase):
+    def test_normalized_survives_reexport(self):
+        data = make_gpx(make_track(points=300))
+        # Другое устройство: больше знаков, другой порядок атрибутов, префикс пространства имен
+        reexported = data.replace(b'<trkpt lat="', b'<g:trkpt lon="0" lat="').replace(b'</trkpt>', b'</g:trkpt>')
+        reexported = reexported.replace(b'lon="0" lat="', b'lat="').replace(b'" lon="', b'0" lon="')
+        assert fingerprint.raw(reexported) != fingerprint.raw(data)
+        assert fingerprint.normalized(reexported) == fingerprint.normalized(data)
+
+    def test_different_tracks(self):
+        first = make_gpx(make_track(points=300))
+        assert fingerprint.normalized(first) != fingerprint.normalized(make_gpx(make_track(points=301)))
+        assert fingerprint.normalized(first) != fingerprint.normalized(make_gpx(make_track(points=300, seed=2)))
+        assert fingerprint.normalized(b'<gpx></gpx>') == ''
+
+    def test_chunks(self):
+        data = make_gpx(make_track(points=300))
+        for size in (7, 1000, len(data)):
+            assert fingerprint.of_chunks(data[i:i + size] for i in range(0, len(data), size)) == \
+                (fingerprint.raw(data), fingerprint.normalized(data))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DuplicateUploadTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.profile = Profile.objects.create(email='twice@mail.ru')
+        self.data = make_gpx(make_track(points=300))
+
+    def upload(self, data, profile=None):
+        return Activity.objects.create(profile=profile or self.profile,
+                                       started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+                                       track_file=ContentFile(data, name='ride.gpx'))
+
+    def test_duplicate_rejected_before_processing(self):
+        original = self.upload(self.data)
+        assert original.fingerprint and TrackJob.objects.count() == 1
+        for data in (self.data, self.data.replace(b'<name>test</name>', b'<name>sync</name>')):
+            with self.assertRaises(DuplicateActivity) as error:
+                self.upload(data)
+            assert error.exception.activity == original
+        assert Activity.objects.count() == 1 and TrackJob.objects.count() == 1
+
+        activity = Activity(profile=self.profile, started_at=original.started_at,
+                            track_file=ContentFile(self.data, name='ride.gpx'))
+        with self.assertRaises(ValidationError) as error:
+            activity.full_clean()
+        assert 'track_file' in error.exception.message_dict
+        # Другой спортсмен может загрузить такой же файл
+        self.upload(self.data, Profile.objects.create(email='friend@mail.ru'))
+
+    def test_form_upload_fingerprinted_once(self):
+        activity = Activity(profile=self.profile, started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+                            track_file=ContentFile(self.data, name='ride.gpx'))
+        with mock.patch('activities.fingerprint.of_chunks', wraps=fingerprint.of_chunks) as of_chunks:
+            activity.full_clean()
+            activity.save()
+        assert of_chunks.call_count == 1
+        assert activity.track_hash == fingerprint.raw(self.data)
+
+    def test_backfill(self):
+        original = self.upload(self.data)
+        Activity.objects.filter(pk=original.pk).update(fingerprint='')
+        call_command('build_fingerprints', stdout=io.StringIO())
+        original.refresh_from_db()
+        assert original.fingerprint == fingerprint.normalized(self.data)
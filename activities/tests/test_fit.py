@@ -0,0 +1,85 @@
+import io
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
+
+from activities import fit, gpx
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_fit, make_gpx, make_track
+from activities.tracks import LATITUDE, SEGMENT, TIME, decode_track
+from profiles.models import Profile
+
+
+class FITDecoderTest(SimpleTestCase):
+    def test_same_points_as_gpx(self):
+        track = make_track(points=400, segments=3)
+        expected = list(gpx.iter_points(io.BytesIO(make_gpx(track))))
+        for big_endian in (False, True):
+            points = list(fit.iter_points(io.BytesIO(make_fit(track, big_endian))))
+            assert len(points) == len(expected)
+            for point, (latitude, longitude, elevation, point_time, segment) in zip(points, expected):
+                assert point[0] == pytest.approx(latitude, abs=1e-6)
+                assert point[1] == pytest.approx(longitude, abs=1e-6)
+                assert point[2] == pytest.approx(elevation, abs=0.2)
+                assert point[3:] == (point_time, segment)
+
+    def test_compressed_timestamps_and_developer_fields(self):
+        fit_epoch = datetime(1989, 12, 31, tzinfo=timezone.utc).timestamp()
+        records = [
+            # record: время, широта, долгота и одно поле разработчика на 2 байта
+            struct.pack('<BBBHB', 0x60, 0, 0, 20, 3) + bytes([253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85])
+            + bytes([1, 0, 2, 0]),
+            struct.pack('<BIiiH', 0x00, 1000, 2 ** 29, 2 ** 28, 7),
+            # Для сжатого заголовка своя запись без поля времени
+            struct.pack('<BBBHB', 0x41, 0, 0, 20, 2) + bytes([0, 4, 0x85, 1, 4, 0x85]),
+            struct.pack('<Bii', 0x80 | (1 << 5) | ((1000 + 3) & 0x1F), 2 ** 29, 2 ** 28),
+            struct.pack('<Bii', 0x80 | (1 << 5) | ((1000 + 20) & 0x1F), 2 ** 29, -2 ** 28),
+        ]
+        data = b''.join(records)
+        file = struct.pack('<BBHI4sH', 14, 0x20, 2132, len(data), b'.FIT', 0) + data + b'\x00\x00'
+        points = list(fit.iter_points(io.BytesIO(file)))
+        assert [point[3] - fit_epoch for point in points] == [1000, 1003, 1020]
+        assert points[0][:2] == (45.0, 22.5)
+        assert points[2][1] == -22.5
+        assert points[0][2] is None
+
+    def test_not_fit(self):
+        assert not fit.is_fit(make_gpx(make_track(points=10))[:12])
+        with pytest.raises(fit.FITError):
+            list(fit.iter_points(io.BytesIO(b'\x0e' + b'\x00' * 20)))
+
+    def test_truncated(self):
+        data = make_fit(make_track(points=100))
+        with pytest.raises(fit.FITError):
+            list(fit.iter_points(io.BytesIO(data[:len(data) // 2])))
+
+    def test_decode_track_detects_format(self):
+        track = make_track(points=300, segments=2)
+        from_gpx = decode_track(io.BytesIO(make_gpx(track)))
+        from_fit = decode_track(io.BytesIO(make_fit(track)))
+        assert from_fit.shape == from_gpx.shape
+        assert np.allclose(from_fit[LATITUDE], from_gpx[LATITUDE], atol=1e-6)
+        assert np.array_equal(from_fit[TIME], from_gpx[TIME])
+        assert np.array_equal(from_fit[SEGMENT], from_gpx[SEGMENT])
+
+
+class FITUploadTest(TemporaryMediaMixin, TestCase):
+    def test_processed_like_gpx(self):
+        track = make_track(points=500, segments=2)
+        started_at = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+        activities = [
+            Activity.objects.create(profile=Profile.objects.create(email=f'{name}@mail.ru'), started_at=started_at,
+                                    track_file=ContentFile(data, name=f'ride.{name}'))
+            for name, data in (('gpx', make_gpx(track)), ('fit', make_fit(track)))
+        ]
+        for activity in activities:
+            activity.refresh_from_db()
+        from_gpx, from_fit = activities
+        assert from_fit.status == Activity.Status.READY
+        assert from_fit.track_file.name.endswith('.fit.gz')
+        assert float(from_fit.distance) == pytest.approx(float(from_gpx.distance), rel=1e-3)
+        assert from_fit.duration_active == from_gpx.duration_active
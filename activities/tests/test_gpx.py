@@ -0,0 +1,29 @@
+import io
+
+from django.test import SimpleTestCase
+
+from activities.gpx import GPXError, iter_points, parse_time
+from activities.tests.utils import make_gpx, make_track
+
+
+class StreamingGPXTest(SimpleTestCase):
+    def test_iter_points(self):
+        track = make_track(points=50, segments=2)
+        points = list(iter_points(io.BytesIO(make_gpx(track))))
+        assert len(points) == 100
+        assert points[0][4] == 0 and points[-1][4] == 1
+        assert points[0][2] == track[0][2]
+        assert points[1][3] - points[0][3] == 1
+
+    def test_parse_time(self):
+        assert parse_time('1970-01-01T00:00:01Z') == 1
+        assert parse_time('1970-01-01T03:00:01.5+03:00') == 1.5
+        assert parse_time('1970-01-01T00:00:01-01:00') == 3601
+        assert parse_time('1970-01-01T00:00:01\u221201:00') == 3601
+        for value in ('1970-01-01T00:00:0105:00', '1970-01-01T00:00:01A05:00', '1970-01-01T00:00:01*05'):
+            with self.assertRaises(GPXError):
+                parse_time(value)
+
+    def test_invalid_file(self):
+        with self.assertRaises(GPXError):
+            list(iter_points(io.BytesIO(b'<gpx><trk>')))
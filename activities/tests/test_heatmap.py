@@ -0,0 +1,132 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from activities import heatmap
+from activities.geo import TILE_SIZE, mercator
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from activities.tracks import build_track, decode_track
+from profiles.models import Profile
+
+STARTED_AT = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+
+
+def tile_of(latitude, longitude, zoom):
+    x, y = mercator(latitude, longitude)
+    return int(x * 2 ** zoom // TILE_SIZE), int(y * 2 ** zoom // TILE_SIZE)
+
+
+class TrackPixelsTest(SimpleTestCase):
+    def test_line_without_gaps(self):
+        track = build_track([(55., 37., 0, 0, 0), (55., 37.1, 0, 10, 0)])
+        pixels = heatmap.track_pixels(track, 14)
+        width = TILE_SIZE * 2 ** 14
+        columns = np.sort(pixels % width)
+        assert len(set((pixels // width).tolist())) == 1
+        assert (np.diff(columns) == 1).all() and columns.size > 1000
+
+    def test_segments_are_not_joined(self):
+        track = build_track([(55., 37., 0, 0, 0), (55., 37.1, 0, 10, 1)])
+        assert heatmap.track_pixels(track, 14).size == 2
+
+
+@override_settings(HEATMAP_MAX_ZOOM=10)
+class AccumulatorTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.settings = override_settings(HEATMAP_DIR=directory)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.track = decode_track(io.BytesIO(make_gpx(make_track(points=600))))
+        self.tile = (10, *tile_of(self.track[0][0], self.track[1][0], 10))
+
+    def counts(self):
+        return heatmap._load_counts(heatmap._path(1, *self.tile, '.npz'))
+
+    def test_add_and_remove(self):
+        heatmap.add(1, self.track)
+        heatmap.add(1, self.track)
+        assert self.counts().max() == 2
+        heatmap.remove(1, self.track)
+        assert self.counts().max() == 1
+        heatmap.remove(1, self.track)
+        assert heatmap.tile(1, *self.tile) is None
+        assert heatmap.tile(1, 0, 0, 0) is None
+
+    def test_png_cached_until_counts_change(self):
+        heatmap.add(1, self.track)
+        first = heatmap.tile(1, *self.tile)
+        with mock.patch('activities.heatmap.render_tile') as render_tile:
+            assert heatmap.tile(1, *self.tile) == first
+        assert not render_tile.called
+        image = Image.open(io.BytesIO(first))
+        assert image.size == (TILE_SIZE, TILE_SIZE) and image.getextrema()[3][1] > 0
+
+        heatmap.add(1, self.track)
+        assert heatmap.tile(1, *self.tile) != first
+
+
+@override_settings(HEATMAP_MAX_ZOOM=12)
+class HeatmapViewTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='heatmap@mail.ru')
+        self.track = make_track(points=600, start=(59.9, 30.3))
+        self.client.force_login(self.profile)
+
+    def url(self, zoom):
+        latitude, longitude = self.track[0][:2]
+        return reverse('webinterface:heatmap_tile', args=[zoom, *tile_of(latitude, longitude, zoom)])
+
+    def test_upload_and_delete(self):
+        empty = self.client.get(self.url(12))
+        assert empty.status_code == 200 and empty['Content-Type'] == 'image/png'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activity = Activity.objects.create(profile=self.profile, started_at=STARTED_AT,
+                                               track_file=ContentFile(make_gpx(self.track), name='ride.gpx'))
+        activity.refresh_from_db()
+        assert activity.in_heatmap
+        response = self.client.get(self.url(12))
+        assert response['ETag'] != empty['ETag']
+        assert self.client.get(self.url(12), HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+        assert 'Тепловая карта' in self.client.get(reverse('webinterface:heatmap')).content.decode()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.delete()
+        assert self.client.get(self.url(12))['ETag'] == empty['ETag']
+
+    def test_delete_rolled_back_or_without_track(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            activity = Activity.objects.create(profile=self.profile, started_at=STARTED_AT,
+                                               track_file=ContentFile(make_gpx(self.track), name='ride.gpx'))
+        filled = self.client.get(self.url(12))['ETag']
+        pk = activity.pk
+        try:
+            with transaction.atomic():
+                activity.delete()
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        assert self.client.get(self.url(12))['ETag'] == filled
+
+        activity = Activity.objects.get(pk=pk)
+        os.remove(activity.track_data.path)
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs('activities.signals', 'WARNING'):
+            activity.delete()
+        assert not Activity.objects.exists()
+
+    def test_bounds(self):
+        assert self.client.get(self.url(13)).status_code == 404
+        assert self.client.get(reverse('webinterface:heatmap_tile', args=[2, 4, 0])).status_code == 404
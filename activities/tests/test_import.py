@@ -0,0 +1,55 @@
+import io
+import os
+import zipfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from activities import heatmap, totals
+from activities.models import Activity, PersonalRecord, SegmentEffort, Segment, Split
+from activities.spatial import in_bbox
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+class ImportTracksTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='import@mail.ru')
+        self.archive = os.path.join(self.media_root, 'export.zip')
+        tracks = [make_track(points=300, seed=seed) for seed in range(4)]
+        with zipfile.ZipFile(self.archive, 'w') as archive:
+            for i, track in enumerate(tracks):
+                archive.writestr(f'rides/{i}.gpx', make_gpx(track))
+            archive.writestr('rides/copy.gpx', make_gpx(tracks[0]))
+            archive.writestr('rides/broken.gpx', b'<gpx><trk>')
+            archive.writestr('notes.txt', b'not a track')
+        Segment.objects.create(name='Старт', points=[point[:2] for point in tracks[1][50:200:10]])
+
+    def run_import(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_tracks', self.archive, email=self.profile.email, type='Бег', workers=2,
+                     batch_size=3, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_and_resume(self):
+        out, err = self.run_import()
+        assert 'Импортировано: 4, пропущено (уже есть): 1, с ошибками: 1' in out
+        assert 'broken.gpx' in err
+        activities = Activity.objects.filter(profile=self.profile)
+        assert activities.count() == 4
+        activity = activities.first()
+        assert activity.status == Activity.Status.READY
+        assert activity.title and activity.distance > 0 and activity.activity_type.name == 'Бег'
+        assert activity.track_data.name == f'tracks/{activity.pk}.npy'
+        assert os.path.exists(activity.thumbnail.path)
+        assert in_bbox(55.7, 37.5, 55.8, 37.7).count() == 4
+        assert SegmentEffort.objects.count() == 1
+        assert Split.objects.filter(activity__profile=self.profile).values('activity').distinct().count() == 4
+        assert PersonalRecord.objects.filter(profile=self.profile).exists()
+        assert totals.check() == []
+        assert not activities.filter(in_heatmap=False).exists()
+        assert heatmap.tile(self.profile.pk, 0, 0, 0) is not None
+
+        out, _ = self.run_import()
+        assert 'Импортировано: 0, пропущено (уже есть): 5' in out
+        assert activities.count() == 4
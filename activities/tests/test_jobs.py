@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from activities import heatmap, jobs, spatial
+from activities.models import Activity, TrackJob
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+@override_settings(TRACK_PROCESSING_EAGER=False, TRACK_JOB_MAX_ATTEMPTS=2, TRACK_JOB_RETRY_DELAY=0)
+class TrackJobTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.activity = Activity.objects.create(
+            profile=Profile.objects.create(email='jobs@mail.ru'),
+            started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+            track_file=ContentFile(make_gpx(make_track(points=300)), name='ride.gpx'),
+        )
+
+    def test_upload_is_queued(self):
+        assert self.activity.status == Activity.Status.PROCESSING
+        assert not self.activity.track_data
+        assert TrackJob.objects.get().status == TrackJob.Status.PENDING
+
+    def test_worker_processes_job(self):
+        assert jobs.work(once=True) == 1
+        self.activity.refresh_from_db()
+        assert self.activity.status == Activity.Status.READY
+        assert self.activity.track_data and self.activity.distance > 0
+        assert TrackJob.objects.get().status == TrackJob.Status.DONE
+        # Повторное сохранение без замены трека не ставит новую задачу
+        self.activity.title = 'Новое название'
+        self.activity.save()
+        assert TrackJob.objects.count() == 1
+
+    def test_retry_then_fail(self):
+        with mock.patch('activities.jobs.process_activity', side_effect=ValueError('broken')), \
+                self.assertLogs('activities.jobs', level='ERROR'):
+            jobs.work(once=True)
+        job = TrackJob.objects.get()
+        self.activity.refresh_from_db()
+        assert job.status == TrackJob.Status.FAILED and job.attempts == 2
+        assert self.activity.status == Activity.Status.FAILED
+        assert self.activity.processing_error == 'broken'
+
+    def test_retry_keeps_heatmap_counts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.work(once=True)
+        self.activity.refresh_from_db()
+        self.activity.track_file = ContentFile(make_gpx(make_track(points=300, seed=2)), name='other.gpx')
+        self.activity.save()
+        with mock.patch('activities.processing.efforts.save', side_effect=[ValueError('broken'), None]), \
+                self.captureOnCommitCallbacks(execute=True), self.assertLogs('activities.jobs', level='ERROR'):
+            jobs.work(once=True)
+        self.activity.refresh_from_db()
+        assert self.activity.status == Activity.Status.READY and self.activity.in_heatmap
+        counts = heatmap._load_counts(heatmap._path(self.activity.profile_id, 0, 0, 0, '.npz'))
+        assert counts.max() == 1
+
+    def test_failure_rolls_back_rows(self):
+        with mock.patch('activities.processing.efforts.save', side_effect=ValueError('broken')), \
+                self.captureOnCommitCallbacks(execute=True), self.assertLogs('activities.jobs', level='ERROR'):
+            jobs.work(once=True)
+        self.activity.refresh_from_db()
+        assert self.activity.status == Activity.Status.FAILED and not self.activity.in_heatmap
+        assert not self.activity.distance
+        assert not spatial.in_bbox(-90, -180, 90, 180).exists()
+        assert heatmap.tile(self.activity.profile_id, 0, 0, 0) is None
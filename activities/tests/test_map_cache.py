@@ -0,0 +1,62 @@
+import os
+import shutil
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from activities import map_cache
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+class MapCacheTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(settings.MAP_CACHE_DIR, ignore_errors=True)
+        profile = Profile.objects.create(email='maps@mail.ru')
+        self.activity = Activity.objects.create(
+            profile=profile,
+            started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+            track_file=ContentFile(make_gpx(make_track(points=200)), name='ride.gpx'),
+        )
+
+    def test_tiers_and_counters(self):
+        with mock.patch('activities.map_cache.get_map', wraps=map_cache.get_map) as get_map:
+            html = map_cache.cached_map(self.activity)
+            assert map_cache.cached_map(self.activity) == html
+            cache.clear()
+            assert map_cache.cached_map(self.activity) == html
+        assert get_map.call_count == 1
+        assert map_cache.stats() == {'memory_hits': 0, 'file_hits': 1, 'misses': 0}
+
+    def test_track_change_invalidates(self):
+        old_key = map_cache._key(self.activity.pk, self.activity.track_hash)
+        map_cache.cached_map(self.activity)
+        activity = Activity.objects.get(pk=self.activity.pk)
+        activity.track_file = ContentFile(make_gpx(make_track(points=200, seed=2)), name='other.gpx')
+        activity.save()
+        assert activity.track_hash != self.activity.track_hash
+        assert cache.get(old_key) is None
+        assert map_cache._file_cache().get(old_key) is None
+
+    def test_delete_invalidates(self):
+        key = map_cache._key(self.activity.pk, self.activity.track_hash)
+        map_cache.cached_map(self.activity)
+        self.activity.delete()
+        assert cache.get(key) is None
+        assert map_cache._file_cache().get(key) is None
+
+    def test_file_tier_lru_eviction(self):
+        file_cache = map_cache.FileCache(os.path.join(self.media_root, 'lru'), max_size=250)
+        for name in 'abc':
+            file_cache.set(name, 'x' * 100)
+            path = file_cache._path(name)
+            os.utime(path, (os.stat(path).st_atime, {'a': 1, 'b': 2, 'c': 3}[name]))
+        file_cache.set('d', 'x' * 100)
+        assert file_cache.get('a') is None and file_cache.get('b') is None
+        assert file_cache.get('c') is not None and file_cache.get('d') is not None
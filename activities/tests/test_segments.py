@@ -0,0 +1,104 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from activities import jobs, segments
+from activities.models import Activity, Segment, SegmentEffort, TrackJob
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+def line(*points):
+    return np.array(points, dtype=float)
+
+
+class FindEffortsTest(TestCase):
+    segment = line((0, 0), (0, 500), (300, 500))
+
+    def test_two_laps(self):
+        lap = np.column_stack((np.zeros(51), np.arange(0, 510, 10)))
+        turn = np.column_stack((np.arange(10, 310, 10), np.full(30, 500)))
+        back = np.column_stack((np.full(10, 300), np.linspace(500, 0, 10)))
+        points = np.vstack((lap, turn, back, lap + .5, turn))
+        assert segments.find_efforts(self.segment, points, 20) == [(0, 80), (91, 171)]
+
+    def test_shortcut_is_not_an_effort(self):
+        # Срезали угол: старт и финиш пройдены, но вершина (0, 500) нет
+        points = np.column_stack((np.linspace(0, 300, 40), np.linspace(0, 500, 40)))
+        assert segments.find_efforts(self.segment, points, 20) == []
+
+    def test_detour(self):
+        points = np.vstack((np.column_stack((np.zeros(26), np.arange(0, 260, 10))),
+                            line((100, 250), (0, 260)),
+                            np.column_stack((np.zeros(25), np.arange(260, 510, 10))),
+                            np.column_stack((np.arange(10, 310, 10), np.full(30, 500)))))
+        assert segments.find_efforts(self.segment, points, 20) == []
+
+    def test_distances_to_line(self):
+        distances = segments.distances_to_line(line((5, 250), (-3, 600), (150, 510)), self.segment)
+        np.testing.assert_allclose(distances, [5, np.hypot(3, 100), 10])
+
+
+@override_settings(SEGMENT_MATCH_TOLERANCE=20)
+class SegmentMatchingTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='segments@mail.ru')
+        self.track = make_track(points=600)
+
+    def create_segment(self, first, last, shift=0.):
+        return Segment.objects.create(name='Подъем', points=[
+            [latitude + shift, longitude] for latitude, longitude, *_ in self.track[first:last + 1:10]
+        ])
+
+    def create_activity(self):
+        return Activity.objects.create(profile=self.profile, started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+                                       track_file=ContentFile(make_gpx(self.track), name='ride.gpx'))
+
+    def test_matched_on_upload(self):
+        segment = self.create_segment(150, 400)
+        self.create_segment(150, 400, shift=.01)
+        activity = self.create_activity()
+        effort = SegmentEffort.objects.get()
+        assert (effort.segment, effort.activity, effort.profile) == (segment, activity, self.profile)
+        assert abs(effort.start_index - 150) <= 5 and abs(effort.end_index - 400) <= 5
+        assert abs(effort.elapsed_time.total_seconds() - 250) <= 10
+        assert segment.distance > 0
+
+    def test_points_validated(self):
+        for points in ([], [[55.7, 37.6]], [[55.7, 37.6], [55.8]], [[55.7, 37.6], ['55.8', 37.7]],
+                       [[95, 37.6], [55.8, 37.7]], {'lat': 55.7}):
+            with self.assertRaises(ValidationError) as error:
+                Segment(name='Подъем', points=points).full_clean()
+            assert 'points' in error.exception.message_dict
+        Segment(name='Подъем', points=[[55.7, 37.6], [55.8, 37]]).full_clean()
+
+    @override_settings(TRACK_PROCESSING_EAGER=False)
+    def test_admin_queues_rematch(self):
+        activity = self.create_activity()
+        jobs.work(once=True)
+        admin = Profile.objects.create(email='admin@mail.ru', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        points = [[latitude, longitude] for latitude, longitude, *_ in self.track[450:591:10]]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:activities_segment_add'),
+                                        {'name': 'Спуск', 'points': json.dumps(points)})
+        assert response.status_code == 302
+        segment = Segment.objects.get()
+        assert not segment.efforts.exists() and TrackJob.objects.filter(segment=segment).exists()
+        jobs.work(once=True)
+        assert list(segment.efforts.values_list('activity', flat=True)) == [activity.pk]
+
+    def test_rematch_new_segment(self):
+        activity = self.create_activity()
+        assert not SegmentEffort.objects.exists()
+        segment = self.create_segment(450, 590)
+        call_command('match_segments', stdout=io.StringIO())
+        assert list(segment.efforts.values_list('activity', flat=True)) == [activity.pk]
+        assert segments.rematch(segment) == 1
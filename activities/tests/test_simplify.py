@@ -0,0 +1,44 @@
+import io
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from activities.geo import fit_zoom
+from activities.simplify import detail_mask, significance
+from activities.tracks import DETAIL, LATITUDE, LONGITUDE, decode_track
+from activities.tests.utils import make_gpx, make_track
+
+
+def rdp(x, y, tolerance):
+    """Reference recursive implementation."""
+    def simplify(first, last):
+        if last - first < 2:
+            return []
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        distances = [abs((x[i] - x[first]) * dy - (y[i] - y[first]) * dx) / np.hypot(dx, dy)
+                     for i in range(first + 1, last)]
+        index = int(np.argmax(distances))
+        if distances[index] <= tolerance:
+            return []
+        index += first + 1
+        return simplify(first, index) + [index] + simplify(index, last)
+    return [0] + simplify(0, len(x) - 1) + [len(x) - 1]
+
+
+class SimplifyTest(SimpleTestCase):
+    def test_significance_matches_rdp(self):
+        rnd = np.random.default_rng(3)
+        x = np.cumsum(rnd.normal(size=300))
+        y = np.cumsum(rnd.normal(size=300))
+        detail = significance(x, y)
+        for tolerance in (0.1, 0.5, 2, 5, 20):
+            assert np.flatnonzero(detail > tolerance).tolist() == rdp(x, y, tolerance), tolerance
+
+    def test_levels_of_detail(self):
+        track = decode_track(io.BytesIO(make_gpx(make_track(points=5000, segments=2))))
+        zoom = fit_zoom(track[LATITUDE], track[LONGITUDE], 640, 400)
+        counts = [detail_mask(track[DETAIL], level).sum() for level in (zoom, zoom + 3, 18)]
+        assert counts[0] < counts[1] < counts[2]
+        assert counts[0] * 10 < track.shape[1]
+        # Концы сегментов видны всегда
+        assert detail_mask(track[DETAIL], 0).sum() == 4
@@ -0,0 +1,64 @@
+import io
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from activities import spatial
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from activities.tracks import LATITUDE, LONGITUDE, decode_track
+from profiles.models import Profile
+
+
+class SpatialIndexTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='spatial@mail.ru')
+
+    def create_activity(self, start):
+        return Activity.objects.create(
+            profile=self.profile, started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+            track_file=ContentFile(make_gpx(make_track(points=600, segments=2, start=start)), name='ride.gpx'),
+        )
+
+    def test_boxes_cover_track(self):
+        track = decode_track(io.BytesIO(make_gpx(make_track(points=600, segments=2))))
+        boxes = spatial.track_boxes(track, chunk=100)
+        assert len(boxes) == 2 * 6
+        for latitude, longitude in zip(track[LATITUDE], track[LONGITUDE]):
+            assert any(b[0] <= latitude <= b[1] and b[2] <= longitude <= b[3] for b in boxes)
+        assert spatial.track_boxes(np.empty((6, 0))) == []
+
+    def test_bbox_and_radius(self):
+        moscow = self.create_activity((55.75, 37.61))
+        spb = self.create_activity((59.93, 30.31))
+        assert list(spatial.in_bbox(55.5, 37.3, 56.0, 37.9)) == [moscow]
+        assert set(spatial.in_bbox(55.0, 30.0, 60.5, 38.0)) == {moscow, spb}
+        assert not spatial.in_bbox(50.0, 10.0, 51.0, 11.0).exists()
+        assert list(spatial.near(59.93, 30.31, 500)) == [spb]
+        assert not spatial.near(59.93, 30.5, 500).exists()
+
+        spb.delete()
+        assert not spatial.near(59.93, 30.31, 500).exists()
+
+    def test_remove_by_rowid(self):
+        first = self.create_activity((55.75, 37.61))
+        second = self.create_activity((55.76, 37.62))
+        spatial.index_track(first.pk, decode_track(io.BytesIO(make_gpx(make_track(points=300)))))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, activity_id FROM {spatial.TABLE}')
+            rows = cursor.fetchall()
+        assert {row_id >> spatial.ROWID_BITS for row_id, _ in rows} == {first.pk, second.pk}
+        assert all(row_id >> spatial.ROWID_BITS == activity_id for row_id, activity_id in rows)
+        spatial.remove(first.pk)
+        assert list(spatial.in_bbox(55.5, 37.3, 56.0, 37.9)) == [second]
+
+    def test_backfill(self):
+        activity = self.create_activity((55.75, 37.61))
+        spatial.remove(activity.pk)
+        assert not spatial.in_bbox(55.5, 37.3, 56.0, 37.9).exists()
+        call_command('build_spatial_index', stdout=io.StringIO())
+        assert list(spatial.in_bbox(55.5, 37.3, 56.0, 37.9)) == [activity]
@@ -0,0 +1,32 @@
+import io
+
+import gpxpy
+from django.test import SimpleTestCase
+
+from activities.stats import compute_stats
+from activities.tracks import decode_track
+from activities.tests.utils import make_gpx, make_track
+
+
+class VectorizedStatsTest(SimpleTestCase):
+    def assert_matches_gpxpy(self, data):
+        gpx = gpxpy.parse(io.StringIO(data.decode()))
+        expected = gpx.get_moving_data()
+        uphill, downhill = gpx.get_uphill_downhill()
+        result = compute_stats(decode_track(io.BytesIO(data)))
+        for field in expected._fields:
+            self.assertAlmostEqual(getattr(result, field), getattr(expected, field), delta=1e-6 * 1000, msg=field)
+        self.assertAlmostEqual(result.elevation_gain, uphill, places=6)
+        self.assertAlmostEqual(result.elevation_loss, downhill, places=6)
+
+    def test_matches_gpxpy(self):
+        self.assert_matches_gpxpy(make_gpx(make_track(points=2000, segments=3)))
+
+    def test_far_points_and_flat_track(self):
+        track = make_track(points=200, seed=7)
+        track = [(lat + (.5 if i > 100 else 0), lon, 0, moment, seg)
+                 for i, (lat, lon, ele, moment, seg) in enumerate(track)]
+        self.assert_matches_gpxpy(make_gpx(track))
+
+    def test_short_track(self):
+        assert compute_stats(decode_track(io.BytesIO(make_gpx(make_track(points=1))))).moving_time == 0
@@ -0,0 +1,54 @@
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from activities import synthetic
+from activities.models import Activity, FeedEntry
+from activities.stats import compute_stats
+from activities.tracks import decode_track
+from profiles.models import Follow, Profile
+
+
+class SyntheticDataTest(TestCase):
+    def test_track(self):
+        track = synthetic.generate_track(duration=1200, interval=2, speed=5, stops=1, stop_duration=300, noise=0)
+        assert len(track) == 601
+        assert (track[-1][3] - track[0][3]).total_seconds() == 1200
+        stats = compute_stats(decode_track(io.BytesIO(synthetic.to_gpx(track))))
+        # 900 с движения со средней скоростью около 5 м/с
+        assert 3800 < stats.moving_distance < 5200
+        assert 800 <= stats.moving_time <= 1000
+        noisy = synthetic.generate_track(duration=1200, noise=5)
+        assert noisy != synthetic.generate_track(duration=1200, noise=5, seed=1)
+        assert np.allclose([point[0] for point in noisy], [point[0] for point in synthetic.generate_track(
+            duration=1200, noise=5)])
+
+    def test_seed(self):
+        profiles = synthetic.seed(profiles=10, follows=3, activities=50)
+        assert len(profiles) == Profile.objects.count() == 10
+        assert Follow.objects.count() == 30
+        assert sum(Profile.objects.values_list('followers_count', flat=True)) == 30
+        assert Activity.objects.count() == 50
+        assert FeedEntry.objects.filter(owner=profiles[0]).exists()
+
+    def test_bench_command(self):
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        call_command('bench', profiles=5, follows=2, activities=20, duration=300, repeat=1, output=output,
+                     stderr=io.StringIO())
+        with open(output) as report_file:
+            report = json.load(report_file)
+        assert set(report['results']) == {'ingest', 'stats', 'efforts', 'map', 'feed', 'detail', 'detail_cached'}
+        assert report['track']['points'] == 301
+        assert report['results']['feed']['queries'] > 0
+        # Данные откатываются
+        assert not Activity.objects.exists()
+
+        err = io.StringIO()
+        call_command('bench', profiles=5, follows=2, activities=20, duration=300, repeat=1, only=['stats'],
+                     compare=output, stdout=io.StringIO(), stderr=err)
+        assert 'stats' in err.getvalue()
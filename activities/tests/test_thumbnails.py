@@ -0,0 +1,36 @@
+import io
+from datetime import datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from activities.models import Activity
+from activities.thumbnails import render_thumbnail
+from activities.tracks import decode_track
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+@override_settings(ROUTE_THUMBNAIL_SIZE=(200, 100))
+class ThumbnailTest(TemporaryMediaMixin, TestCase):
+    def test_render(self):
+        track = decode_track(io.BytesIO(make_gpx(make_track(points=500, segments=2))))
+        image = render_thumbnail(track)
+        assert image.size == (200, 100)
+        # Маршрут нарисован: есть красные пиксели
+        assert any(r > 150 and g < 100 for r, g, b in image.getdata())
+
+    def test_created_on_upload_and_backfill(self):
+        activity = Activity.objects.create(
+            profile=Profile.objects.create(email='thumbs@mail.ru'),
+            started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+            track_file=ContentFile(make_gpx(make_track(points=300)), name='ride.gpx'),
+        )
+        with Image.open(activity.thumbnail.path) as image:
+            assert image.size == (200, 100)
+        Activity.objects.filter(pk=activity.pk).update(thumbnail='')
+        call_command('build_thumbnails', stdout=io.StringIO())
+        activity.refresh_from_db()
+        assert activity.thumbnail
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from activities import totals
+from activities.models import Activity, ActivityType, TrainingTotals
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+class TrainingTotalsTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='runner@mail.ru')
+        self.run = ActivityType.objects.create(name='Бег')
+        self.ride = ActivityType.objects.create(name='Велосипед')
+
+    def create_activity(self, day, distance, minutes=30, activity_type=None):
+        return Activity.objects.create(profile=self.profile, activity_type=activity_type or self.run,
+                                       started_at=datetime(*day, 7, 30, tzinfo=timezone.utc),
+                                       distance=distance, duration_active=timedelta(minutes=minutes))
+
+    def get_totals(self, period, start, activity_type=None):
+        return TrainingTotals.objects.get(profile=self.profile, period=period, period_start=start,
+                                          activity_type=activity_type or self.run)
+
+    def test_period_starts(self):
+        starts = totals.period_starts(datetime(2022, 3, 17, 22, 30, tzinfo=timezone.utc))
+        # 17 марта 22:30 UTC — уже 18 марта по Москве
+        assert starts == {'week': date(2022, 3, 14), 'month': date(2022, 3, 1), 'year': date(2022, 1, 1)}
+
+    def test_create_update_delete(self):
+        first = self.create_activity((2022, 3, 14), 10)
+        self.create_activity((2022, 3, 16), 5.5)
+        week = self.get_totals('week', date(2022, 3, 14))
+        assert (week.count, week.distance, week.moving_time) == (2, Decimal('15.50'), timedelta(hours=1))
+
+        first = Activity.objects.get(pk=first.pk)
+        first.started_at = datetime(2022, 2, 28, 7, 30, tzinfo=timezone.utc)
+        first.save()
+        assert self.get_totals('week', date(2022, 3, 14)).count == 1
+        assert self.get_totals('month', date(2022, 2, 1)).distance == Decimal('10.00')
+        assert self.get_totals('year', date(2022, 1, 1)).count == 2
+
+        first.activity_type = self.ride
+        first.save()
+        assert self.get_totals('year', date(2022, 1, 1)).count == 1
+        assert self.get_totals('year', date(2022, 1, 1), self.ride).count == 1
+
+        first.delete()
+        assert not TrainingTotals.objects.filter(activity_type=self.ride).exists()
+        assert totals.check() == []
+
+    def test_unloaded_instance_is_not_counted_twice(self):
+        activity = self.create_activity((2022, 3, 14), 10)
+        Activity(pk=activity.pk, profile=self.profile, activity_type=self.run, started_at=activity.started_at,
+                 created_at=activity.created_at, distance=12, duration_active=timedelta(minutes=30)).save()
+        assert self.get_totals('week', date(2022, 3, 14)).distance == Decimal('12.00')
+        assert totals.check() == []
+
+    def test_check_and_rebuild(self):
+        activity = self.create_activity((2022, 3, 14), 10)
+        # update() обходит сигналы, итоги расходятся
+        Activity.objects.filter(pk=activity.pk).update(distance=20)
+        assert len(totals.check()) == 3
+        with self.assertRaises(CommandError):
+            call_command('check_totals', stdout=StringIO())
+        call_command('rebuild_totals', stdout=StringIO())
+        assert totals.check() == []
+        assert self.get_totals('month', date(2022, 3, 1)).distance == Decimal('20.00')
+
+
+class UploadedTotalsTest(TemporaryMediaMixin, TestCase):
+    def test_unrounded_track_distances(self):
+        profile = Profile.objects.create(email='rounding@mail.ru')
+        for seed in range(5):
+            Activity.objects.create(profile=profile, started_at=datetime(2022, 3, 14, 7, 30, tzinfo=timezone.utc),
+                                    track_file=ContentFile(make_gpx(make_track(points=700, seed=seed)),
+                                                           name='ride.gpx'))
+        assert totals.check() == []
+
+    def test_fractional_distance(self):
+        profile = Profile.objects.create(email='fraction@mail.ru')
+        activity = Activity(profile=profile, started_at=datetime(2022, 3, 14, 7, 30, tzinfo=timezone.utc))
+        for distance in (4.23456, 3.33333, 2.005):
+            activity.distance = distance
+            activity.save()
+        Activity.objects.create(profile=profile, started_at=datetime(2022, 3, 15, tzinfo=timezone.utc),
+                                distance=1.00499)
+        assert totals.check() == []
@@ -0,0 +1,46 @@
+import io
+from datetime import datetime, timezone
+
+import gpxpy
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+
+from activities.models import Activity
+from activities.tracks import LATITUDE, ROWS, SEGMENT, TIME, load_track
+from activities.utils import get_map
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Profile
+
+
+class TrackStoreTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='tracks@mail.ru')
+        self.data = make_gpx(make_track(points=400, segments=2))
+
+    def create_activity(self):
+        return Activity.objects.create(
+            profile=self.profile,
+            started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+            track_file=ContentFile(self.data, name='ride.gpx'),
+        )
+
+    def test_track_data_created_on_upload(self):
+        activity = self.create_activity()
+        track = load_track(activity)
+        assert isinstance(track, np.memmap)
+        assert track.shape == (ROWS, 800)
+        assert track[SEGMENT, -1] == 1
+        assert np.all(np.diff(track[TIME]) == 1)
+        expected = gpxpy.parse(io.StringIO(self.data.decode())).get_moving_data()
+        self.assertAlmostEqual(float(activity.distance), expected.moving_distance / 1000, places=2)
+        assert 'L.polyline' in get_map(activity)
+
+    def test_build_tracks_backfill(self):
+        activity = self.create_activity()
+        Activity.objects.filter(pk=activity.pk).update(track_data='')
+        call_command('build_tracks', stdout=io.StringIO())
+        activity.refresh_from_db()
+        assert activity.track_data
+        assert load_track(activity)[LATITUDE].size == 800
@@ -0,0 +1,100 @@
+import math
+import os
+import random
+import shutil
+import struct
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from django.test import override_settings
+
+GPX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<gpx version="1.1" creator="vsrala" xmlns="http://www.topografix.com/GPX/1/1">\n'
+              '<metadata><time>2022-03-01T06:00:00Z</time></metadata>\n')
+
+
+class TemporaryMediaMixin:
+    """Test case mixin: media and derived files in a temporary directory, tracks processed on save.
+
+    ``cls.media_root`` is removed after the class. Settings overridden by a
+    decorator on the test case take precedence.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=cls.media_root, HEATMAP_DIR=os.path.join(cls.media_root, 'heatmaps'),
+            MAP_CACHE_DIR=os.path.join(cls.media_root, 'maps'), TRACK_PROCESSING_EAGER=True,
+        )
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
+
+
+def make_track(points=600, segments=1, start=(55.75, 37.61), seed=1):
+    """Random walk with stops, elevation and an occasional GPS spike."""
+    rnd = random.Random(seed)
+    started_at = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+    latitude, longitude = start
+    elevation = 150.
+    heading = rnd.uniform(0, 2 * math.pi)
+    track = []
+    for segment in range(segments):
+        for i in range(points):
+            moment = started_at + timedelta(seconds=len(track))
+            stopped = 100 <= i % 300 < 130
+            if not stopped:
+                heading += rnd.uniform(-.2, .2)
+                step = rnd.uniform(3, 9) / 111000
+                if rnd.random() < .005:
+                    step *= 20
+                latitude += step * math.cos(heading)
+                longitude += step * math.sin(heading) / math.cos(math.radians(latitude))
+                elevation += rnd.uniform(-.5, .5)
+            track.append((latitude, longitude, round(elevation, 1), moment, segment))
+    return track
+
+
+def make_gpx(track):
+    chunks = [GPX_HEADER, '<trk><name>test</name>']
+    current = None
+    for latitude, longitude, elevation, moment, segment in track:
+        if segment != current:
+            if current is not None:
+                chunks.append('</trkseg>')
+            chunks.append('<trkseg>')
+            current = segment
+        chunks.append(f'<trkpt lat="{latitude:.7f}" lon="{longitude:.7f}"><ele>{elevation}</ele>'
+                      f'<time>{moment.strftime("%Y-%m-%dT%H:%M:%SZ")}</time></trkpt>\n')
+    chunks.append('</trkseg></trk></gpx>\n')
+    return ''.join(chunks).encode()
+
+
+def make_fit(track, big_endian=False):
+    """FIT file with a record per point, a heart rate field to skip and timer events between segments."""
+    order = '>' if big_endian else '<'
+    fit_epoch = datetime(1989, 12, 31, tzinfo=timezone.utc)
+
+    def definition(local, message, fields):
+        return struct.pack('BBB', 0x40 | local, 0, int(big_endian)) + struct.pack(f'{order}H', message) + \
+            struct.pack('B', len(fields)) + b''.join(struct.pack('BBB', *field) for field in fields)
+
+    records = [
+        definition(0, 20, [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (3, 1, 0x02), (2, 2, 0x84)]),
+        definition(1, 21, [(253, 4, 0x86), (0, 1, 0x00), (1, 1, 0x00)]),
+    ]
+    current = None
+    for latitude, longitude, elevation, moment, segment in track:
+        timestamp = int((moment - fit_epoch).total_seconds())
+        if current is not None and segment != current:
+            records.append(b'\x01' + struct.pack(f'{order}IBB', timestamp, 0, 4))
+            records.append(b'\x01' + struct.pack(f'{order}IBB', timestamp, 0, 0))
+        current = segment
+        records.append(b'\x00' + struct.pack(f'{order}IiiBH', timestamp, round(latitude / 180 * 2 ** 31),
+                                             round(longitude / 180 * 2 ** 31), 120,
+                                             round((elevation + 500) * 5)))
+    data = b''.join(records)
+    header = struct.pack('<BBHI4sH', 14, 0x20, 2132, len(data), b'.FIT', 0)
+    return header + data + b'\x00\x00'
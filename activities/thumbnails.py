@@ -0,0 +1,60 @@
+"""Route preview images drawn with Pillow from the projected track points."""
+import io
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageDraw
+
+from .geo import fit_zoom, mercator
+from .simplify import detail_mask
+from .tracks import DETAIL, LATITUDE, LONGITUDE, SEGMENT
+
+BACKGROUND = (245, 245, 240)
+ROUTE = (220, 20, 20)
+START = (40, 160, 40)
+FINISH = (30, 30, 30)
+
+# Рисуем в увеличенном размере и уменьшаем - дешевое сглаживание линий
+SUPERSAMPLE = 2
+
+
+def render_thumbnail(track, size=None, padding=10):
+    width, height = size or settings.ROUTE_THUMBNAIL_SIZE
+    scaled_width, scaled_height = width * SUPERSAMPLE, height * SUPERSAMPLE
+    image = Image.new('RGB', (scaled_width, scaled_height), BACKGROUND)
+    if track.shape[1] < 2:
+        return image.resize((width, height))
+
+    inner_width, inner_height = width - 2 * padding, height - 2 * padding
+    zoom = fit_zoom(track[LATITUDE], track[LONGITUDE], inner_width, inner_height)
+    visible = detail_mask(track[DETAIL], zoom)
+    x, y = mercator(track[LATITUDE][visible], track[LONGITUDE][visible])
+    segments = track[SEGMENT][visible]
+
+    span = max(float(x.max() - x.min()), float(y.max() - y.min()) * inner_width / inner_height, 1e-12)
+    scale = inner_width * SUPERSAMPLE / span
+    x = (x - (x.min() + x.max()) / 2) * scale + scaled_width / 2
+    y = (y - (y.min() + y.max()) / 2) * scale + scaled_height / 2
+
+    draw = ImageDraw.Draw(image)
+    line_width = 2 * SUPERSAMPLE
+    bounds = np.flatnonzero(np.diff(segments)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(x)]):
+        points = np.column_stack((x[start:stop], y[start:stop])).ravel().tolist()
+        if len(points) >= 4:
+            draw.line(points, fill=ROUTE, width=line_width, joint='curve')
+    radius = 3 * SUPERSAMPLE
+    for (px, py), color in (((x[0], y[0]), START), ((x[-1], y[-1]), FINISH)):
+        draw.ellipse((px - radius, py - radius, px + radius, py + radius), fill=color)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def save_thumbnail(activity, track):
+    """Render and attach the route preview (does not save the model)."""
+    image_format = settings.ROUTE_THUMBNAIL_FORMAT
+    buffer = io.BytesIO()
+    render_thumbnail(track).save(buffer, format=image_format, quality=85)
+    if activity.thumbnail:
+        activity.thumbnail.delete(save=False)
+    activity.thumbnail.save(f'{activity.pk}.{image_format.lower()}', ContentFile(buffer.getvalue()), save=False)
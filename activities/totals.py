@@ -0,0 +1,150 @@
+"""Weekly, monthly and yearly training totals.
+
+``TrainingTotals`` rows are updated with deltas when an activity is created,
+changed or deleted (see ``activities.signals``), so reading totals for a
+period never scans the profile's activities. Changes made with
+``QuerySet.update()`` or ``bulk_create()`` bypass the deltas: ``rebuild()``
+and ``check()`` (``rebuild_totals`` / ``check_totals`` commands) cover that.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.backends.utils import format_number
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Activity, TrainingTotals
+
+PERIODS = TrainingTotals.Period
+
+DISTANCE_FIELD = Activity._meta.get_field('distance')
+
+
+def period_starts(started_at):
+    day = timezone.localtime(started_at).date() if timezone.is_aware(started_at) else started_at.date()
+    return {
+        PERIODS.WEEK: day - timedelta(days=day.weekday()),
+        PERIODS.MONTH: day.replace(day=1),
+        PERIODS.YEAR: day.replace(month=1, day=1),
+    }
+
+
+def _stored_distance(distance):
+    # Как при записи в базу: до decimal_places поля, иначе итоги расходятся с сохраненными тренировками
+    return Decimal(format_number(DISTANCE_FIELD.to_python(distance or 0), DISTANCE_FIELD.max_digits,
+                                 DISTANCE_FIELD.decimal_places))
+
+
+def _contributions(state):
+    """``{(profile, type, period, start): (distance, moving_time, count)}`` of one activity state."""
+    if state is None:
+        return {}
+    profile_id, activity_type_id, started_at, distance, duration_active = state
+    values = (_stored_distance(distance), duration_active or timedelta(0), 1)
+    return {(profile_id, activity_type_id, period, start): values
+            for period, start in period_starts(started_at).items()}
+
+
+def _apply(key, distance, moving_time, count):
+    profile_id, activity_type_id, period, start = key
+    rows = TrainingTotals.objects.filter(profile_id=profile_id, activity_type_id=activity_type_id,
+                                         period=period, period_start=start)
+    changes = dict(distance=F('distance') + distance, moving_time=F('moving_time') + moving_time,
+                   count=F('count') + count)
+    if rows.update(**changes) or count < 0:
+        # Строку для вычитания не создаем: она могла быть удалена вместе с профилем
+        return
+    TrainingTotals.objects.get_or_create(profile_id=profile_id, activity_type_id=activity_type_id,
+                                         period=period, period_start=start)
+    rows.update(**changes)
+
+
+def update(old_state, new_state):
+    """Move an activity's contribution from ``old_state`` to ``new_state``."""
+    if old_state == new_state:
+        return
+    old, new = _contributions(old_state), _contributions(new_state)
+    with transaction.atomic():
+        for key in old.keys() | new.keys():
+            distance, moving_time, count = new.get(key, (Decimal(0), timedelta(0), 0))
+            old_distance, old_moving_time, old_count = old.get(key, (Decimal(0), timedelta(0), 0))
+            if (distance, moving_time, count) != (old_distance, old_moving_time, old_count):
+                _apply(key, distance - old_distance, moving_time - old_moving_time, count - old_count)
+        profiles = {key[0] for key in old.keys() | new.keys()}
+        TrainingTotals.objects.filter(profile_id__in=profiles, count__lte=0).delete()
+
+
+def _combine(states):
+    result = defaultdict(lambda: [Decimal(0), timedelta(0), 0])
+    for state in states:
+        for key, (distance, moving_time, count) in _contributions(state).items():
+            values = result[key]
+            values[0] += distance
+            values[1] += moving_time
+            values[2] += count
+    return result
+
+
+def add(states):
+    """Add many new activities at once, e.g. after ``bulk_create()``: one update per period row."""
+    with transaction.atomic():
+        for key, values in _combine(states).items():
+            _apply(key, *values)
+
+
+def stored_state(activity):
+    """State of the activity as it is in the database (``None`` if it is not saved)."""
+    if activity._totals_state is not None or activity.pk is None:
+        return activity._totals_state
+    row = Activity.objects.filter(pk=activity.pk).values_list(
+        'profile_id', 'activity_type_id', 'started_at', 'distance', 'duration_active').first()
+    return tuple(row) if row else None
+
+
+def expected(profiles=None):
+    """Totals computed from scratch by scanning activities."""
+    activities = Activity.objects.all()
+    if profiles is not None:
+        activities = activities.filter(profile__in=profiles)
+    return _combine(activities.values_list('profile_id', 'activity_type_id', 'started_at', 'distance',
+                                           'duration_active').iterator())
+
+
+def _stored(profiles=None):
+    rows = TrainingTotals.objects.all()
+    if profiles is not None:
+        rows = rows.filter(profile__in=profiles)
+    return {(row.profile_id, row.activity_type_id, row.period, row.period_start):
+            [row.distance, row.moving_time, row.count] for row in rows.iterator()}
+
+
+def check(profiles=None):
+    """List of ``(key, stored, expected)`` for rows that disagree with the activities."""
+    stored, computed = _stored(profiles), expected(profiles)
+    empty = [Decimal(0), timedelta(0), 0]
+    return [(key, stored.get(key, empty), computed.get(key, empty))
+            for key in sorted(stored.keys() | computed.keys(), key=str)
+            if stored.get(key, empty) != computed.get(key, empty)]
+
+
+def rebuild(profiles=None):
+    with transaction.atomic():
+        rows = TrainingTotals.objects.all()
+        if profiles is not None:
+            rows = rows.filter(profile__in=profiles)
+        rows.delete()
+        TrainingTotals.objects.bulk_create([
+            TrainingTotals(profile_id=profile_id, activity_type_id=activity_type_id, period=period,
+                           period_start=start, distance=distance, moving_time=moving_time, count=count)
+            for (profile_id, activity_type_id, period, start), (distance, moving_time, count)
+            in expected(profiles).items()
+        ], batch_size=1000)
+
+
+def totals_for(profile, period, day=None):
+    """Totals of the period containing ``day`` (today by default): ``{activity_type_id: row}``."""
+    start = period_starts(timezone.now() if day is None else day)[period]
+    return {row.activity_type_id: row for row in TrainingTotals.objects.filter(
+        profile=profile, period=period, period_start=start).select_related('activity_type')}
@@ -0,0 +1,77 @@
+"""Columnar track storage.
+
+A track is decoded once into a float64 array of shape ``(6, n)`` with the rows
+listed below and saved as ``.npy`` so that readers can memory-map it instead of
+parsing the GPX or FIT file again. Missing elevation or time is stored as ``nan``. ``DETAIL``
+holds the RDP significance of each point (see ``activities.simplify``).
+"""
+import io
+from array import array
+
+import numpy as np
+from django.core.files.base import ContentFile
+
+from . import fit, gpx
+from .simplify import track_significance
+from vsrala.timing import span
+
+LATITUDE, LONGITUDE, ELEVATION, TIME, SEGMENT, DETAIL = range(6)
+ROWS = 6
+
+NAN = float('nan')
+
+
+def build_track(points):
+    """Pack ``(lat, lon, ele, time, segment)`` tuples into a columnar array."""
+    columns = [array('d') for _ in range(DETAIL)]
+    latitudes, longitudes, elevations, times, segments = columns
+    for point in points:
+        latitude, longitude, elevation, point_time, segment = point
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        elevations.append(NAN if elevation is None else elevation)
+        times.append(NAN if point_time is None else point_time)
+        segments.append(segment)
+    track = np.empty((ROWS, len(latitudes)))
+    for row, column in enumerate(columns):
+        track[row] = np.frombuffer(column, dtype=np.float64) if column else []
+    track[DETAIL] = track_significance(track[LATITUDE], track[LONGITUDE], track[SEGMENT])
+    return track
+
+
+def decode_track(file):
+    """Decode a GPX or FIT file (detected by the header, not the name) into a track array."""
+    with span('parse'):
+        header = file.read(fit.HEADER_MIN_SIZE)
+        file.seek(0)
+        reader = fit if fit.is_fit(header) else gpx
+        return build_track(reader.iter_points(file))
+
+
+def open_track_file(activity):
+    """Binary stream of the activity's track file, decompressed on the fly if stored compressed."""
+    return activity.track_file.storage.open(activity.track_file.name, 'rb')
+
+
+def save_track(activity, track):
+    """Store ``track`` as the activity's ``track_data`` (does not save the model)."""
+    buffer = io.BytesIO()
+    np.save(buffer, track, allow_pickle=False)
+    if activity.track_data:
+        activity.track_data.delete(save=False)
+    activity.track_data.save(f'{activity.pk}.npy', ContentFile(buffer.getvalue()), save=False)
+
+
+def load_track(activity):
+    """Memory-mapped track of the activity, decoding the track file if there is no artifact yet."""
+    if activity.track_data:
+        track = np.load(activity.track_data.path, mmap_mode='r', allow_pickle=False)
+        if track.shape[0] < ROWS:
+            # Файл в старом формате, до пересборки через build_tracks --force
+            detail = track_significance(track[LATITUDE], track[LONGITUDE], track[SEGMENT])
+            track = np.vstack((track, detail))
+        return track
+    if activity.track_file:
+        with open_track_file(activity) as track_file:
+            return decode_track(track_file)
+    return np.empty((ROWS, 0))
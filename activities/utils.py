@@ -1,17 +1,39 @@
+import hashlib
+
 import folium
-import gpxpy
-
-
-def get_map(file_path):
-    gpx_file = open(file_path, 'r')
-    gpx = gpxpy.parse(gpx_file)
-    points = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                points.append(tuple([point.latitude, point.longitude]))
-    latitude = sum(p[0] for p in points) / len(points)
-    longitude = sum(p[1] for p in points) / len(points)
-    folium_map = folium.Map(location=[latitude, longitude], zoom_start=10)
-    folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(folium_map)
-    return folium_map._repr_html_()
+import numpy as np
+from django.conf import settings
+
+from .geo import fit_zoom
+from .simplify import detail_mask
+from .tracks import DETAIL, LATITUDE, LONGITUDE, load_track
+from vsrala.timing import span
+
+
+def get_map(activity):
+    with span('map'):
+        return _render_map(activity)
+
+
+def _render_map(activity):
+    track = load_track(activity)
+    width, height = settings.MAP_SIZE
+    zoom = fit_zoom(track[LATITUDE], track[LONGITUDE], width, height)
+    # Рисуем только точки, различимые на начальном масштабе карты
+    visible = detail_mask(track[DETAIL], zoom)
+    points = np.column_stack((track[LATITUDE][visible], track[LONGITUDE][visible])).round(6).tolist()
+    latitude = (float(track[LATITUDE].min()) + float(track[LATITUDE].max())) / 2
+    longitude = (float(track[LONGITUDE].min()) + float(track[LONGITUDE].max())) / 2
+    with span('folium'):
+        folium_map = folium.Map(location=[latitude, longitude], zoom_start=zoom)
+        folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(folium_map)
+        return folium_map._repr_html_()
+
+
+def hash_file(file_path):
+    """SHA-256 of the file contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:27
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_followers(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    for profile in Profile.objects.annotate(count=Count('followers')).filter(count__gt=0):
+        Profile.objects.filter(pk=profile.pk).update(followers_count=profile.count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_profile_follows_alter_follow_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='подписчиков'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:48
+
+from django.db import migrations, models
+import user_medias.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_profile_followers_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=user_medias.storage.ContentAddressedStorage(), upload_to='pictures', verbose_name='фото профиля'),
+        ),
+    ]
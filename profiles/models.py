@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
+from user_medias.storage import content_storage
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -40,7 +42,9 @@ class UserManager(BaseUserManager):
 class Profile(AbstractUser):
     username = None
     email = models.EmailField(_('email address'), unique=True)
-    photo = models.ImageField(upload_to='pictures', blank=True, null=True, verbose_name='фото профиля')
+    photo = models.ImageField(upload_to='pictures', storage=content_storage, blank=True, null=True,
+                              verbose_name='фото профиля')
+    followers_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='подписчиков')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
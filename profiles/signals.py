@@ -0,0 +1,38 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Follow, Profile
+
+# Отправляются при любом способе подписки/отписки: через Follow или profile.follows
+# Аргументы: user_id, following_id
+follow_added = Signal()
+follow_removed = Signal()
+
+
+def _change_followers_count(following_id, delta):
+    Profile.objects.filter(pk=following_id).update(followers_count=F('followers_count') + delta)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        _change_followers_count(instance.following_id, 1)
+        follow_added.send(sender=Follow, user_id=instance.user_id, following_id=instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    _change_followers_count(instance.following_id, -1)
+    follow_removed.send(sender=Follow, user_id=instance.user_id, following_id=instance.following_id)
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def follows_added(sender, instance, action, reverse, pk_set, **kwargs):
+    # remove() и clear() удаляют строки Follow по одной, их ловит post_delete
+    if action != 'post_add':
+        return
+    for pk in pk_set:
+        user_id, following_id = (pk, instance.pk) if reverse else (instance.pk, pk)
+        _change_followers_count(following_id, 1)
+        follow_added.send(sender=Follow, user_id=user_id, following_id=following_id)
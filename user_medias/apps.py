@@ -5,3 +5,6 @@ class UserMediasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_medias'
     verbose_name = 'пользовательские медиафайлы'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles.models import Profile
+from user_medias import variants
+from user_medias.models import ActivityMedia
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии фото тренировок и профилей, которых еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='пересоздать существующие копии')
+
+    def handle(self, *args, **options):
+        names = list(ActivityMedia.objects.exclude(image='').values_list('image', flat=True))
+        names += Profile.objects.exclude(photo='').exclude(photo__isnull=True).values_list('photo', flat=True)
+        created = failed = 0
+        started = time.perf_counter()
+        for name in names:
+            try:
+                created += len(variants.generate(name, force=options['force']))
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f'{name}: {exc}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(names)} фото, создано копий: {created}, ошибок: {failed}, {elapsed:.1f} с'
+        ))
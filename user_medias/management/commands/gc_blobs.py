@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from user_medias.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ссылки на файлы дедуплицирующего хранилища и удаляет файлы без ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=24, help='не трогать файлы моложе стольких часов')
+        parser.add_argument('--dry-run', action='store_true', help='только показать, что будет сделано')
+
+    def handle(self, *args, **options):
+        result = collect_garbage(grace=options['grace'] * 60 * 60, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write('Пробный запуск, ничего не изменено')
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов в учете: {result["blobs"]}, исправлено счетчиков: {result["recounted"]}, '
+            f'удалено файлов без ссылок: {result["removed"]} ({result["freed"] / 1024 / 1024:.1f} МБ)'
+        ))
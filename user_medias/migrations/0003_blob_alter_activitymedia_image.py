@@ -0,0 +1,33 @@
+# Generated by Django 4.0.3 on 2026-10-17 00:48
+
+from django.db import migrations, models
+import user_medias.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_medias', '0002_alter_activitymedia_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='имя файла')),
+                ('size', models.BigIntegerField(default=0, verbose_name='размер')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата создания')),
+            ],
+            options={
+                'verbose_name': 'файл хранилища',
+                'verbose_name_plural': 'файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='activitymedia',
+            name='image',
+            field=models.ImageField(storage=user_medias.storage.ContentAddressedStorage(), upload_to='pictures', verbose_name='файл изображения'),
+        ),
+    ]
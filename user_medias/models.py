@@ -1,5 +1,7 @@
 from django.db import models
 
+from .storage import content_storage
+
 
 class ActivityMedia(models.Model):
     class Meta:
@@ -10,10 +12,26 @@ class ActivityMedia(models.Model):
                              verbose_name='название изображения')
     description = models.TextField(max_length=2000, blank=True, null=True,
                                    verbose_name='описание изображения')
-    image = models.ImageField(upload_to='pictures', verbose_name='файл изображения')
+    image = models.ImageField(upload_to='pictures', storage=content_storage, verbose_name='файл изображения')
     activity = models.ForeignKey('activities.Activity', related_name='medias',
                                  on_delete=models.CASCADE,
                                  verbose_name='тренировка')
 
     def __str__(self):
         return self.image.path
+
+
+class Blob(models.Model):
+    """File in the content-addressed storage and the number of references to it."""
+
+    class Meta:
+        verbose_name = 'файл хранилища'
+        verbose_name_plural = 'файлы хранилища'
+
+    name = models.CharField(max_length=255, unique=True, verbose_name='имя файла')
+    size = models.BigIntegerField(default=0, verbose_name='размер')
+    references = models.PositiveIntegerField(default=0, verbose_name='ссылок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+
+    def __str__(self):
+        return self.name
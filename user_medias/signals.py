@@ -0,0 +1,86 @@
+import logging
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from profiles.models import Profile
+from . import variants
+from .storage import content_fields
+from .models import ActivityMedia
+
+logger = logging.getLogger(__name__)
+
+
+def _stored_name(value):
+    # Строка из базы или FieldFile; несохраненный File еще не занимает ссылку
+    if isinstance(value, str):
+        return value
+    return getattr(value, 'name', None) if hasattr(value, 'storage') else None
+
+
+def remember_files(sender, instance, **kwargs):
+    instance._stored_files = {field: _stored_name(instance.__dict__.get(field)) for field in content_fields(sender)}
+
+
+def release_replaced_files(sender, instance, **kwargs):
+    fields = content_fields(sender)
+    stored = getattr(instance, '_stored_files', {})
+    for field in fields:
+        current = _stored_name(instance.__dict__.get(field))
+        previous = stored.get(field)
+        if previous and previous != current:
+            getattr(instance, field).storage.delete(previous)
+        stored[field] = current
+    instance._stored_files = stored
+
+
+def release_files(sender, instance, **kwargs):
+    for field in content_fields(sender):
+        name = _stored_name(instance.__dict__.get(field))
+        if name:
+            getattr(instance, field).storage.delete(name)
+
+
+def connect_content_models():
+    """Count references only for models with content-addressed fields.
+
+    ``post_init`` fires for every model instance loaded, so the receivers are
+    not connected to other models at all.
+    """
+    for model in apps.get_models():
+        if content_fields(model):
+            post_init.connect(remember_files, sender=model)
+            post_save.connect(release_replaced_files, sender=model)
+            post_delete.connect(release_files, sender=model)
+
+
+# Модуль импортируется из ready(). Подключаем до drop_media_variants: тот проверяет, освобожден ли файл
+connect_content_models()
+
+
+def _generate(name):
+    # Не мешаем сохранению: недостающие копии создаст image_variant при первом запросе
+    try:
+        variants.generate(name)
+    except (OSError, ValueError):
+        logger.warning('Не удалось создать копии %s', name, exc_info=True)
+
+
+@receiver(post_save, sender=ActivityMedia)
+def media_variants(sender, instance, **kwargs):
+    if instance.image:
+        _generate(instance.image.name)
+
+
+@receiver(post_delete, sender=ActivityMedia)
+def drop_media_variants(sender, instance, **kwargs):
+    # Фото могло остаться у другой записи, тогда копии еще нужны
+    if instance.image and not instance.image.storage.exists(instance.image.name):
+        variants.delete(instance.image.name)
+
+
+@receiver(post_save, sender=Profile)
+def photo_variants(sender, instance, update_fields=None, **kwargs):
+    if instance.photo and (update_fields is None or 'photo' in update_fields):
+        _generate(instance.photo.name)
@@ -0,0 +1,197 @@
+"""Content-addressed, deduplicated file storage.
+
+Files are stored as ``<upload_to>/ab/cd/<sha256><ext>``: saving a file whose
+content is already stored writes nothing and returns the existing name. Each
+write adds a reference in ``Blob``; references are released when the row
+holding the file is deleted or the file is replaced (``user_medias.signals``)
+and through ``storage.delete()``. The blob itself is removed with its last
+reference. ``manage.py gc_blobs`` recounts references from the model fields
+and removes orphaned blobs.
+
+``CompressedContentStorage`` additionally gzips files on write and
+decompresses them on read as a stream; its blob names still carry the
+SHA-256 of the original content.
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F, FileField
+from django.utils.deconstruct import deconstructible
+
+RE_BLOB = re.compile(r'^(?:.+/)?[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.\w+)*$')
+
+
+def content_hash(name):
+    """SHA-256 of the file encoded in a blob name, ``None`` for other names."""
+    match = RE_BLOB.match(name or '')
+    return match.group('digest') if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    suffix = ''
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в _save, совпадение имен и есть дедупликация
+        return name
+
+    def _write(self, content, output):
+        """Copy ``content`` into ``output`` and return its SHA-256."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+            output.write(chunk)
+        return digest.hexdigest()
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=self._temp_dir(), delete=False) as temporary:
+            digest = self._write(content, temporary)
+            size = temporary.tell()
+        if self.suffix and name.endswith(self.suffix):
+            name = name[:-len(self.suffix)]
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest[2:4], digest + extension + self.suffix)
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(temporary.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Тот же файл мог появиться параллельно - содержимое одинаковое, замена безопасна
+            os.replace(temporary.name, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+
+        with transaction.atomic():
+            blob, _ = Blob.objects.get_or_create(name=name, defaults={'size': size})
+            Blob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+        return name
+
+    def _temp_dir(self):
+        directory = os.path.join(self.location, '.incoming')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def delete(self, name):
+        """Release one reference; the file is removed with the last one."""
+        from .models import Blob
+
+        if not content_hash(name):
+            return super(ContentAddressedStorage, self).delete(name)
+        with transaction.atomic():
+            updated = Blob.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+            # Без учтенной ссылки файл не трогаем, его при необходимости уберет gc_blobs
+            if not updated or Blob.objects.filter(name=name, references__gt=0).exists():
+                return
+            Blob.objects.filter(name=name).delete()
+        super(ContentAddressedStorage, self).delete(name)
+
+
+@deconstructible
+class CompressedContentStorage(ContentAddressedStorage):
+    """Gzips files on write; ``open()`` returns a decompressing stream.
+
+    Files without the ``.gz`` suffix, stored before compression was enabled,
+    are read as is (``manage.py compress_tracks`` converts them).
+    """
+    suffix = '.gz'
+    compresslevel = 6
+
+    def _write(self, content, output):
+        # mtime=0: одинаковое содержимое дает одинаковый файл
+        with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=self.compresslevel, mtime=0) as compressed:
+            return super(CompressedContentStorage, self)._write(content, compressed)
+
+    def _open(self, name, mode='rb'):
+        if not name.endswith(self.suffix):
+            return super(CompressedContentStorage, self)._open(name, mode)
+        return File(gzip.open(self.path(name), mode), name)
+
+
+content_storage = ContentAddressedStorage()
+
+compressed_storage = CompressedContentStorage()
+
+_content_fields = {}
+
+
+def content_fields(model):
+    """Names of the model's file fields stored in ``ContentAddressedStorage``."""
+    if model not in _content_fields:
+        _content_fields[model] = [field.attname for field in model._meta.concrete_fields
+                                  if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)]
+    return _content_fields[model]
+
+
+def referenced_names():
+    """``Counter`` of blob names over all content-addressed file fields."""
+    counts = Counter()
+    for model in apps.get_models():
+        for field in content_fields(model):
+            names = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}) \
+                .values_list(field, flat=True)
+            counts.update(names.iterator())
+    return counts
+
+
+def _upload_directories():
+    directories = set()
+    for model in apps.get_models():
+        for field in content_fields(model):
+            upload_to = model._meta.get_field(field).upload_to
+            if isinstance(upload_to, str):
+                directories.add(upload_to.split('/', 1)[0])
+    return directories
+
+
+def collect_garbage(storage=content_storage, grace=24 * 60 * 60, dry_run=False):
+    """Recount references and remove blobs nothing refers to.
+
+    Files younger than ``grace`` seconds are kept: they may belong to an
+    upload whose row is not saved yet.
+    """
+    from .models import Blob
+
+    counts = referenced_names()
+    result = {'blobs': 0, 'recounted': 0, 'removed': 0, 'freed': 0}
+    for blob in Blob.objects.iterator():
+        result['blobs'] += 1
+        if blob.references == counts[blob.name]:
+            continue
+        result['recounted'] += 1
+        if dry_run:
+            continue
+        if not counts[blob.name] and not storage.exists(blob.name):
+            # Файла уже нет, строка больше не нужна
+            Blob.objects.filter(pk=blob.pk).delete()
+        else:
+            Blob.objects.filter(pk=blob.pk).update(references=counts[blob.name])
+
+    deadline = time.time() - grace
+    for directory in _upload_directories():
+        for root, _, files in os.walk(storage.path(directory)):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if not content_hash(name) or counts[name] or os.path.getmtime(path) > deadline:
+                    continue
+                result['removed'] += 1
+                result['freed'] += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+                    Blob.objects.filter(name=name).delete()
+    return result
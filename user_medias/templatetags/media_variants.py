@@ -0,0 +1,29 @@
+from django import template
+from django.conf import settings
+
+from user_medias import variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, image_format='jpeg'):
+    """``srcset`` value with all variants of an ``ImageField`` file."""
+    return variants.srcset(image.name, image_format) if image else ''
+
+
+@register.inclusion_tag('user_medias/picture.html')
+def picture(image, sizes='100vw', alt='', css_class=''):
+    """``<picture>`` with WebP variants and a JPEG fallback."""
+    if not image:
+        return {}
+    default_width = sorted(settings.IMAGE_VARIANT_WIDTHS)[len(settings.IMAGE_VARIANT_WIDTHS) // 2]
+    return {
+        'image': image,
+        'webp': variants.srcset(image.name, 'webp'),
+        'jpeg': variants.srcset(image.name, 'jpeg'),
+        'src': variants.url(image.name, default_width, 'jpeg'),
+        'sizes': sizes,
+        'alt': alt,
+        'css_class': css_class,
+    }
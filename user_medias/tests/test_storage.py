@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Follow, Profile
+from user_medias.models import ActivityMedia, Blob
+from user_medias.storage import compressed_storage, content_hash, content_storage, collect_garbage
+from user_medias.tests.test_variants import make_photo
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.profile = Profile.objects.create(email='blobs@mail.ru')
+        self.activity = Activity.objects.create(profile=self.profile,
+                                                started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc))
+
+    def add_photo(self, orientation=1):
+        return ActivityMedia.objects.create(activity=self.activity, image=make_photo(orientation=orientation))
+
+    def test_only_content_models_tracked(self):
+        with mock.patch('user_medias.signals.content_fields', return_value=[]) as fields:
+            Follow(user=self.profile, following=self.profile)
+            ActivityMedia(activity=self.activity)
+        assert [call.args[0] for call in fields.call_args_list] == [ActivityMedia]
+
+    def test_same_content_stored_once(self):
+        first, second = self.add_photo(), self.add_photo()
+        assert first.image.name == second.image.name
+        assert first.image.name.startswith('pictures/') and content_hash(first.image.name)
+        assert Blob.objects.get().references == 2
+        other = self.add_photo(orientation=3)
+        assert other.image.name != first.image.name
+
+        first.delete()
+        assert os.path.exists(second.image.path)
+        second.delete()
+        assert not os.path.exists(second.image.path)
+        assert list(Blob.objects.values_list('name', flat=True)) == [other.image.name]
+
+    def test_replaced_file_is_released(self):
+        self.profile.photo = make_photo()
+        self.profile.save()
+        old = self.profile.photo.path
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.photo = make_photo(orientation=3)
+        profile.save()
+        assert not os.path.exists(old)
+        assert Blob.objects.get().name == profile.photo.name
+
+    def test_garbage_collection(self):
+        media = self.add_photo()
+        orphan = content_storage.save('pictures/lost.txt', ContentFile(b'nobody refers to me'))
+        Blob.objects.filter(name=media.image.name).update(references=5)
+
+        assert collect_garbage()['removed'] == 0
+        assert Blob.objects.get(name=media.image.name).references == 1
+        out = io.StringIO()
+        call_command('gc_blobs', grace=0, stdout=out)
+        assert 'удалено файлов без ссылок: 1' in out.getvalue()
+        assert not content_storage.exists(orphan)
+        assert content_storage.exists(media.image.name)
+        assert not Blob.objects.filter(name=orphan).exists()
+
+
+class CompressedStorageTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='gzip@mail.ru')
+        self.gpx = make_gpx(make_track(points=500))
+
+    def test_compressed_on_write(self):
+        name = compressed_storage.save('activities/ride.gpx', ContentFile(self.gpx))
+        assert name.endswith('.gpx.gz')
+        # Имя по-прежнему из хеша исходного файла
+        assert content_hash(name) == hashlib.sha256(self.gpx).hexdigest()
+        with open(compressed_storage.path(name), 'rb') as stored:
+            assert gzip.decompress(stored.read()) == self.gpx
+        assert Blob.objects.get(name=name).size < len(self.gpx) / 4
+        with compressed_storage.open(name) as track_file:
+            assert track_file.read() == self.gpx
+        assert compressed_storage.save('activities/copy.gpx', ContentFile(self.gpx)) == name
+
+    def test_compress_existing(self):
+        old = content_storage.save('activities/ride.gpx', ContentFile(self.gpx))
+        activity = Activity.objects.create(profile=self.profile,
+                                           started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc))
+        Activity.objects.filter(pk=activity.pk).update(track_file=old)
+        out = io.StringIO()
+        call_command('compress_tracks', stdout=out)
+        assert 'Сжато: 1' in out.getvalue()
+        activity.refresh_from_db()
+        assert activity.track_file.name == old + '.gz'
+        assert not content_storage.exists(old)
+
+        self.client.force_login(self.profile)
+        response = self.client.get(reverse('webinterface:track_download', args=[activity.pk]))
+        assert response['Content-Disposition'] == f'attachment; filename="activity-{activity.pk}.gpx"'
+        assert b''.join(response.streaming_content) == self.gpx
+
+    def test_processed_from_compressed_file(self):
+        activity = Activity.objects.create(profile=self.profile,
+                                           started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc),
+                                           track_file=ContentFile(self.gpx, name='ride.gpx'))
+        activity.refresh_from_db()
+        assert activity.status == Activity.Status.READY
+        assert activity.track_hash == content_hash(activity.track_file.name)
+        assert activity.distance > 0
@@ -0,0 +1,86 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from activities.models import Activity
+from profiles.models import Profile
+from user_medias import variants
+from user_medias.models import ActivityMedia
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_photo(size=(1600, 1200), orientation=6):
+    """JPEG as a phone saves it: landscape pixels plus an EXIF rotation."""
+    image = Image.new('RGB', size, (200, 30, 30))
+    image.paste((30, 30, 200), (0, 0, size[0] // 2, size[1] // 4))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010f] = 'PhoneMaker'
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', exif=exif.tobytes())
+    return ContentFile(buffer.getvalue(), name='photo.jpg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANT_WIDTHS=(320, 640, 1280))
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.profile = Profile.objects.create(email='photos@mail.ru')
+        activity = Activity.objects.create(profile=self.profile,
+                                           started_at=datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc))
+        self.media = ActivityMedia.objects.create(activity=activity, image=make_photo())
+        self.name = self.media.image.name
+
+    def variant_path(self, width, image_format):
+        return os.path.join(MEDIA_ROOT, variants.variant_name(self.name, width, image_format))
+
+    def test_generated_on_upload(self):
+        with Image.open(self.variant_path(640, 'jpeg')) as image:
+            # Поворот из EXIF применен, сами метаданные не скопированы
+            assert image.size == (640, 853)
+            assert not image.getexif()
+        with Image.open(self.variant_path(1280, 'webp')) as image:
+            assert image.size == (1200, 1600)
+        self.media.delete()
+        assert not os.path.exists(self.variant_path(640, 'jpeg'))
+
+    def test_lazy_generation_and_backfill(self):
+        variants.delete(self.name)
+        response = self.client.get(variants.url(self.name, 320, 'webp'))
+        assert response.status_code == 200 and response['Content-Type'] == 'image/webp'
+        assert os.path.exists(self.variant_path(320, 'webp'))
+        assert variants.url(self.name, 320, 'webp').startswith('/media/')
+
+        variants.delete(self.name)
+        call_command('build_image_variants', stdout=io.StringIO())
+        assert os.path.exists(self.variant_path(1280, 'jpeg'))
+
+    def test_lazy_view_rejects_other_files(self):
+        for width, name in ((320, '../vsrala/settings.py'), (320, 'tracks/1.npy'), (100, self.name)):
+            response = self.client.get(f'/images/{width}/jpeg/{name}')
+            assert response.status_code == 404
+
+    def test_template_tags(self):
+        content = Template('{% load media_variants %}<img srcset="{% srcset media.image %}">'
+                           '{% picture media.image alt="Фото" %}').render(Context({'media': self.media}))
+        assert '640.jpeg 640w' in content
+        assert 'type="image/webp"' in content and '1280.webp 1280w' in content
+
+    def test_profile_photo(self):
+        self.profile.photo = make_photo(orientation=1)
+        self.profile.save()
+        with Image.open(os.path.join(MEDIA_ROOT, variants.variant_name(self.profile.photo.name, 320, 'jpeg'))) as image:
+            assert image.size == (320, 240)
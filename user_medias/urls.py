@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import image_variant
+
+app_name = 'user_medias'
+
+urlpatterns = [
+    path('<int:width>/<str:image_format>/<path:name>', image_variant, name='image_variant'),
+]
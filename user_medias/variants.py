@@ -0,0 +1,95 @@
+"""Downscaled variants of uploaded photos.
+
+Variants are stored next to the other media under
+``IMAGE_VARIANTS_DIR/<original name without extension>/<width>.<format>``:
+the name only depends on the original file, so the directory doubles as a
+disk cache. They are generated on upload (``user_medias.signals``), by
+``manage.py build_image_variants`` and, when missing, on the first request
+to ``image_variant`` view. EXIF orientation is applied and metadata is not
+copied to the variants.
+"""
+import io
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+
+def variant_name(name, width, image_format):
+    base = posixpath.splitext(name)[0]
+    return posixpath.join(settings.IMAGE_VARIANTS_DIR, base, f'{width}.{image_format}')
+
+
+def open_original(name):
+    with default_storage.open(name, 'rb') as original:
+        image = Image.open(io.BytesIO(original.read()))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def generate(name, force=False):
+    """Create the missing variants of the image ``name``; returns names of the created files.
+
+    Images narrower than a configured width are not upscaled: that variant
+    keeps the original size.
+    """
+    targets = [(width, image_format, variant_name(name, width, image_format))
+               for width in sorted(settings.IMAGE_VARIANT_WIDTHS, reverse=True)
+               for image_format in settings.IMAGE_VARIANT_FORMATS]
+    if not force:
+        targets = [target for target in targets if not default_storage.exists(target[2])]
+    if not targets:
+        return []
+    image = open_original(name)
+    created = []
+    for width, image_format, target in targets:
+        if width < image.width:
+            # Уменьшаем от предыдущего варианта: так быстрее, чем каждый раз от оригинала
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, quality=settings.IMAGE_VARIANT_QUALITY, **SAVE_OPTIONS[image_format])
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        created.append(default_storage.save(target, ContentFile(buffer.getvalue())))
+    return created
+
+
+def delete(name):
+    base = posixpath.splitext(name)[0]
+    directory = posixpath.join(settings.IMAGE_VARIANTS_DIR, base)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        default_storage.delete(posixpath.join(directory, file_name))
+
+
+def url(name, width, image_format):
+    """Media URL of the variant if it exists, otherwise the view that generates it."""
+    target = variant_name(name, width, image_format)
+    if default_storage.exists(target):
+        return default_storage.url(target)
+    return reverse('user_medias:image_variant', kwargs={'width': width, 'image_format': image_format, 'name': name})
+
+
+def srcset(name, image_format):
+    return ', '.join(f'{url(name, width, image_format)} {width}w' for width in settings.IMAGE_VARIANT_WIDTHS)
+
+
+def is_allowed(name):
+    """Only existing files from the upload directories, no path tricks."""
+    normalized = posixpath.normpath(name)
+    return normalized == name and not os.path.isabs(name) and \
+        normalized.split('/', 1)[0] in settings.IMAGE_VARIANT_SOURCES and default_storage.exists(name)
@@ -1,3 +1,19 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views.decorators.cache import cache_control
 
-# Create your views here.
+from . import variants
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+@cache_control(public=True, max_age=30 * 24 * 60 * 60)
+def image_variant(request, width, image_format, name):
+    """Serve a variant, generating it into the variants directory on the first request."""
+    if width not in settings.IMAGE_VARIANT_WIDTHS or image_format not in settings.IMAGE_VARIANT_FORMATS \
+            or not variants.is_allowed(name):
+        raise Http404
+    variants.generate(name)
+    return FileResponse(default_storage.open(variants.variant_name(name, width, image_format), 'rb'),
+                        content_type=CONTENT_TYPES[image_format])
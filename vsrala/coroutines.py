@@ -0,0 +1,15 @@
+"""Marking callables as coroutine functions on Django 4.0."""
+import asyncio
+
+
+def mark_coroutine(obj):
+    """Make ``asyncio.iscoroutinefunction(obj)`` true and return ``obj``.
+
+    Specific to Django 4.0 on Python < 3.12: Django checks async views and
+    middleware with ``asyncio.iscoroutinefunction``, which looks at the private
+    ``asyncio.coroutines._is_coroutine`` marker. ``MiddlewareMixin`` sets it the
+    same way. Newer Django has ``markcoroutinefunction`` for this; switch to it
+    when upgrading.
+    """
+    obj._is_coroutine = asyncio.coroutines._is_coroutine
+    return obj
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'vsrala.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -136,6 +137,93 @@ MEDIA_URL = 'media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Tracks and maps
+
+# Допуск упрощения трека (RDP) в пикселях карты
+TRACK_SIMPLIFY_TOLERANCE = 1.0
+
+# Размер карты на странице тренировки, по нему выбирается начальный масштаб
+MAP_SIZE = (640, 400)
+
+# Превью маршрута для ленты
+ROUTE_THUMBNAIL_SIZE = (540, 240)
+
+ROUTE_THUMBNAIL_FORMAT = 'WEBP'
+
+# Уменьшенные копии фото (user_medias.variants): ширины, форматы и папка внутри MEDIA_ROOT
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_VARIANTS_DIR = 'variants'
+
+# Папки загрузок, для файлов из которых можно запросить уменьшенную копию
+IMAGE_VARIANT_SOURCES = ('pictures',)
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Время жизни закешированной карточки тренировки в ленте, сек
+FEED_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Кеш отрисованных карт: алиас из CACHES и файловый уровень с LRU-вытеснением
+MAP_CACHE_ALIAS = 'default'
+
+MAP_CACHE_DIR = BASE_DIR / 'cache' / 'maps'
+
+MAP_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# Лента: авторы с большим числом подписчиков не раскладываются по лентам при записи,
+# их тренировки подмешиваются при чтении
+FEED_FANOUT_LIMIT = 1000
+
+# Сколько последних тренировок добавить в ленту при новой подписке
+FEED_BACKFILL_LIMIT = 200
+
+# Очередь обработки треков (manage.py process_tracks)
+
+# True - обрабатывать трек сразу при сохранении, без воркера
+TRACK_PROCESSING_EAGER = False
+
+TRACK_JOB_MAX_ATTEMPTS = 3
+
+# Задержка перед повтором, сек; удваивается с каждой попыткой
+TRACK_JOB_RETRY_DELAY = 30
+
+# Через сколько секунд зависшая задача снова отдается воркерам
+TRACK_JOB_TIMEOUT = 600
+
+# Пул потоков для отрисовки карт из асинхронных представлений: одновременно работают
+# TRACK_POOL_WORKERS задач, еще TRACK_POOL_QUEUE ждут, остальные страницы отдаются без карты
+TRACK_POOL_WORKERS = 2
+
+TRACK_POOL_QUEUE = 8
+
+# Сегменты: на каком расстоянии от линии сегмента, м, трек еще считается проездом по нему
+SEGMENT_MATCH_TOLERANCE = 30
+
+# Личные тепловые карты (activities.heatmap): счетчики по тайлам и PNG-кеш
+HEATMAP_DIR = BASE_DIR / 'heatmaps'
+
+HEATMAP_MAX_ZOOM = 14
+
+# Замеры запросов (vsrala.timing): доля запросов с заголовком Server-Timing и гистограммами
+# по представлениям; 0 - выключено
+SERVER_TIMING_SAMPLE_RATE = 0.0
+
+# Гистограммы хранятся за последние SERVER_TIMING_WINDOWS окон по SERVER_TIMING_WINDOW сек
+SERVER_TIMING_WINDOW = 60
+
+SERVER_TIMING_WINDOWS = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
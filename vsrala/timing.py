@@ -0,0 +1,226 @@
+"""Per-request timing: ``Server-Timing`` headers and rolling per-view histograms.
+
+``ServerTimingMiddleware`` samples ``SERVER_TIMING_SAMPLE_RATE`` of the
+requests. For a sampled request it collects ``span()`` durations (track
+parsing, map rendering), SQL time through a database execute wrapper and
+template rendering, sends them as ``Server-Timing`` and adds them to
+histograms kept per view for the last ``SERVER_TIMING_WINDOWS`` windows of
+``SERVER_TIMING_WINDOW`` seconds. Outside a sampled request ``span()`` costs
+one context variable lookup. Histograms live in the memory of each process.
+
+The SQL wrapper is installed on every connection when it is opened, so
+queries run from ``sync_to_async`` threads of async views are counted too.
+"""
+import asyncio
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .coroutines import mark_coroutine
+
+# Верхние границы корзин гистограммы, мс; последняя корзина - все, что дольше
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_current = ContextVar('server_timing', default=None)
+
+
+class Timings:
+    """Durations collected during one request: name -> [seconds, count]."""
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name, seconds):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header(self, total):
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{count}"' for name, (seconds, count) in self.spans.items()]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class span:
+    """``with span('map'):`` adds the block's duration to the current request, if it is sampled."""
+    __slots__ = ('name', 'timings', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current.get()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.
+        self.count = 0
+
+    def add(self, milliseconds):
+        self.counts[bisect_left(BUCKETS, milliseconds)] += 1
+        self.total += milliseconds
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile, ``None`` beyond the last bound."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(.5),
+            'p95_ms': self.percentile(.95),
+            'p99_ms': self.percentile(.99),
+            'buckets': {str(bound): count for bound, count in zip(BUCKETS + ('inf',), self.counts) if count},
+        }
+
+
+class RollingHistograms:
+    """Histograms per ``(view, metric)`` split into time windows; old windows are dropped."""
+
+    def __init__(self, window, windows):
+        self.window = window
+        self.windows = windows
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def add(self, view, metric, milliseconds, now=None):
+        index = int((time.time() if now is None else now) // self.window)
+        with self._lock:
+            series = self._series.setdefault((view, metric), deque())
+            if not series or series[-1][0] != index:
+                series.append((index, Histogram()))
+                while index - series[0][0] >= self.windows:
+                    series.popleft()
+            series[-1][1].add(milliseconds)
+
+    def snapshot(self, now=None):
+        """``{view: {metric: summary}}`` over the windows still in range."""
+        oldest = int((time.time() if now is None else now) // self.window) - self.windows + 1
+        result = {}
+        with self._lock:
+            for (view, metric), series in self._series.items():
+                merged = Histogram()
+                for index, histogram in series:
+                    if index >= oldest:
+                        merged.merge(histogram)
+                if merged.count:
+                    result.setdefault(view, {})[metric] = merged.summary()
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+histograms = RollingHistograms(settings.SERVER_TIMING_WINDOW, settings.SERVER_TIMING_WINDOWS)
+
+
+def _time_query(execute, sql, params, many, context):
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    with span('db'):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _sampled():
+    sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+    return sample_rate and random.random() < sample_rate
+
+
+def _finish(request, response, timings, started):
+    total = time.perf_counter() - started
+    response['Server-Timing'] = timings.header(total)
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    histograms.add(view, 'total', total * 1000)
+    for name, (seconds, _) in timings.spans.items():
+        histograms.add(view, name, seconds * 1000)
+    return response
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в django.utils.deprecation.MiddlewareMixin: цепочка остается асинхронной
+            mark_coroutine(self)
+        for connection in connections.all():
+            install_query_timer(None, connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timings, started)
+
+    def process_template_response(self, request, response):
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+            # Вызывается сразу после отрисовки шаблона
+            response.add_post_render_callback(lambda _: timings.add('template', time.perf_counter() - started))
+        return response
@@ -20,6 +20,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('images/', include('user_medias.urls', namespace='user_medias')),
     path('', include('webinterface.urls', namespace='webinterface')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
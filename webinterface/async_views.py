@@ -0,0 +1,35 @@
+"""Async class-based views on Django 4.0.
+
+``View`` in Django 4.0 cannot dispatch to ``async def`` handlers and the ORM
+has no async API. ``AsyncLoginRequiredMixin`` marks ``as_view()`` as a
+coroutine function, the way ``MiddlewareMixin`` switches to async mode, and
+checks the login in a thread: loading the user from the session queries the
+database, which is not allowed in the event loop. Handlers may be sync or
+async; the ORM work inside them goes through ``sync_to_async``.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import AccessMixin
+from django.utils.decorators import classonlymethod
+
+from vsrala.coroutines import mark_coroutine
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return mark_coroutine(super(AsyncLoginRequiredMixin, cls).as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return self.handle_no_permission()
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        response = handler(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
@@ -0,0 +1,63 @@
+"""Conditional GET for views whose rendering is expensive.
+
+``ConditionalGetMixin`` asks the view for cheap validators (``get_etag``,
+``get_last_modified``) before ``get()`` renders anything and answers
+``304 Not Modified`` when the client's copy is current. Pages are per user,
+so responses are marked private and must be revalidated.
+``AsyncConditionalGetMixin`` does the same in an async ``get()``.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+
+    def get_etag(self):
+        return None
+
+    def get_last_modified(self):
+        return None
+
+    def get_validators(self):
+        """Quoted ETag and Last-Modified timestamp, either may be ``None``."""
+        etag = self.get_etag()
+        last_modified = self.get_last_modified()
+        return quote_etag(etag) if etag else None, int(last_modified.timestamp()) if last_modified else None
+
+    def add_validators(self, response, etag, timestamp):
+        if response.status_code in (200, 304):
+            if etag:
+                response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        etag, timestamp = self.get_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        return self.add_validators(response, etag, timestamp)
+
+
+class AsyncConditionalGetMixin(ConditionalGetMixin):
+    """Async ``get()``: validators are computed in a thread, the page only when it changed."""
+
+    async def get(self, request, *args, **kwargs):
+        etag, timestamp = await sync_to_async(self.get_validators)()
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await self.render_page(request, *args, **kwargs)
+        return self.add_validators(response, etag, timestamp)
+
+    async def render_page(self, request, *args, **kwargs):
+        # get() синхронного представления (ListView, DetailView) целиком в потоке
+        return await sync_to_async(super(ConditionalGetMixin, self).get)(request, *args, **kwargs)
@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from activities.models import Activity
+from profiles.models import Profile
+from webinterface.pagination import NEXT, CursorPaginator, DEFAULT_FIELDS, encode_cursor
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает offset- и cursor-пагинацию на глубокой странице при росте таблицы тренировок. ' \
+           'Данные создаются во временной транзакции и откатываются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[55000, 110000, 220000])
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--per-page', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        page, per_page = options['page'], options['per_page']
+        profile = Profile.objects.create(email='bench-pagination@example.com')
+        started_at = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        created = 0
+        self.stdout.write(f'{"rows":>8} {"offset, ms":>12} {"cursor, ms":>12}')
+        for size in sorted(options['sizes']):
+            Activity.objects.bulk_create(
+                [Activity(profile=profile, title='bench', started_at=started_at) for _ in range(size - created)],
+                batch_size=5000,
+            )
+            created = size
+            queryset = Activity.objects.filter(profile=profile).order_by('-created_at', '-pk')
+            position = min((page - 1) * per_page, size - 1)
+
+            offset_page = Paginator(queryset, per_page).get_page(position // per_page + 1)
+            offset_ms = timed(lambda: list(Paginator(queryset, per_page).page(position // per_page + 1))) * 1000
+
+            # Курсор предыдущей страницы получаем заранее, как если бы пользователь дошел до нее по ссылкам
+            anchor = queryset[position - 1] if position else None
+            token = encode_cursor(NEXT, anchor) if anchor else None
+            paginator = CursorPaginator([(Activity.objects.filter(profile=profile), DEFAULT_FIELDS)], per_page)
+            assert paginator.page(token).object_list == list(offset_page)
+            cursor_ms = timed(lambda: paginator.page(token)) * 1000
+            self.stdout.write(f'{size:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
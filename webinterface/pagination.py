@@ -0,0 +1,137 @@
+"""Keyset (cursor) pagination over ``(created_at, id)``.
+
+Unlike Django's ``Paginator`` there is no ``COUNT(*)`` and no ``OFFSET``:
+every page is a range scan starting right after the last row of the
+previous one, so deep pages cost the same as the first. Tokens are opaque
+url-safe strings.
+
+A paginator can read from several *sources* - ``(queryset, fields)`` pairs,
+where ``fields`` are the lookups for the created_at and id of the row in that
+queryset - and merges them, e.g. materialized feed entries plus activities of
+celebrities pulled at read time.
+"""
+import base64
+import heapq
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_FIELDS = ('created_at', 'pk')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj):
+    data = json.dumps([direction, obj.created_at.isoformat(), obj.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """``(direction, created_at, pk)`` or ``None`` for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        direction, created_at, pk = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or created_at is None or not isinstance(pk, int):
+        return None
+    return direction, created_at, pk
+
+
+def _sort_key(obj):
+    return obj.created_at, obj.pk
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    def __init__(self, sources, per_page):
+        self.sources = sources
+        self.per_page = per_page
+
+    def _fetch(self, queryset, fields, cursor):
+        created_field, pk_field = fields
+        ascending = cursor is not None and cursor[0] == PREVIOUS
+        if cursor is not None:
+            _, created_at, pk = cursor
+            # created_at <= X задает диапазон по индексу, второе условие добивает равные
+            if ascending:
+                queryset = queryset.filter(Q(**{f'{created_field}__gte': created_at}),
+                                           Q(**{f'{created_field}__gt': created_at}) | Q(**{f'{pk_field}__gt': pk}))
+            else:
+                queryset = queryset.filter(Q(**{f'{created_field}__lte': created_at}),
+                                           Q(**{f'{created_field}__lt': created_at}) | Q(**{f'{pk_field}__lt': pk}))
+        prefix = '' if ascending else '-'
+        queryset = queryset.order_by(prefix + created_field, prefix + pk_field)
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, token=None):
+        cursor = decode_cursor(token)
+        backwards = cursor is not None and cursor[0] == PREVIOUS
+        rows = []
+        seen = set()
+        merged = heapq.merge(*(self._fetch(queryset, fields, cursor) for queryset, fields in self.sources),
+                             key=_sort_key, reverse=not backwards)
+        for obj in merged:
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            rows.append(obj)
+            if len(rows) > self.per_page:
+                break
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(NEXT, rows[-1]) if rows and has_next else None,
+            previous_cursor=encode_cursor(PREVIOUS, rows[0]) if rows and has_previous else None,
+        )
+
+
+class CursorPaginationMixin:
+    """``ListView`` mixin replacing offset pagination with ``CursorPaginator``."""
+
+    cursor_param = 'cursor'
+
+    def get_sources(self):
+        return [(self.get_queryset(), DEFAULT_FIELDS)]
+
+    def get_page(self):
+        """Current page, fetched once per request (validators and rendering share it)."""
+        if not hasattr(self, '_cursor_page'):
+            self._cursor_paginator = CursorPaginator(self.get_sources(), self.get_paginate_by(None))
+            self._cursor_page = self._cursor_paginator.page(self.request.GET.get(self.cursor_param))
+        return self._cursor_page
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.get_page()
+        return self._cursor_paginator, page, page.object_list, page.has_other_pages()
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from activities import map_cache
+from activities.pool import BoundedPool, PoolBusy
+from activities.models import Activity
+from activities.tests.utils import TemporaryMediaMixin, make_gpx, make_track
+from profiles.models import Follow, Profile
+from user_medias.models import ActivityMedia
+from vsrala import timing
+from webinterface.pagination import CursorPaginator, DEFAULT_FIELDS, decode_cursor
+
+STARTED_AT = datetime(2022, 3, 1, 7, 30, tzinfo=timezone.utc)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='pages@mail.ru')
+        Activity.objects.bulk_create([Activity(profile=self.profile, title=str(i), started_at=STARTED_AT)
+                                      for i in range(25)])
+        # Несколько тренировок с одинаковым временем, чтобы проверить второй ключ
+        for i, activity in enumerate(Activity.objects.order_by('pk')):
+            Activity.objects.filter(pk=activity.pk).update(created_at=STARTED_AT + timedelta(minutes=i // 3))
+        self.expected = list(Activity.objects.order_by('-created_at', '-pk'))
+
+    def paginator(self):
+        return CursorPaginator([(Activity.objects.filter(profile=self.profile), DEFAULT_FIELDS)], 10)
+
+    def test_walk_forward_and_back(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        assert [obj for page in pages for obj in page] == self.expected
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert not pages[0].has_previous()
+        back = paginator.page(pages[2].previous_cursor)
+        assert back.object_list == pages[1].object_list
+        assert paginator.page(back.previous_cursor).object_list == pages[0].object_list
+
+    def test_invalid_cursor_is_first_page(self):
+        assert decode_cursor('garbage') is None
+        assert self.paginator().page('garbage').object_list == self.expected[:10]
+
+    def test_view_uses_no_count_or_offset(self):
+        self.client.force_login(self.profile)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('webinterface:my_activities'))
+        assert response.status_code == 200
+        assert not any('COUNT(' in q['sql'] or 'OFFSET' in q['sql'] for q in queries.captured_queries)
+        assert list(response.context['page_obj']) == self.expected
+        assert not response.context['page_obj'].has_next()
+
+
+class FeedCardsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = Profile.objects.create(email='cards-reader@mail.ru')
+        self.author = Profile.objects.create(email='cards-author@mail.ru')
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.client.force_login(self.reader)
+
+    def create_activities(self, count):
+        # Файлов фото нет, копии не создаются
+        with self.assertLogs('user_medias.signals', 'WARNING'):
+            for i in range(count):
+                activity = Activity.objects.create(profile=self.author, title=f'Заезд {i}', started_at=STARTED_AT)
+                ActivityMedia.objects.create(activity=activity, image=f'pictures/{i}.jpg')
+                ActivityMedia.objects.create(activity=activity, image=f'pictures/{i}-2.jpg')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('webinterface:feed'))
+        assert response.status_code == 200
+        return len(queries.captured_queries), response
+
+    def test_constant_queries(self):
+        self.create_activities(5)
+        few, _ = self.count_queries()
+        cache.clear()
+        self.create_activities(45)
+        many, response = self.count_queries()
+        assert few == many
+        assert response.content.decode().count('<picture>') == 50
+
+    def test_card_invalidated_on_change(self):
+        self.create_activities(1)
+        activity = Activity.objects.get()
+        self.count_queries()
+        activity.title = 'Новое название'
+        activity.save()
+        assert 'Новое название' in self.count_queries()[1].content.decode()
+        cover = ActivityMedia.objects.get(pk=activity.cover_id)
+        cover.delete()
+        content = self.count_queries()[1].content.decode()
+        assert cover.image.name not in content and 'pictures/0-2.jpg' in content
+
+    def test_card_kept_on_unrendered_change(self):
+        activity = Activity.objects.create(profile=self.author, title='Заезд', started_at=STARTED_AT)
+        version = Activity.objects.get().card_version
+        activity.processing_error = 'Ошибка'
+        activity.save(update_fields=['processing_error'])
+        assert activity.card_version == Activity.objects.get().card_version == version
+        activity.title = 'Новое название'
+        activity.save(update_fields=['title'])
+        assert activity.card_version == Activity.objects.get().card_version == version + 1
+
+
+class TrainingStatsTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(email='stats@mail.ru')
+        self.client.force_login(self.profile)
+
+    def get_stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('webinterface:training_stats'))
+        assert response.status_code == 200
+        return len(queries.captured_queries), response
+
+    def test_queries_do_not_depend_on_history(self):
+        now = datetime.now(timezone.utc)
+        Activity.objects.create(profile=self.profile, started_at=now, distance=5)
+        few, _ = self.get_stats()
+        for _ in range(20):
+            Activity.objects.create(profile=self.profile, started_at=now, distance=5)
+        many, response = self.get_stats()
+        assert few == many
+        assert 'Тренировок: 21' in response.content.decode()
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.reader = Profile.objects.create(email='etag-reader@mail.ru')
+        self.author = Profile.objects.create(email='etag-author@mail.ru')
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.activity = Activity.objects.create(profile=self.author, title='Заезд', started_at=STARTED_AT)
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url, **headers):
+        first = self.client.get(url)
+        assert first.status_code == 200 and first['ETag']
+        assert 'private' in first['Cache-Control']
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'], **headers)
+
+    def test_detail_not_modified_without_render(self):
+        url = reverse('webinterface:activity_detail', args=[self.activity.pk])
+        first, second = self.revalidate(url)
+        with mock.patch('webinterface.views.map_cache.cached_map') as cached_map, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert second.status_code == response.status_code == 304
+        assert not cached_map.called
+        assert len([q for q in queries.captured_queries if 'activities_activity' in q['sql']]) == 1
+
+        self.activity.title = 'Новое название'
+        self.activity.save()
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 200
+        etag = self.client.get(url)['ETag']
+        with self.assertLogs('user_medias.signals', 'WARNING'):
+            ActivityMedia.objects.create(activity=self.activity, image='pictures/new.jpg')
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_etag_depends_on_user(self):
+        url = reverse('webinterface:activity_detail', args=[self.activity.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_feed(self):
+        url = reverse('webinterface:feed')
+        first, second = self.revalidate(url)
+        assert second.status_code == 304
+        assert 'Last-Modified' not in first
+        Activity.objects.create(profile=self.author, title='Еще заезд', started_at=STARTED_AT)
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 200
+        etag = self.client.get(url)['ETag']
+        # Правка старой тренировки не меняет время создания, но меняет ETag
+        self.activity.title = 'Новое название'
+        self.activity.save()
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+class ServerTimingTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        timing.histograms.clear()
+        self.profile = Profile.objects.create(email='timing@mail.ru', is_staff=True)
+        self.activity = Activity.objects.create(profile=self.profile, started_at=STARTED_AT,
+                                                track_file=ContentFile(make_gpx(make_track()), name='ride.gpx'))
+        # Файловый уровень кеша карт переживает откат: тот же id и тот же трек
+        map_cache.invalidate(self.activity.pk, self.activity.track_hash)
+        self.client.force_login(self.profile)
+
+    def test_spans_and_histograms(self):
+        url = reverse('webinterface:activity_detail', args=[self.activity.pk])
+        with override_settings(SERVER_TIMING_SAMPLE_RATE=1.0):
+            header = self.client.get(url)['Server-Timing']
+            self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        names = [part.split(';')[0] for part in header.split(', ')]
+        assert {'db', 'map', 'folium', 'template', 'total'} <= set(names)
+
+        stats = self.client.get(reverse('webinterface:timing_stats')).json()
+        detail = stats['webinterface:activity_detail']
+        assert detail['total']['count'] == 2
+        # Второй раз карта взята из кеша
+        assert detail['map']['count'] == 1
+        assert 'webinterface:timing_stats' not in stats
+
+    def test_off_by_default(self):
+        response = self.client.get(reverse('webinterface:activity_detail', args=[self.activity.pk]))
+        assert 'Server-Timing' not in response
+        assert self.client.get(reverse('webinterface:timing_stats')).json() == {}
+
+    def test_rolling_window(self):
+        histograms = timing.RollingHistograms(window=60, windows=2)
+        for milliseconds in (3, 3, 40, 700):
+            histograms.add('feed', 'total', milliseconds, now=0)
+        histograms.add('feed', 'total', 15000, now=60)
+        summary = histograms.snapshot(now=60)['feed']['total']
+        assert summary['count'] == 5 and summary['p50_ms'] == 50 and summary['p99_ms'] is None
+        assert histograms.snapshot(now=120)['feed']['total']['count'] == 1
+        assert histograms.snapshot(now=240) == {}
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.profile = Profile.objects.create(email='async@mail.ru')
+        self.activity = Activity.objects.create(profile=self.profile, title='Заезд', started_at=STARTED_AT)
+        # Файл не читается: карта в тестах подменяется
+        Activity.objects.filter(pk=self.activity.pk).update(track_file='tracks/ride.gpx',
+                                                            status=Activity.Status.READY)
+        self.detail_url = reverse('webinterface:activity_detail', args=[self.activity.pk])
+
+    def test_login_required(self):
+        response = self.client.get(reverse('webinterface:feed'))
+        assert response.status_code == 302 and response['Location'].startswith(reverse(settings.LOGIN_URL))
+
+    async def test_feed_served_while_map_renders(self):
+        await sync_to_async(self.async_client.force_login)(self.profile)
+        release = threading.Event()
+
+        def slow_map(activity):
+            release.wait(5)
+            return '<div>slow map</div>'
+
+        with mock.patch('webinterface.views.map_cache.cached_map', slow_map):
+            detail = asyncio.ensure_future(self.async_client.get(self.detail_url))
+            feeds = await asyncio.gather(*(self.async_client.get(reverse('webinterface:feed')) for _ in range(3)))
+            assert [response.status_code for response in feeds] == [200] * 3
+            assert not detail.done()
+            release.set()
+            response = await detail
+        assert 'slow map' in response.content.decode()
+
+    def test_pool_busy(self):
+        self.client.force_login(self.profile)
+        pool = BoundedPool(workers=1, queue=0)
+        pool.slots.acquire()
+        with mock.patch('webinterface.views.track_pool', return_value=pool):
+            response = self.client.get(self.detail_url)
+        assert response.status_code == 200
+        assert 'Карта готовится' in response.content.decode()
+        assert 'no-store' in response['Cache-Control'] and 'ETag' not in response
+
+        pool.slots.release()
+        with mock.patch('webinterface.views.track_pool', return_value=pool), \
+                mock.patch('webinterface.views.map_cache.cached_map', return_value='<div>map</div>'):
+            response = self.client.get(self.detail_url)
+        assert '<div>map</div>' in response.content.decode() and response['ETag']
+
+    async def test_bounded_pool(self):
+        pool = BoundedPool(workers=1, queue=1)
+        release = threading.Event()
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(PoolBusy):
+            await pool.run(len, 'x')
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert await pool.run(len, 'x') == 1
@@ -1,6 +1,7 @@
 from django.urls import path
 from django.contrib.auth.views import LoginView, LogoutView
-from .views import FeedView, test, ActivityDetailView, MyActivitiesView
+from .views import FeedView, ActivityDetailView, MyActivitiesView, TrainingStatsView, TrackDownloadView, \
+    HeatmapView, heatmap_tile, map_cache_stats, timing_stats
 
 
 app_name = 'webinterface'
@@ -8,10 +9,13 @@ app_name = 'webinterface'
 urlpatterns = [
     path('', FeedView.as_view(), name='feed'),
     path('activities/<int:pk>/', ActivityDetailView.as_view(), name='activity_detail'),
+    path('activities/<int:pk>/track/', TrackDownloadView.as_view(), name='track_download'),
     path('activities/my/', MyActivitiesView.as_view(), name='my_activities'),
+    path('stats/', TrainingStatsView.as_view(), name='training_stats'),
+    path('stats/heatmap/', HeatmapView.as_view(), name='heatmap'),
+    path('stats/heatmap/<int:zoom>/<int:x>/<int:y>.png', heatmap_tile, name='heatmap_tile'),
     path('login/', LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
-
-    # Test url
-    path('test/', test)
+    path('stats/map-cache/', map_cache_stats, name='map_cache_stats'),
+    path('stats/timing/', timing_stats, name='timing_stats'),
 ]
\ No newline at end of file
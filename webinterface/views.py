@@ -1,30 +1,65 @@
+import hashlib
+import posixpath
+from datetime import timedelta
+
+import folium
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
 from django.views.generic.list import ListView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView
-from activities.models import Activity
+from django.views.generic.base import TemplateView
+from activities.models import Activity, BestEffort, TrainingTotals
 from django.contrib.auth.mixins import LoginRequiredMixin
 from profiles.models import Follow
-import folium
-from django.http import HttpResponse
-from PIL import Image
-import io
-from activities.utils import get_map
+from django.db.models import Count, Max
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.contrib.admin.views.decorators import staff_member_required
+from activities import feed, heatmap, map_cache, totals
+from activities.pool import PoolBusy, track_pool
+from activities.tracks import LATITUDE, LONGITUDE, load_track, open_track_file
+from vsrala import timing
+from .async_views import AsyncLoginRequiredMixin
+from .conditional import AsyncConditionalGetMixin, make_etag
+from .pagination import CursorPaginationMixin
+
+KINDS = BestEffort.Kind.values
+
+
+class ActivityCardsMixin(AsyncConditionalGetMixin):
+    """Context for the cached activity cards in ``feed/index.html``.
+
+    The ETag comes from the current page: it changes with the set of activities
+    on it and their card versions. There is no Last-Modified: no timestamp of the
+    page changes when a card is edited or an activity drops off it.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super(ActivityCardsMixin, self).get_context_data(**kwargs)
+        context['card_cache_timeout'] = settings.FEED_CARD_CACHE_TIMEOUT
+        return context
+
+    def get_etag(self):
+        page = self.get_page()
+        return make_etag(self.request.user.pk, self.request.get_full_path(),
+                         [(activity.pk, activity.card_version) for activity in page])
 
 
-class FeedView(LoginRequiredMixin, ListView):
+class FeedView(AsyncLoginRequiredMixin, ActivityCardsMixin, CursorPaginationMixin, ListView):
     model = Activity
     template_name = 'feed/index.html'
     paginate_by = 50
 
-    def get_queryset(self):
-        queryset = super(FeedView, self).get_queryset()
-        user = self.request.user
-        follows = user.follows.all()
-        return queryset.filter(profile__in=follows)
+    def get_sources(self):
+        return [(queryset.select_related('cover'), fields) for queryset, fields in feed.timeline(self.request.user)]
 
 
-class MyActivitiesView(LoginRequiredMixin, ListView):
+class MyActivitiesView(AsyncLoginRequiredMixin, ActivityCardsMixin, CursorPaginationMixin, ListView):
     model = Activity
     template_name = 'feed/index.html'
     paginate_by = 50
@@ -32,21 +67,141 @@ class MyActivitiesView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         queryset = super(MyActivitiesView, self).get_queryset()
         user = self.request.user
-        return queryset.filter(profile=user)
+        return queryset.filter(profile=user).select_related('cover')
 
 
-class ActivityDetailView(LoginRequiredMixin, DetailView):
+class ActivityDetailView(AsyncLoginRequiredMixin, AsyncConditionalGetMixin, DetailView):
+    """Activity page; the map is rendered in ``track_pool()``, off the event loop.
+
+    When the pool is full the page is served without the map and is not cached.
+    """
     model = Activity
     template_name = 'activities/detail.html'
+    map_pending = False
+
+    def get_etag(self):
+        # Один запрос по первичному ключу вместо чтения трека и отрисовки карты
+        version = Activity.objects.filter(pk=self.kwargs['pk']) \
+            .annotate(efforts=Count('segment_efforts'), last_effort=Max('segment_efforts')) \
+            .values_list('card_version', 'status', 'track_hash', 'efforts', 'last_effort').first()
+        if version is None:
+            return None
+        return make_etag(self.request.user.pk, self.kwargs['pk'], map_cache.VERSION, version)
 
     def get_context_data(self, **kwargs):
         context = super(ActivityDetailView, self).get_context_data(**kwargs)
-        if self.object.track_file:
-            folium_map = get_map(self.object.track_file.path)
-            context['map'] = folium_map
+        context['segment_efforts'] = self.object.segment_efforts.select_related('segment').order_by('start_index')
+        context['splits'] = self.object.splits.all()
+        context['best_efforts'] = sorted(self.object.best_efforts.all(), key=lambda effort: KINDS.index(effort.kind))
+        return context
+
+    async def render_page(self, request, *args, **kwargs):
+        self.object = await sync_to_async(self.get_object)()
+        context = await sync_to_async(self.get_context_data)(object=self.object)
+        if self.object.track_file and self.object.status == Activity.Status.READY:
+            context['map'] = await self.render_map()
+            context['map_pending'] = self.map_pending
+        # TemplateResponse отрисовывается обработчиком Django в потоке
+        return self.render_to_response(context)
+
+    async def render_map(self):
+        # peek() обращается к кешу Django синхронно, в цикле событий ему не место
+        html = await sync_to_async(map_cache.peek)(self.object)
+        if html is None:
+            try:
+                html = await track_pool().run(map_cache.cached_map, self.object)
+            except PoolBusy:
+                self.map_pending = True
+        return html
+
+    def add_validators(self, response, etag, timestamp):
+        if self.map_pending:
+            # Страница без карты не должна попасть в кеш браузера
+            patch_cache_control(response, no_store=True)
+            return response
+        return super(ActivityDetailView, self).add_validators(response, etag, timestamp)
+
+
+def _stream(track_file):
+    with track_file:
+        yield from track_file.chunks()
+
+
+class TrackDownloadView(LoginRequiredMixin, DetailView):
+    """Original track file, streamed and decompressed on the fly."""
+    model = Activity
+
+    def render_to_response(self, context, **response_kwargs):
+        if not self.object.track_file:
+            raise Http404
+        name = self.object.track_file.name
+        suffix = getattr(self.object.track_file.storage, 'suffix', '')
+        if suffix and name.endswith(suffix):
+            name = name[:-len(suffix)]
+        response = StreamingHttpResponse(_stream(open_track_file(self.object)),
+                                         content_type='application/octet-stream')
+        response['Content-Disposition'] = \
+            f'attachment; filename="activity-{self.object.pk}{posixpath.splitext(name)[1]}"'
+        return response
+
+
+class TrainingStatsView(LoginRequiredMixin, TemplateView):
+    """Current week, month and year read from the precomputed ``TrainingTotals``."""
+    template_name = 'stats/index.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(TrainingStatsView, self).get_context_data(**kwargs)
+        periods = []
+        for period, label in TrainingTotals.Period.choices:
+            rows = sorted(totals.totals_for(self.request.user, period).values(),
+                          key=lambda row: str(row.activity_type or ''))
+            periods.append({
+                'label': label,
+                'rows': rows,
+                'distance': sum(row.distance for row in rows),
+                'moving_time': sum((row.moving_time for row in rows), timedelta(0)),
+                'count': sum(row.count for row in rows),
+            })
+        context['periods'] = periods
+        records = {record.kind: record for record in self.request.user.personal_records.select_related(
+            'effort', 'effort__activity')}
+        context['records'] = [(label, records.get(kind)) for kind, label in BestEffort.Kind.choices]
+        return context
+
+
+class HeatmapView(LoginRequiredMixin, TemplateView):
+    """Map of everywhere the athlete has been, drawn from ``heatmap_tile``."""
+    template_name = 'stats/heatmap.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(HeatmapView, self).get_context_data(**kwargs)
+        latest = Activity.objects.filter(profile=self.request.user, in_heatmap=True) \
+            .only('pk', 'track_file', 'track_data').first()
+        track = load_track(latest) if latest else None
+        if track is None or not track.shape[1]:
+            return context
+        tiles = reverse('webinterface:heatmap_tile', args=[0, 0, 0]).replace('/0/0/0', '/{z}/{x}/{y}')
+        folium_map = folium.Map(location=[float(track[LATITUDE][0]), float(track[LONGITUDE][0])], zoom_start=12)
+        folium.TileLayer(tiles=tiles, attr='VSRALA', name='Тепловая карта', overlay=True,
+                         max_native_zoom=settings.HEATMAP_MAX_ZOOM, max_zoom=18).add_to(folium_map)
+        context['map'] = folium_map._repr_html_()
         return context
 
 
+@login_required
+def heatmap_tile(request, zoom, x, y):
+    """PNG tile of the user's heatmap; one file read, however many activities there are."""
+    if zoom > settings.HEATMAP_MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+        raise Http404
+    png = heatmap.tile(request.user.pk, zoom, x, y)
+    etag = quote_etag(hashlib.sha1(png).hexdigest() if png is not None else 'empty')
+    response = get_conditional_response(request, etag=etag) or \
+        HttpResponse(heatmap.empty_tile() if png is None else png, content_type='image/png')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 class ActivityUploadView(LoginRequiredMixin, CreateView):
     model = Activity
     template_name = 'activities/upload.html'
@@ -57,11 +212,12 @@ class ActivityCreateView(LoginRequiredMixin, CreateView):
     template_name = 'activities/create.html'
 
 
-def test(request):
-    start_coords = (46.9540700, 142.7360300)
-    folium_map = folium.Map(location=start_coords, zoom_start=14)
-    img = folium_map._to_png(5)
-    output = Image.open(io.BytesIO(img))
-    output.save('media/pictures/test.png')
+@staff_member_required
+def map_cache_stats(request):
+    return JsonResponse(map_cache.stats())
+
+
+@staff_member_required
+def timing_stats(request):
+    return JsonResponse(timing.histograms.snapshot())
 
-    return HttpResponse(folium_map._repr_html_())